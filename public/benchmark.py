@@ -0,0 +1,200 @@
+# Banc d'essai des chemins critiques du simulateur.
+#
+# Mesure le chargement des données (JSON brut et instantané), equip_set /
+# update_stats, la construction de Monster, simulate_combat de 10^2 à 10^6 tours
+# et des balayages sur les builds de `damage_simulation.__main__`.
+#
+# Chaque mesure est calibrée comme `timeit.Timer.autorange` (assez d'appels pour
+# dépasser `--min-time`), répétée `--repeat` fois, et le meilleur temps par appel
+# sert de référence (le moins sensible au bruit de la machine).
+#
+# Exemples :
+#   python benchmark.py --save bench_baseline.json
+#   python benchmark.py --compare bench_baseline.json --threshold 0.10
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import damage_simulation as sim
+import sweep
+from game_data import DataLoader, GameData
+
+# Builds de `damage_simulation.__main__` : (classe, monstre, compétence)
+MAIN_BUILDS = [
+    ('berserker', 'cinder_lord', 'berserker_heroic_strike'),
+    ('rogue', 'ghoul', 'rogue_subtlety_surprise_attack'),
+    ('mage', 'cinder_lord', 'mage_fire_fireball'),
+    ('cleric', 'ghoul', 'cleric_shadow_smite'),
+]
+MAIN_LEVEL = 25
+TURN_COUNTS = (10**2, 10**3, 10**4, 10**5, 10**6)
+SWEEP_TURNS = 100
+
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_THRESHOLD = 0.10
+
+
+def _equipped(class_id, level=MAIN_LEVEL):
+    player = sim.Character(level=level, class_id=class_id)
+    player.equip_set(sim.DEFAULT_GEAR[class_id])
+    return player
+
+
+def _load_all(use_snapshot):
+    data = GameData(DataLoader(use_snapshot=use_snapshot))
+    # Index principaux et secondaires utilisés par le simulateur
+    data.items, data.monsters, data.skills, data.classes, data.talents
+    data.skills_for('berserker', MAIN_LEVEL)
+    return data
+
+
+def _sweep_builds(turns):
+    # Même enchaînement que sweep.py, dans le processus courant
+    monster_ids = list(sim.game_data.monsters)
+    for class_id, _, skill_id in MAIN_BUILDS:
+        sweep.run_task((class_id, MAIN_LEVEL, tuple(sim.DEFAULT_GEAR[class_id]), skill_id, tuple(monster_ids),
+                        turns, 0, 0, False, None))
+
+
+def build_benchmarks():
+    """Liste de (nom, fonction sans argument) à chronométrer ; la préparation est faite ici."""
+    benchmarks = [
+        ('load/json', lambda: _load_all(use_snapshot=False)),
+        ('load/snapshot', lambda: _load_all(use_snapshot=True)),
+    ]
+    for class_id, monster_id, skill_id in MAIN_BUILDS:
+        player = _equipped(class_id)
+        gear = sim.DEFAULT_GEAR[class_id]
+        benchmarks.append((f'equip_set/{class_id}',
+                           lambda class_id=class_id, gear=gear: sim.Character(MAIN_LEVEL, class_id).equip_set(gear)))
+        benchmarks.append((f'update_stats/{class_id}', player.update_stats))
+    for _, monster_id, _ in MAIN_BUILDS[:2]:
+        benchmarks.append((f'monster/{monster_id}', lambda monster_id=monster_id: sim.Monster(monster_id)))
+    for class_id, monster_id, skill_id in MAIN_BUILDS:
+        player = _equipped(class_id)
+        for turns in TURN_COUNTS:
+            benchmarks.append((
+                f'simulate_combat/{class_id}/{turns}',
+                lambda player=player, monster_id=monster_id, skill_id=skill_id, turns=turns: sim.simulate_combat(
+                    player, monster_id, skill_id, turns=turns, rng=random.Random(0), verbose=False)))
+    # Surcoût du mode détaillé (répartitions, centiles) et des CombatHooks
+    player = _equipped('berserker')
+    benchmarks.append(('simulate_combat_detailed/berserker/100000', lambda: sim.simulate_combat(
+        player, 'cinder_lord', 'berserker_heroic_strike', turns=10**5, rng=random.Random(0), verbose=False,
+        detailed=True, hooks=sim.CombatHooks())))
+    benchmarks.append((f'sweep/main_builds/{SWEEP_TURNS}', lambda: _sweep_builds(SWEEP_TURNS)))
+    return benchmarks
+
+
+def measure(func, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    """Temps par appel : {'best', 'median', 'number', 'repeat'} en secondes."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {'best': min(timings), 'median': statistics.median(timings), 'number': number, 'repeat': repeat}
+
+
+def run_benchmarks(selected=None, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME, verbose=True):
+    """Chronomètre les bancs dont le nom contient l'un des motifs de `selected` (tous par défaut)."""
+    results = {}
+    for name, func in build_benchmarks():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(func, repeat, min_time)
+        if verbose:
+            print(f"{name:<40} {format_time(results[name]['best']):>10} (médiane {format_time(results[name]['median'])}, "
+                  f"{results[name]['number']} appels × {repeat})")
+    return results
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def save_baseline(path, results):
+    baseline = {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare les meilleurs temps à la référence. Retourne la liste des (nom, ratio) en régression."""
+    regressions = []
+    reference = baseline.get('results', {})
+    for name, current in results.items():
+        if name not in reference:
+            print(f"{name:<40} {format_time(current['best']):>10}  (absent de la référence)")
+            continue
+        ratio = current['best'] / reference[name]['best']
+        if ratio > 1 + threshold:
+            status = 'RÉGRESSION'
+            regressions.append((name, ratio))
+        elif ratio < 1 - threshold:
+            status = 'amélioration'
+        else:
+            status = 'stable'
+        print(f"{name:<40} {format_time(reference[name]['best']):>10} -> {format_time(current['best']):>10}  "
+              f"x{ratio:.2f}  {status}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Banc d'essai du simulateur de dégâts.")
+    parser.add_argument('--filter', nargs='*', help="Ne lance que les bancs dont le nom contient l'un de ces motifs")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+                        help="Durée minimale (s) d'une répétition")
+    parser.add_argument('--save', help="Écrit les résultats dans ce fichier de référence (JSON)")
+    parser.add_argument('--compare', help="Compare les résultats à ce fichier de référence")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Ralentissement relatif toléré avant de signaler une régression (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    try:
+        baseline = None
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                baseline = json.load(f)
+        results = run_benchmarks(args.filter, repeat=args.repeat, min_time=args.min_time, verbose=baseline is None)
+    except FileNotFoundError as e:
+        print(f"--- ERREUR CRITIQUE: Fichier non trouvé. Détail de l'erreur: {e} ---")
+        sys.exit(1)
+
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"-> {len(results)} mesures écrites dans {args.save}")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"-> {len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"-> Aucune régression au-delà de {args.threshold:.0%}")
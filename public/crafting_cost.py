@@ -0,0 +1,221 @@
+# Coût total d'artisanat des objets : or et matériaux bruts, recettes comprises.
+#
+# Une recette (recipes.json) produit un objet à partir de composants
+# (components.json) et d'objets (`item:<id>`, consommés comme dans craftItem de
+# gameStore.ts) contre `cost` pièces d'or. Un objet fabricable qui entre dans une
+# autre recette est remplacé par son propre coût : le coût complet d'un objet T3
+# comprend celui des T2, T1... qu'il consomme.
+#
+# Le graphe des recettes est compilé une fois par jeu de données : tri
+# topologique (les objets consommés avant ceux qui les consomment) avec détection
+# des cycles, puis un seul passage dans cet ordre calcule et mémorise la fermeture
+# complète (or, composants, objets non fabricables) de chaque objet fabricable.
+#
+# Les composants absents de components.json sont comptés comme matériaux bruts
+# et signalés dans `unknown`.
+#
+# Exemples :
+#   python crafting_cost.py
+#   python crafting_cost.py --class berserker --level 25 --skill berserker_heroic_strike --monster cinder_lord
+
+import argparse
+import csv
+import sys
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+
+import damage_simulation as sim
+from gear_optimizer import can_equip
+from talent_optimizer import expected_talent_dps
+
+ITEM_PREFIX = 'item:'
+
+FIELDNAMES = ['item_id', 'recipe_id', 'gold', 'materials', 'items', 'unknown', 'depth']
+
+# Coûts résolus par jeu de données : data -> {objet: CraftingCost}
+_resolved_costs = weakref.WeakKeyDictionary()
+
+
+@dataclass
+class CraftingCost:
+    """Coût complet d'un objet fabricable. `depth` : nombre de recettes imbriquées (1 sans objet fabricable)."""
+    item_id: str
+    recipe_id: str
+    gold: int
+    materials: dict = field(default_factory=dict)
+    items: dict = field(default_factory=dict)
+    unknown: list = field(default_factory=list)
+    depth: int = 1
+
+
+def recipe_inputs(recipe):
+    """Entrées d'une recette : (objets consommés, composants), chacun {identifiant: quantité}."""
+    items, components = {}, {}
+    for material_id, amount in recipe.get('materials', {}).items():
+        if material_id.startswith(ITEM_PREFIX):
+            items[material_id[len(ITEM_PREFIX):]] = amount
+        else:
+            components[material_id] = amount
+    return items, components
+
+
+def recipe_order(data=None):
+    """Objets fabricables triés pour que chaque objet consommé précède ceux qui le consomment.
+
+    Lève ValueError si les recettes forment un cycle (le cycle est donné dans le message).
+    """
+    data = data or sim.game_data
+    by_result = data.recipes_by_result
+    order = []
+    state = {}  # 1 : en cours de parcours, 2 : terminé
+    for root in by_result:
+        if state.get(root):
+            continue
+        state[root] = 1
+        path = [root]
+        stack = [iter(recipe_inputs(by_result[root])[0])]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                done = path.pop()
+                state[done] = 2
+                order.append(done)
+                continue
+            if child not in by_result or state.get(child) == 2:
+                continue
+            if state.get(child) == 1:
+                cycle = path[path.index(child):] + [child]
+                raise ValueError(f"Cycle dans les recettes : {' -> '.join(cycle)}")
+            state[child] = 1
+            path.append(child)
+            stack.append(iter(recipe_inputs(by_result[child])[0]))
+    return order
+
+
+def resolve_costs(data=None):
+    """Coût complet de tous les objets fabricables, calculé en un passage et mémorisé. {objet: CraftingCost}"""
+    data = data or sim.game_data
+    costs = _resolved_costs.get(data)
+    if costs is not None:
+        return costs
+    by_result = data.recipes_by_result
+    costs = {}
+    for item_id in recipe_order(data):
+        recipe = by_result[item_id]
+        items, components = recipe_inputs(recipe)
+        gold = recipe.get('cost', 0)
+        materials = Counter(components)
+        raw_items = Counter()
+        unknown = {component_id for component_id in components if not data.get_component(component_id)}
+        depth = 1
+        for input_id, amount in items.items():
+            sub = costs.get(input_id)
+            if sub is None:
+                # Objet non fabricable : reste une entrée à part entière
+                raw_items[input_id] += amount
+                continue
+            gold += sub.gold * amount
+            for material_id, count in sub.materials.items():
+                materials[material_id] += count * amount
+            for raw_id, count in sub.items.items():
+                raw_items[raw_id] += count * amount
+            unknown.update(sub.unknown)
+            depth = max(depth, sub.depth + 1)
+        costs[item_id] = CraftingCost(item_id, recipe['id'], gold, dict(materials), dict(raw_items),
+                                      sorted(unknown), depth)
+    _resolved_costs[data] = costs
+    return costs
+
+
+def crafting_cost(item_id, data=None):
+    """Coût complet d'un objet (None s'il n'est pas fabricable)."""
+    return resolve_costs(data).get(item_id)
+
+
+def value_per_gold(player, skill_id, monster_id, costs=None):
+    """Gain de DPS par 1000 pièces d'or de chaque objet fabricable que le personnage peut porter (classe et niveau).
+
+    Chaque objet remplace celui du même slot dans l'équipement de `player` ; le DPS est celui de
+    `expected_talent_dps`. Retourne des (objet, gain de DPS, or, gain par 1000 or), meilleur ratio d'abord.
+    """
+    data = player.data
+    costs = costs if costs is not None else resolve_costs(data)
+    monster = sim.Monster(monster_id, data)
+    if not monster.id:
+        raise ValueError(f"Monstre '{monster_id}' non trouvé dans monsters.json")
+    skill = player.get_skill(skill_id)
+    if not skill:
+        raise ValueError(f"Compétence '{skill_id}' non trouvée pour la classe {player.class_id}")
+
+    def dps(character):
+        return expected_talent_dps(character.stats, character.level, character.class_id, monster, skill)
+
+    trial = sim.Character(player.level, player.class_id, data)
+    for item in player.equipment.values():
+        trial.equip(item)
+    base_dps = dps(trial)
+    rows = []
+    for item_id, cost in costs.items():
+        item = data.get_item(item_id)
+        if not item or 'slot' not in item or not can_equip(item, player.class_id, player.level):
+            continue
+        previous = trial.equipment.get(item['slot'])
+        trial.equip(item)
+        gain = dps(trial) - base_dps
+        if previous is not None:
+            trial.equip(previous)
+        else:
+            trial.unequip(item['slot'])
+        rows.append((item_id, gain, cost.gold, gain / cost.gold * 1000 if cost.gold else float('inf')))
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coût complet d'artisanat (or et matériaux) des objets fabricables.")
+    parser.add_argument('--items', nargs='*', help="Objets à afficher (tous les objets fabricables par défaut)")
+    parser.add_argument('--class', dest='class_id', help="Classe pour le gain de DPS par pièce d'or")
+    parser.add_argument('--level', type=int, default=25)
+    parser.add_argument('--skill', help="Compétence pour le gain de DPS (obligatoire avec --class)")
+    parser.add_argument('--monster', default='cinder_lord')
+    parser.add_argument('--output', help="Fichier CSV optionnel")
+    args = parser.parse_args()
+    if args.class_id and not args.skill:
+        parser.error("--skill est obligatoire avec --class")
+
+    with sim.cli_errors():
+        costs = resolve_costs()
+        player = None
+        if args.class_id:
+            player = sim.Character(level=args.level, class_id=args.class_id)
+            player.equip_set(sim.DEFAULT_GEAR.get(args.class_id, []))
+            ratios = value_per_gold(player, args.skill, args.monster, costs)
+
+    selected = [costs[item_id] for item_id in args.items if item_id in costs] if args.items else list(costs.values())
+    print(f"--- Coûts d'artisanat: {len(selected)} objets ---")
+    missing = [item_id for item_id in args.items or () if item_id not in costs]
+    unknown = [item_id for item_id in missing if not sim.game_data.get_item(item_id)]
+    if unknown:
+        print(f"Objets inconnus (ignorés): {', '.join(unknown)}")
+    if len(missing) > len(unknown):
+        print(f"Objets sans recette (ignorés): {', '.join(i for i in missing if i not in unknown)}")
+    for cost in selected:
+        materials = ', '.join(f"{amount} {material_id}" for material_id, amount in sorted(cost.materials.items()))
+        print(f"{cost.item_id:<36} {cost.gold:>7} or  [{materials}]"
+              + (f"  objets: {cost.items}" if cost.items else '')
+              + (f"  inconnus: {', '.join(cost.unknown)}" if cost.unknown else ''))
+    if player is not None:
+        print(f"\n--- Gain de DPS par 1000 or: {args.class_id} niv {args.level} vs {args.monster} "
+              f"avec {args.skill} ---")
+        for item_id, gain, gold, ratio in ratios[:20]:
+            print(f"{item_id:<36} {gain:>+8.2f} DPS  {gold:>7} or  {ratio:>+8.3f} DPS / 1000 or")
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            for cost in selected:
+                writer.writerow({'item_id': cost.item_id, 'recipe_id': cost.recipe_id, 'gold': cost.gold,
+                                 'materials': ';'.join(f"{k}:{v}" for k, v in sorted(cost.materials.items())),
+                                 'items': ';'.join(f"{k}:{v}" for k, v in sorted(cost.items.items())),
+                                 'unknown': ';'.join(cost.unknown), 'depth': cost.depth})
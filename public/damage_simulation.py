@@ -1,10 +1,17 @@
 # This script is for simulating combat scenarios to help with game balancing.
 # ... (les commentaires initiaux restent les mêmes) ...
 
-import json
+import math
 import random
-import pprint
-import os
+import sys
+import time
+import weakref
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from statistics import NormalDist
+
+from game_data import GameData, flatten_item_stats, get_data_path
 
 # ==============================================================================
 # === PARAMÈTRE DE TEST : CHOIX DE LA FORMULE DE DÉGÂTS ===
@@ -14,29 +21,36 @@ import os
 USE_PERCENTAGE_BASED_FORMULA = True
 # ==============================================================================
 
-# Get the directory of the script
-script_dir = os.path.dirname(__file__)
-
-# --- CORRECTION DE LA GESTION DES CHEMINS D'ACCÈS ---
-def get_data_path(filename):
-    """Construit le chemin d'accès correct vers les fichiers de données."""
-    return os.path.join(script_dir, 'data', filename)
-
-# Load data from JSON files
-try:
-    with open(get_data_path('items.json'), 'r', encoding='utf-8') as f:
-        items_data = json.load(f)
-    with open(get_data_path('monsters.json'), 'r', encoding='utf-8') as f:
-        monsters_data = json.load(f)
-    with open(get_data_path('skills.json'), 'r', encoding='utf-8') as f:
-        skills_data = json.load(f)
-    with open(get_data_path('classes.json'), 'r', encoding='utf-8') as f:
-        classes_data = json.load(f)
-except FileNotFoundError as e:
-    print(f"--- ERREUR CRITIQUE: Fichier de données non trouvé. Vérifiez la structure de vos dossiers. ---")
-    print(f"Le script s'attend à trouver un dossier 'data' dans le même répertoire que lui.")
-    print(f"Détail de l'erreur: {e}")
-    exit()
+# Formule choisie appel par appel (paramètre `formula`) ; None reprend le paramètre global ci-dessus
+FORMULA_PERCENTAGE = 'percentage'
+FORMULA_FLAT = 'flat'
+FORMULA_NAMES = {FORMULA_PERCENTAGE: "Pourcentage", FORMULA_FLAT: "Dégâts Plats"}
+
+def resolve_formula(formula=None):
+    """Formule effective ('percentage' ou 'flat') ; None = USE_PERCENTAGE_BASED_FORMULA."""
+    if formula is None:
+        return FORMULA_PERCENTAGE if USE_PERCENTAGE_BASED_FORMULA else FORMULA_FLAT
+    if formula not in FORMULA_NAMES:
+        raise ValueError(f"Formule '{formula}' inconnue (attendu : {', '.join(FORMULA_NAMES)})")
+    return formula
+
+# Registre indexé partagé par Character, Monster et le simulateur.
+# Les fichiers JSON ne sont lus qu'à la première recherche (voir game_data.py).
+game_data = GameData()
+
+# Noms historiques des données brutes, chargés à la demande
+_RAW_DATA_FILES = {
+    'items_data': 'items.json',
+    'monsters_data': 'monsters.json',
+    'skills_data': 'skills.json',
+    'classes_data': 'classes.json',
+    'talents_data': 'talents.json',
+}
+
+def __getattr__(name):
+    if name in _RAW_DATA_FILES:
+        return game_data.loader.load(_RAW_DATA_FILES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Fonctions de calcul ---
@@ -50,8 +64,8 @@ def calculate_elemental_damage(elemental_damage, resistance):
     resistance_value = max(0, min(100, resistance))
     return round(elemental_damage * (1 - resistance_value / 100))
 
-def calculate_player_attack_damage(stats):
-    return random.uniform(stats.get('AttMin', 0), stats.get('AttMax', 0))
+def calculate_player_attack_damage(stats, rng=random):
+    return rng.uniform(stats.get('AttMin', 0), stats.get('AttMax', 0))
 
 def get_rank_value(values, rank):
     if values is None: return 0
@@ -64,194 +78,1113 @@ def calculate_armor_dr(armor, enemy_level):
     dr = armor / denominator
     return min(dr, 0.75)
 
+def calculate_resistance_dr(resistance, enemy_level):
+    denominator = resistance + (100 + 20 * enemy_level)
+    if denominator == 0: return 0
+    dr = resistance / denominator
+    return min(dr, 0.75)
+
+def js_round(x):
+    # Math.round de JavaScript : demi arrondi vers le haut (round() de Python arrondit au pair)
+    return math.floor(x + 0.5)
+
+def calculate_max_hp(level, stats):
+    # calculateMaxHP de formulas.ts
+    return 100 + 20 * level + 10 * (stats.get('Force') or 0) + 5 * (stats.get('Esprit') or 0)
+
+# --- Agrégation compilée des stats ---
+#
+# Chaque stat (clé pointée, ex. 'BonusDmg.fire') reçoit un indice fixe ; un objet
+# est compilé une seule fois en tuple de (indice, valeur). Character stocke ses
+# totaux dans une liste indexée par ces indices et équipe/déséquipe un objet en
+# ajoutant/retirant uniquement sa contribution.
+
+STAT_KEYS = []
+STAT_INDEX = {}
+# Chemin découpé de chaque clé : (groupes, feuille), ex. (('BonusDmg',), 'fire')
+STAT_PATHS = []
+# Compilations des objets et stats de base du registre, par jeu de données :
+# data -> {('item' | 'class', identifiant): deltas compilés}. Les objets hors registre
+# (générés, copiés) sont compilés à chaque fois et ne restent pas en mémoire.
+_compiled_sources = weakref.WeakKeyDictionary()
+
+def stat_index(key):
+    index = STAT_INDEX.get(key)
+    if index is None:
+        index = STAT_INDEX[key] = len(STAT_KEYS)
+        STAT_KEYS.append(key)
+        *groups, leaf = key.split('.')
+        STAT_PATHS.append((tuple(groups), leaf))
+    return index
+
+def compile_deltas(deltas):
+    """Convertit des deltas (clé pointée, valeur) en tuple (indice, valeur)."""
+    return tuple((stat_index(key), value) for key, value in deltas)
+
+def compile_item(item, data=None):
+    """Deltas compilés d'un objet ; mis en cache seulement pour les objets du registre de `data`."""
+    data = data or game_data
+    item_id = item.get('id')
+    if item_id is None or data.get_item(item_id) is not item:
+        return compile_deltas(flatten_item_stats(item))
+    cache = _compiled_sources.setdefault(data, {})
+    compiled = cache.get(('item', item_id))
+    if compiled is None:
+        compiled = cache[('item', item_id)] = compile_deltas(data.item_stat_deltas[item_id])
+    return compiled
+
+def _compile_base_stats(data, class_id):
+    cache = _compiled_sources.setdefault(data, {})
+    compiled = cache.get(('class', class_id))
+    if compiled is None:
+        class_info = data.get_class(class_id)
+        compiled = compile_deltas(flatten_item_stats({'stats': class_info['statsBase']})) if class_info else ()
+        cache[('class', class_id)] = compiled
+    return compiled
+
+# --- Talents ---
+#
+# Comme recalculateStats dans gameStore.ts, les statMods des talents appris
+# ('buff' / 'stat_modifier') s'appliquent après l'équipement, talent par talent
+# dans l'ordre d'apprentissage : 'additive' ajoute la valeur de rang, 'multiplicative'
+# multiplie par elle. Seules les stats numériques déjà présentes sont modifiées.
+#
+# Chaque stat modifiée reçoit une transformation affine x -> a * x + b ; la pile
+# composée d'une allocation (suite de (talent, rang)) est mémorisée et construite à
+# partir de celle de son préfixe, donc partagée par toutes les allocations qui
+# commencent de la même façon.
+
+# Piles composées par jeu de données : data -> {(type d'arme, allocation): pile},
+# vidées au-delà de TALENT_STACK_CACHE_SIZE piles
+TALENT_STACK_CACHE_SIZE = 1 << 16
+_talent_stacks = weakref.WeakKeyDictionary()
+# Nombre de piles construites depuis le lancement (les piles relues du cache ne comptent pas)
+_talent_stack_builds = Counter()
+
+def compile_talent(talent, rank, weapon_type=None):
+    """statMods d'un talent au rang donné : tuple de (stat, modificateur, valeur)."""
+    mods = []
+    for effect in talent.get('effects') or []:
+        if effect.get('type') != 'buff' or effect.get('buffType') != 'stat_modifier':
+            continue
+        for mod in effect.get('statMods', []):
+            condition = mod.get('condition') or {}
+            # Seule condition vérifiée par le jeu : le type d'arme
+            if 'requires_weapon_type' in condition and condition['requires_weapon_type'] != weapon_type:
+                continue
+            if mod.get('modifier') in ('additive', 'multiplicative'):
+                mods.append((mod['stat'], mod['modifier'], get_rank_value(mod['value'], rank)))
+    return tuple(mods)
+
+def talent_stack(data, allocation, weapon_type=None):
+    """Pile composée {stat: (a, b)} d'une allocation ((talent_id, rang), ...), mémorisée par préfixe."""
+    cache = _talent_stacks.setdefault(data, {})
+    key = (weapon_type, allocation)
+    stack = cache.get(key)
+    if stack is not None:
+        return stack
+    if not allocation:
+        stack = {}
+    else:
+        stack = dict(talent_stack(data, allocation[:-1], weapon_type))
+        talent_id, rank = allocation[-1]
+        talent = data.get_talent(talent_id)
+        for stat, modifier, value in compile_talent(talent, rank, weapon_type) if talent else ():
+            a, b = stack.get(stat, (1, 0))
+            stack[stat] = (a, b + value) if modifier == 'additive' else (a * value, b * value)
+    if len(cache) >= TALENT_STACK_CACHE_SIZE:
+        cache.clear()
+    cache[key] = stack
+    _talent_stack_builds['built'] += 1
+    return stack
+
+def talent_stacks_built():
+    """Nombre de piles de talents construites (et non relues du cache) depuis le lancement."""
+    return _talent_stack_builds['built']
+
+def apply_talent_stack(stats, stack):
+    """Applique une pile composée aux stats de premier niveau (copie superficielle)."""
+    stats = dict(stats)
+    for stat, (a, b) in stack.items():
+        value = stats.get(stat)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            stats[stat] = value * a + b
+    return stats
+
+def apply_skill_mods(data, skill, talents):
+    """Copie de la compétence modifiée par les skill_mods des talents appris (règles de skillProcessor).
+
+    Chaque modification repart de la valeur d'origine au rang de la compétence :
+    le dernier talent qui touche une propriété l'emporte.
+    """
+    rank = skill.get('rangMax', 1)
+    effects = None
+    for talent_id, talent_rank in talents.items():
+        talent = data.get_talent(talent_id)
+        for mod in (talent or {}).get('skill_mods') or []:
+            if mod.get('skill_id') != skill['id'] or not skill.get('effects'):
+                continue
+            for change in mod.get('modifications', []):
+                index, path = change['effect_index'], change['property_path']
+                if index >= len(skill['effects']) or not skill['effects'][index].get(path):
+                    continue
+                if effects is None:
+                    effects = [dict(effect) for effect in skill['effects']]
+                base_value = get_rank_value(skill['effects'][index][path], rank)
+                value = get_rank_value(change['value'], talent_rank)
+                if change.get('modifier') == 'multiplicative':
+                    effects[index][path] = base_value * value
+                elif change.get('modifier') == 'additive':
+                    effects[index][path] = base_value + value
+    if effects is None:
+        return skill
+    return {**skill, 'effects': effects}
+
 # --- Classes du jeu ---
 class Character:
-    def __init__(self, level, class_id):
+    __slots__ = ('data', 'level', 'class_id', 'equipment', 'skills', 'talents',
+                 '_base', '_values', '_refs', '_compiled', '_stats_cache')
+
+    def __init__(self, level, class_id, data=None):
+        self.data = data or game_data
         self.level = level
         self.class_id = class_id
         self.equipment = {}
-        self.stats = self.get_base_stats()
+        # Rangs des talents appris, dans l'ordre d'apprentissage (learnedTalents)
+        self.talents = {}
+        # Contribution compilée de chaque slot équipé (même ordre que self.equipment)
+        self._compiled = {}
+        self._base = _compile_base_stats(self.data, self.class_id)
+        self._reset_values()
         self.skills = self.get_skills()
 
     def get_base_stats(self):
-        for class_info in classes_data['classes']:
-            if class_info['id'] == self.class_id:
-                return class_info['statsBase'].copy()
+        class_info = self.data.get_class(self.class_id)
+        if class_info:
+            return class_info['statsBase'].copy()
         return {}
     
     def get_skills(self):
-        skills = []
-        for skill in skills_data['skills']:
-            if skill.get('classeId') == self.class_id and skill.get('niveauRequis', 1) <= self.level:
-                skills.append(skill)
-        return skills
+        return self.data.skills_for(self.class_id, self.level)
+
+    def get_skill(self, skill_id):
+        skill = self.data.get_skill(skill_id)
+        if skill and skill.get('classeId') == self.class_id and skill.get('niveauRequis', 1) <= self.level:
+            return apply_skill_mods(self.data, skill, self.talents) if self.talents else skill
+        return None
+
+    @property
+    def stats(self):
+        """Stats agrégées sous forme de dictionnaire imbriqué (reconstruit seulement après un changement)."""
+        if self._stats_cache is None:
+            stats = {}
+            # Ordre d'apparition des clés identique à update_stats : base, puis objets dans l'ordre d'équipement
+            order = dict.fromkeys(index for source in (self._base, *self._compiled.values()) for index, _ in source)
+            for index in order:
+                groups, leaf = STAT_PATHS[index]
+                current_level = stats
+                for group in groups:
+                    current_level = current_level.setdefault(group, {})
+                current_level[leaf] = self._values[index]
+            if self.talents:
+                weapon = self.equipment.get('weapon')
+                stack = talent_stack(self.data, tuple(self.talents.items()), weapon and weapon.get('type'))
+                stats = apply_talent_stack(stats, stack)
+            self._stats_cache = stats
+        return self._stats_cache
+
+    def equip(self, item):
+        """Équipe un objet (dict ou identifiant) ; remplace celui du même slot en gardant sa place."""
+        if isinstance(item, str):
+            item = self.data.get_item(item)
+        slot = item['slot']
+        compiled = compile_item(item, self.data)
+        previous = self._compiled.get(slot)
+        if previous is not None:
+            self._apply(previous, -1)
+        self.equipment[slot] = item
+        self._compiled[slot] = compiled
+        self._apply(compiled, 1)
+        if previous is not None:
+            self._resum_inexact(previous + compiled)
+
+    def unequip(self, slot):
+        """Retire l'objet du slot et soustrait sa contribution. Retourne l'objet retiré (ou None)."""
+        item = self.equipment.pop(slot, None)
+        if item is not None:
+            compiled = self._compiled.pop(slot)
+            self._apply(compiled, -1)
+            self._resum_inexact(compiled)
+        return item
 
     def equip_set(self, item_ids):
         for item_id in item_ids:
             if item_id is None or item_id.strip() == "": continue
-            found = False
-            for item in items_data['items']:
-                if item['id'] == item_id:
-                    self.equipment[item['slot']] = item
-                    found = True
-                    break
-            if not found:
+            item = self.data.get_item(item_id)
+            if item:
+                self.equip(item)
+            else:
                  print(f"--- AVERTISSEMENT: Objet '{item_id}' non trouvé dans items.json ---")
-        self.update_stats()
+
+    @property
+    def talent_points(self):
+        """Points restants : 1 à la création, +1 par niveau gagné."""
+        return self.level - sum(self.talents.values())
+
+    def can_learn_talent(self, talent_id):
+        talent = self.data.get_talent(talent_id)
+        if not talent or talent.get('classeId') != self.class_id or self.talent_points <= 0:
+            return False
+        if talent.get('niveauRequis', 1) > self.level or self.talents.get(talent_id, 0) >= talent.get('rangMax', 1):
+            return False
+        for requirement in talent.get('exigences', []):
+            required_id, required_rank = requirement.split(':')
+            if self.talents.get(required_id, 0) < int(required_rank):
+                return False
+        return True
+
+    def learn_talent(self, talent_id):
+        """Ajoute un rang au talent si les règles de learnTalent le permettent. Retourne True si appris."""
+        if not self.can_learn_talent(talent_id):
+            return False
+        self.talents[talent_id] = self.talents.get(talent_id, 0) + 1
+        self._stats_cache = None
+        return True
+
+    def set_talents(self, ranks):
+        """Remplace les talents par `ranks` ({talent_id: rang}, appris dans cet ordre). Retourne False si refusé."""
+        self.talents = {}
+        self._stats_cache = None
+        for talent_id, rank in ranks.items():
+            for _ in range(rank):
+                if not self.learn_talent(talent_id):
+                    print(f"--- AVERTISSEMENT: Talent '{talent_id}' (rang {rank}) impossible à apprendre ---")
+                    return False
+        return True
 
     def update_stats(self):
-        self.stats = self.get_base_stats()
-        for item in self.equipment.values():
-            stats_sources = [item.get('affixes', []), item.get('stats', {})]
-            for source in stats_sources:
-                if isinstance(source, list):
-                    for affix in source:
-                        keys = affix['ref'].split('.')
-                        current_level = self.stats
-                        for i, key in enumerate(keys):
-                            if i == len(keys) - 1:
-                                current_level[key] = current_level.get(key, 0) + affix['val']
-                            else:
-                                if key not in current_level: current_level[key] = {}
-                                current_level = current_level[key]
-                elif isinstance(source, dict):
-                    for key, value in source.items():
-                        if isinstance(value, dict):
-                            if key not in self.stats: self.stats[key] = {}
-                            for sub_key, sub_value in value.items():
-                                self.stats[key][sub_key] = self.stats[key].get(sub_key, 0) + sub_value
-                        else:
-                            self.stats[key] = self.stats.get(key, 0) + value
+        """Recalcule toutes les stats depuis les stats de base et l'équipement courant."""
+        self._compiled = {slot: compile_item(item, self.data) for slot, item in self.equipment.items()}
+        self._reset_values()
+        for compiled in self._compiled.values():
+            self._apply(compiled, 1)
+
+    # --- Interne ---
+
+    def _reset_values(self):
+        self._values = [0] * len(STAT_KEYS)
+        self._refs = [0] * len(STAT_KEYS)
+        self._apply(self._base, 1)
+
+    def _apply(self, compiled, sign):
+        values, refs = self._values, self._refs
+        if len(values) < len(STAT_KEYS):
+            values.extend([0] * (len(STAT_KEYS) - len(values)))
+            refs.extend([0] * (len(STAT_KEYS) - len(refs)))
+        for index, value in compiled:
+            values[index] += sign * value
+            refs[index] += sign
+        self._stats_cache = None
+
+    def _resum_inexact(self, compiled):
+        # Une soustraction flottante n'est pas exacte : les stats non entières touchées sont
+        # re-sommées dans l'ordre de update_stats pour rester identiques au bit près.
+        for index in {index for index, _ in compiled}:
+            if isinstance(self._values[index], float):
+                total = 0
+                for source in (self._base, *self._compiled.values()):
+                    for i, value in source:
+                        if i == index:
+                            total += value
+                self._values[index] = total
 
 class Monster:
-    def __init__(self, monster_id):
+    def __init__(self, monster_id, data=None):
         self.id = None
-        for monster in monsters_data['monsters']:
-            if monster['id'] == monster_id:
-                self.id = monster['id']
-                self.name = monster['nom']
-                self.level = monster['level']
-                self.stats = monster['stats']
-                return
+        monster = (data or game_data).get_monster(monster_id)
+        if monster:
+            self.id = monster['id']
+            self.name = monster['nom']
+            self.level = monster['level']
+            self.stats = monster['stats']
+            self.elemental_damage = monster.get('elementalDamage')
+
+# --- Compilation des compétences ---
+#
+# Tout ce qui ne change pas d'un tour à l'autre (valeurs de rang, réduction
+# d'armure, puissance des sorts, fusion DmgElems/BonusDmg, résistances du
+# monstre) est calculé une seule fois dans un plan. Chaque tour n'exécute plus
+# que les tirages d'arme et les arrondis qui en dépendent, avec les mêmes
+# opérations flottantes que le calcul d'origine.
+
+# Effet 'damage' de source 'weapon' : jet uniforme sur [att_min, att_max], puis
+# ((jet * multiplier + bonus_flat_damage) * mitigation). Les bonus élémentaires sont
+# soit des paires (pourcentage, facteur de résistance), soit des entiers déjà arrondis.
+WeaponStep = namedtuple('WeaponStep', [
+    'effect_index', 'damage_type', 'att_min', 'att_max', 'multiplier', 'bonus_flat_damage', 'mitigation',
+    'bonus_types', 'percent_pairs', 'flat_bonuses'])
+# Effet sans aléa (sort, source inconnue, debuff consommé) : base puis bonus, tous arrondis.
+ConstStep = namedtuple('ConstStep', ['effect_index', 'source', 'damage_type', 'base', 'bonus_types', 'bonuses'])
+
+SkillPlan = namedtuple('SkillPlan', ['skill_id', 'steps', 'use_percentage'])
+
+# Arrondi par décalage : pour |x| < 2^51, x + 1,5 * 2^52 tombe dans un intervalle de
+# flottants espacés de 1, donc (x + _ROUND_SHIFT) - _ROUND_SHIFT arrondit x à l'entier
+# le plus proche, pair en cas d'égalité, comme round(). Le flottant obtenu s'ajoute
+# aux dégâts exactement comme l'entier de round(), sans appel de fonction.
+_ROUND_SHIFT = 1.5 * 2 ** 52
+_ROUND_SHIFT_LIMIT = 2.0 ** 50
+
+def _shift_rounds_exactly(step):
+    """Vrai si tous les bonus en pourcentage de la frappe restent dans le domaine exact de _ROUND_SHIFT."""
+    if not step.percent_pairs:
+        return True
+    peak = ((max(abs(step.att_min), abs(step.att_max)) * abs(step.multiplier) + abs(step.bonus_flat_damage))
+            * abs(step.mitigation))
+    coefficient = max(abs(p) * abs(q) for p, q in step.percent_pairs)
+    return peak * coefficient < _ROUND_SHIFT_LIMIT
+
+def compile_skill_plan(stats, level, class_id, monster, skill_to_use, skill_rank=None, debuff_stacks=0,
+                       use_percentage=None):
+    """Compile (compétence, rang, stats du joueur, monstre) en SkillPlan."""
+    if skill_rank is None:
+        skill_rank = skill_to_use.get('rangMax', 1)
+    if use_percentage is None:
+        use_percentage = USE_PERCENTAGE_BASED_FORMULA
+    resistances = monster.stats.get('ResElems', {})
+    elemental_bonuses = {**stats.get('DmgElems', {}), **stats.get('BonusDmg', {})}
+    bonus_types = tuple(elemental_bonuses)
+    res_factors = tuple(1 - max(0, min(100, resistances.get(t, 0))) / 100 for t in bonus_types)
+    percent_pairs = tuple((v / 100.0, q) for v, q in zip(elemental_bonuses.values(), res_factors))
+    flat_bonuses = tuple(calculate_elemental_damage(v, resistances.get(t, 0)) for t, v in elemental_bonuses.items())
+
+    steps = []
+    for index, effect in enumerate(skill_to_use.get('effects', [])):
+        if effect.get('type') == 'damage':
+            if effect['source'] == 'weapon':
+                steps.append(WeaponStep(
+                    effect_index=index,
+                    damage_type=effect.get('damageType'),
+                    att_min=stats.get('AttMin', 0),
+                    att_max=stats.get('AttMax', 0),
+                    multiplier=get_rank_value(effect.get('multiplier', 1), skill_rank),
+                    bonus_flat_damage=get_rank_value(effect.get('bonus_flat_damage', 0), skill_rank),
+                    mitigation=1 - calculate_armor_dr(monster.stats.get('Armure', 0), level),
+                    bonus_types=bonus_types,
+                    percent_pairs=percent_pairs if use_percentage else (),
+                    flat_bonuses=() if use_percentage else flat_bonuses))
+                continue
+
+            base = 0
+            if effect['source'] == 'spell':
+                spell_power = calculate_spell_power(stats, class_id)
+                base_spell_damage = get_rank_value(effect['baseValue'], skill_rank) * (1 + spell_power / 100)
+                base = calculate_elemental_damage(base_spell_damage, resistances.get(effect['damageType'], 0))
+            if use_percentage:
+                bonuses = tuple(round(base * p * q) for p, q in percent_pairs)
+            else:
+                bonuses = flat_bonuses
+            steps.append(ConstStep(index, effect['source'], effect.get('damageType'), base, bonus_types, bonuses))
+
+        elif effect.get('type') == 'consume_debuff_for_damage':
+            consumed_damage = effect['damage_per_stack'] * debuff_stacks
+            base = calculate_elemental_damage(consumed_damage, resistances.get(effect['damageType'], 0))
+            steps.append(ConstStep(index, 'consumed_debuff', effect['damageType'], base, (), ()))
+
+    return SkillPlan(skill_to_use['id'], tuple(steps), use_percentage)
+
+def run_skill_plan(plan, turns, rng=random):
+    """Somme des dégâts de `turns` tours ; même séquence de tirages et mêmes arrondis que la boucle d'origine."""
+    steps = plan.steps
+    random_ = rng.random
+    if not any(isinstance(step, WeaponStep) for step in steps):
+        # Tour déterministe : les termes sont des entiers, la somme répétée est exacte
+        turn_damage = 0
+        for step in steps:
+            turn_damage += step.base
+            for bonus in step.bonuses:
+                turn_damage += bonus
+        return turn_damage * turns
+
+    if not all(_shift_rounds_exactly(step) for step in steps if isinstance(step, WeaponStep)):
+        return _run_skill_plan_rounded(steps, turns, random_)
+
+    # Les bonus en pourcentage sont arrondis par décalage (x + _ROUND_SHIFT - _ROUND_SHIFT)
+    shift = _ROUND_SHIFT
+    total_damage = 0
+    if len(steps) == 1:
+        # Cas le plus courant : une seule frappe d'arme
+        step = steps[0]
+        att_min, span = step.att_min, step.att_max - step.att_min
+        multiplier, bonus_flat_damage, mitigation = step.multiplier, step.bonus_flat_damage, step.mitigation
+        percent_pairs, flat_bonuses = step.percent_pairs, step.flat_bonuses
+        # Boucles déroulées pour 0, 1 ou 2 bonus élémentaires (même ordre d'addition que le tour complet)
+        if not flat_bonuses and len(percent_pairs) == 0:
+            for _ in range(turns):
+                total_damage += ((att_min + span * random_()) * multiplier + bonus_flat_damage) * mitigation
+            return total_damage
+        if not flat_bonuses and len(percent_pairs) == 1:
+            (p1, q1), = percent_pairs
+            for _ in range(turns):
+                mitigated = ((att_min + span * random_()) * multiplier + bonus_flat_damage) * mitigation
+                total_damage += mitigated + (mitigated * p1 * q1 + shift - shift)
+            return total_damage
+        if not flat_bonuses and len(percent_pairs) == 2:
+            (p1, q1), (p2, q2) = percent_pairs
+            for _ in range(turns):
+                mitigated = ((att_min + span * random_()) * multiplier + bonus_flat_damage) * mitigation
+                total_damage += (mitigated + (mitigated * p1 * q1 + shift - shift)
+                                 + (mitigated * p2 * q2 + shift - shift))
+            return total_damage
+        for _ in range(turns):
+            mitigated = ((att_min + span * random_()) * multiplier + bonus_flat_damage) * mitigation
+            turn_damage = mitigated
+            for p, q in percent_pairs:
+                turn_damage += mitigated * p * q + shift - shift
+            for bonus in flat_bonuses:
+                turn_damage += bonus
+            total_damage += turn_damage
+        return total_damage
+
+    # Plusieurs effets : coefficients dépliés une fois, (False, base, bonus) ou (True, min, écart, ...)
+    compiled = [(True, step.att_min, step.att_max - step.att_min, step.multiplier, step.bonus_flat_damage,
+                 step.mitigation, step.percent_pairs, step.flat_bonuses) if isinstance(step, WeaponStep)
+                else (False, step.base, step.bonuses) for step in steps]
+    for _ in range(turns):
+        turn_damage = 0
+        for entry in compiled:
+            if entry[0]:
+                _, att_min, span, multiplier, bonus_flat_damage, mitigation, percent_pairs, flat_bonuses = entry
+                mitigated = ((att_min + span * random_()) * multiplier + bonus_flat_damage) * mitigation
+                turn_damage += mitigated
+                for p, q in percent_pairs:
+                    turn_damage += mitigated * p * q + shift - shift
+                for bonus in flat_bonuses:
+                    turn_damage += bonus
+            else:
+                turn_damage += entry[1]
+                for bonus in entry[2]:
+                    turn_damage += bonus
+        total_damage += turn_damage
+    return total_damage
+
+def _run_skill_plan_rounded(steps, turns, random_):
+    # Boucle de référence avec round(), pour les dégâts trop grands pour l'arrondi par décalage
+    total_damage = 0
+    for _ in range(turns):
+        turn_damage = 0
+        for step in steps:
+            if isinstance(step, WeaponStep):
+                attack_damage = step.att_min + (step.att_max - step.att_min) * random_()
+                mitigated = (attack_damage * step.multiplier + step.bonus_flat_damage) * step.mitigation
+                turn_damage += mitigated
+                for p, q in step.percent_pairs:
+                    turn_damage += round(mitigated * p * q)
+                for bonus in step.flat_bonuses:
+                    turn_damage += bonus
+            else:
+                turn_damage += step.base
+                for bonus in step.bonuses:
+                    turn_damage += bonus
+        total_damage += turn_damage
+    return total_damage
+
+def run_skill_plan_detailed(plan, turns, rng=random):
+    """Comme `run_skill_plan`, en gardant les dégâts de chaque tour et leur répartition.
+
+    Retourne (dégâts par tour, {effect_index: total}, {type de bonus: total}).
+    Mêmes tirages et mêmes additions que la boucle générique : la somme des
+    dégâts par tour, faite dans l'ordre, est identique au total de `run_skill_plan`.
+    """
+    random_ = rng.random
+    steps = plan.steps
+    by_effect = dict.fromkeys((step.effect_index for step in steps), 0)
+    by_bonus_type = dict.fromkeys((bonus_type for step in steps for bonus_type in step.bonus_types), 0)
+    turn_damages = []
+    for _ in range(turns):
+        turn_damage = 0
+        for step in steps:
+            if isinstance(step, WeaponStep):
+                attack_damage = step.att_min + (step.att_max - step.att_min) * random_()
+                mitigated = (attack_damage * step.multiplier + step.bonus_flat_damage) * step.mitigation
+                turn_damage += mitigated
+                effect_damage = mitigated
+                for bonus_type, (p, q) in zip(step.bonus_types, step.percent_pairs):
+                    bonus = round(mitigated * p * q)
+                    turn_damage += bonus
+                    effect_damage += bonus
+                    by_bonus_type[bonus_type] += bonus
+                for bonus_type, bonus in zip(step.bonus_types, step.flat_bonuses):
+                    turn_damage += bonus
+                    effect_damage += bonus
+                    by_bonus_type[bonus_type] += bonus
+            else:
+                turn_damage += step.base
+                effect_damage = step.base
+                for bonus_type, bonus in zip(step.bonus_types, step.bonuses):
+                    turn_damage += bonus
+                    effect_damage += bonus
+                    by_bonus_type[bonus_type] += bonus
+            by_effect[step.effect_index] += effect_damage
+        turn_damages.append(turn_damage)
+    return turn_damages, by_effect, by_bonus_type
+
+# --- Résultats et instrumentation ---
+
+# Centiles rapportés par CombatResult
+PERCENTILES = (5, 25, 50, 75, 95, 99)
+
+@dataclass
+class CombatResult:
+    """Résultat de `simulate_combat`. Les répartitions et la distribution ne sont remplies qu'avec detailed=True.
+
+    Les champs ci_* et converged ne sont remplis que par `simulate_combat_adaptive`.
+    """
+    class_id: str
+    level: int
+    monster_id: str
+    skill_id: str
+    turns: int
+    formula: str
+    total_damage: float = 0
+    dps: float = 0.0
+    # effect_index -> dégâts ; 'weapon' / 'spell' / 'consumed_debuff' -> dégâts ; type élémentaire -> dégâts de bonus
+    by_effect: dict = field(default_factory=dict)
+    by_source: dict = field(default_factory=dict)
+    by_bonus_type: dict = field(default_factory=dict)
+    min: float = None
+    max: float = None
+    variance: float = None
+    percentiles: dict = field(default_factory=dict)
+    ci_low: float = None
+    ci_high: float = None
+    confidence: float = None
+    converged: bool = None
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.variance is not None else None
+
+def _distribution(values):
+    """(min, max, variance, {centile: valeur}) de dégâts par tour ; centiles au rang le plus proche."""
+    ordered = sorted(values)
+    n = len(ordered)
+    mean = sum(ordered) / n
+    variance = sum((x - mean) ** 2 for x in ordered) / (n - 1) if n > 1 else 0.0
+    percentiles = {q: ordered[min(n - 1, max(0, math.ceil(q / 100 * n) - 1))] for q in PERCENTILES}
+    return ordered[0], ordered[-1], variance, percentiles
+
+class CombatHooks:
+    """Chronomètres et compteurs optionnels de `simulate_combat`.
+
+    Sans hooks (hooks=None), la simulation n'appelle rien de plus. Un même objet
+    peut être passé à de nombreuses simulations puis fusionné avec `merge`.
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counters = Counter()
+        # 'source:weapon', 'bonus:fire', ... -> dégâts cumulés (simulations detailed=True)
+        self.damage = Counter()
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def record(self, result):
+        for source, damage in result.by_source.items():
+            self.damage[f'source:{source}'] += damage
+        for bonus_type, damage in result.by_bonus_type.items():
+            self.damage[f'bonus:{bonus_type}'] += damage
+
+    def merge(self, other):
+        for name, elapsed in other.timings.items():
+            self.timings[name] += elapsed
+        self.counters.update(other.counters)
+        self.damage.update(other.damage)
+        return self
+
+    def report(self):
+        """Lignes de texte : temps par étape, compteurs et part des dégâts par composante."""
+        lines = []
+        total_time = sum(self.timings.values()) or 1
+        for name, elapsed in sorted(self.timings.items(), key=lambda kv: -kv[1]):
+            lines.append(f"  temps  {name:<20} {elapsed:10.4f}s  {elapsed / total_time:6.1%}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  compte {name:<20} {value:>12}")
+        sources = {k: v for k, v in self.damage.items() if k.startswith('source:')}
+        total_damage = sum(sources.values()) or 1
+        for name, damage in sorted(self.damage.items(), key=lambda kv: -kv[1]):
+            lines.append(f"  dégâts {name:<20} {damage:14.1f}  {damage / total_damage:6.1%}")
+        return lines
+
+def _null_timer(name):
+    return nullcontext()
 
 # --- Moteur de Simulation ---
 
-def simulate_combat(player, monster_id, skill_id, turns=100, debuff_stacks=0):
-    monster = Monster(monster_id)
+def simulate_combat(player, monster_id, skill_id, turns=100, debuff_stacks=0, rng=None, verbose=True, detailed=False,
+                    hooks=None, formula=None):
+    """Simule `turns` tours et retourne un CombatResult (dps, total ; répartitions si detailed=True).
+
+    hooks : CombatHooks optionnel qui chronomètre les étapes et compte simulations et tirages.
+    formula : 'percentage' ou 'flat' pour cet appel (par défaut USE_PERCENTAGE_BASED_FORMULA).
+    """
+    # rng : générateur dédié (random.Random) pour des tirages reproductibles ; par défaut l'état global de `random`
+    if rng is None:
+        rng = random
+    timer = _null_timer if hooks is None else hooks.timer
+    formula = resolve_formula(formula)
+    formula_name = FORMULA_NAMES[formula]
+    result = CombatResult(player.class_id, player.level, monster_id, skill_id, turns, formula_name)
+    with timer('monster'):
+        monster = Monster(monster_id, player.data)
     if not monster.id:
         print(f"--- ERREUR: Monstre '{monster_id}' non trouvé dans monsters.json ---")
-        return 0
-    total_damage = 0
+        return result
     
-    skill_to_use = next((s for s in player.skills if s['id'] == skill_id), None)
+    skill_to_use = player.get_skill(skill_id)
             
     if not skill_to_use:
         print(f"--- ERREUR: Compétence '{skill_id}' non trouvée pour la classe {player.class_id} ---")
-        return 0
+        return result
         
-    skill_rank = skill_to_use.get('rangMax', 1)
-    
-    formula_name = "Pourcentage" if USE_PERCENTAGE_BASED_FORMULA else "Dégâts Plats"
-    print(f"\n--- Simulation ({formula_name}): {player.class_id} niv {player.level} vs {monster.name} avec {skill_id} ---")
+    if verbose:
+        print(f"\n--- Simulation ({formula_name}): {player.class_id} niv {player.level} vs {monster.name} avec {skill_id} ---")
 
-    for _ in range(turns):
-        turn_damage = 0
-        
-        for effect in skill_to_use.get('effects', []):
-            if effect.get('type') == 'damage':
-                damage_effect = effect
-                base_damage_for_scaling = 0
-                
-                # --- Étape 1: Calculer les dégâts de base de la compétence ---
-                if damage_effect['source'] == 'weapon':
-                    attack_damage = calculate_player_attack_damage(player.stats)
-                    multiplier = get_rank_value(damage_effect.get('multiplier', 1), skill_rank)
-                    bonus_flat_damage = get_rank_value(damage_effect.get('bonus_flat_damage', 0), skill_rank)
-                    
-                    physical_damage_base = attack_damage * multiplier + bonus_flat_damage
-                    armor_dr = calculate_armor_dr(monster.stats.get('Armure', 0), player.level)
-                    mitigated_physical_damage = physical_damage_base * (1 - armor_dr)
-                    
-                    turn_damage += mitigated_physical_damage
-                    base_damage_for_scaling = mitigated_physical_damage
-
-                elif damage_effect['source'] == 'spell':
-                    spell_power = calculate_spell_power(player.stats, player.class_id)
-                    base_damage_from_skill = get_rank_value(damage_effect['baseValue'], skill_rank)
-                    damage_type = damage_effect['damageType']
-                    
-                    base_spell_damage = base_damage_from_skill * (1 + spell_power / 100)
-                    resistance = monster.stats.get('ResElems', {}).get(damage_type, 0)
-                    mitigated_spell_damage = calculate_elemental_damage(base_spell_damage, resistance)
-
-                    turn_damage += mitigated_spell_damage
-                    base_damage_for_scaling = mitigated_spell_damage
-
-                # --- Étape 2: Ajouter les bonus de l'équipement, basés sur les dégâts de base ---
-                elemental_bonuses = {**player.stats.get('DmgElems', {}), **player.stats.get('BonusDmg', {})}
-                for dmg_type, dmg_value in elemental_bonuses.items():
-                    elemental_damage_to_add = 0
-                    if USE_PERCENTAGE_BASED_FORMULA:
-                        elemental_damage_to_add = base_damage_for_scaling * (dmg_value / 100.0)
-                    else:
-                        elemental_damage_to_add = dmg_value
-                    
-                    resistance = monster.stats.get('ResElems', {}).get(dmg_type, 0)
-                    mitigated_elemental_damage = calculate_elemental_damage(elemental_damage_to_add, resistance)
-                    turn_damage += mitigated_elemental_damage
-
-            elif effect.get('type') == 'consume_debuff_for_damage':
-                damage_per_stack = effect['damage_per_stack']
-                damage_type = effect['damageType']
-                consumed_damage = damage_per_stack * debuff_stacks
-                resistance = monster.stats.get('ResElems', {}).get(damage_type, 0)
-                mitigated_consumed_damage = calculate_elemental_damage(consumed_damage, resistance)
-                turn_damage += mitigated_consumed_damage
+    with timer('stats'):
+        stats = player.stats
+    with timer('compile'):
+        plan = compile_skill_plan(stats, player.level, player.class_id, monster, skill_to_use,
+                                  debuff_stacks=debuff_stacks, use_percentage=formula == FORMULA_PERCENTAGE)
+    if detailed:
+        with timer('run_detailed'):
+            turn_damages, result.by_effect, result.by_bonus_type = run_skill_plan_detailed(plan, turns, rng)
+            total_damage = 0
+            for turn_damage in turn_damages:
+                total_damage += turn_damage
+        with timer('distribution'):
+            for step in plan.steps:
+                source = 'weapon' if isinstance(step, WeaponStep) else step.source
+                result.by_source[source] = result.by_source.get(source, 0) + result.by_effect[step.effect_index]
+            if turns:
+                result.min, result.max, result.variance, result.percentiles = _distribution(turn_damages)
+    else:
+        with timer('run'):
+            total_damage = run_skill_plan(plan, turns, rng)
 
-        total_damage += turn_damage
+    result.total_damage = total_damage
+    result.dps = total_damage / turns
+    if hooks is not None:
+        hooks.count('simulations')
+        hooks.count('turns', turns)
+        hooks.count('weapon_rolls', turns * sum(isinstance(step, WeaponStep) for step in plan.steps))
+        if detailed:
+            hooks.record(result)
+    if verbose:
+        print(f"-> DPS moyen sur {turns} tours: {result.dps:.2f}")
+        if detailed:
+            print(f"   min {result.min:.2f} / max {result.max:.2f} / écart-type {result.std:.2f} / "
+                  f"médiane {result.percentiles[50]:.2f} / p95 {result.percentiles[95]:.2f}")
+            for source, damage in result.by_source.items():
+                print(f"   source {source:<16} {damage / total_damage if total_damage else 0:6.1%}")
+            for bonus_type, damage in result.by_bonus_type.items():
+                print(f"   dont bonus {bonus_type:<12} {damage / total_damage if total_damage else 0:6.1%}")
+    return result
+
+# --- Arrêt séquentiel adaptatif ---
+#
+# Au lieu d'un nombre fixe de tours, la simulation avance par lots de
+# `batch_turns` tours et s'arrête dès que la demi-largeur de l'intervalle de
+# confiance du DPS, estimée sur les moyennes des lots, passe sous
+# `rel_precision` × DPS, ou quand le budget `max_turns` est atteint. Après les
+# `min_batches` premiers lots, le nombre de lots encore nécessaires est estimé
+# d'après la variance observée. Un tour sans jet d'arme est déterministe : un
+# seul tour suffit.
+
+def simulate_combat_adaptive(player, monster_id, skill_id, rel_precision=0.01, confidence=0.95, max_turns=10**6,
+                             batch_turns=250, min_batches=10, debuff_stacks=0, rng=None, verbose=True,
+                             formula=None):
+    """Simule jusqu'à la précision relative demandée (ou `max_turns`). Retourne un CombatResult.
+
+    `turns` donne le nombre de tours réellement simulés, ci_low / ci_high l'intervalle du DPS
+    et `converged` indique si la précision a été atteinte dans le budget.
+    """
+    if max_turns < 1:
+        raise ValueError(f"max_turns doit être au moins 1 (reçu : {max_turns})")
+    if rng is None:
+        rng = random
+    formula = resolve_formula(formula)
+    result = CombatResult(player.class_id, player.level, monster_id, skill_id, 0, FORMULA_NAMES[formula])
+    monster = Monster(monster_id, player.data)
+    if not monster.id:
+        print(f"--- ERREUR: Monstre '{monster_id}' non trouvé dans monsters.json ---")
+        return result
+    skill_to_use = player.get_skill(skill_id)
+    if not skill_to_use:
+        print(f"--- ERREUR: Compétence '{skill_id}' non trouvée pour la classe {player.class_id} ---")
+        return result
+    plan = compile_skill_plan(player.stats, player.level, player.class_id, monster, skill_to_use,
+                              debuff_stacks=debuff_stacks, use_percentage=formula == FORMULA_PERCENTAGE)
+
+    result.confidence = confidence
+    if not any(isinstance(step, WeaponStep) for step in plan.steps):
+        result.turns = 1
+        result.total_damage = run_skill_plan(plan, 1, rng)
+        result.dps = result.ci_low = result.ci_high = result.total_damage
+        result.converged = True
+    else:
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        # Le budget prime : lots raccourcis puis moins de lots si max_turns est petit
+        batch_turns = max(1, min(batch_turns, max_turns // min_batches))
+        max_batches = max(1, max_turns // batch_turns)
+        min_batches = min(min_batches, max_batches)
+        batch_totals = []
+        goal = min_batches
+        while True:
+            while len(batch_totals) < goal:
+                batch_totals.append(run_skill_plan(plan, batch_turns, rng))
+            batches = len(batch_totals)
+            means = [total / batch_turns for total in batch_totals]
+            mean = sum(means) / batches
+            if batches > 1:
+                half_width = z * math.sqrt(sum((m - mean) ** 2 for m in means) / (batches - 1) / batches)
+            else:
+                half_width = math.inf
+            target = rel_precision * abs(mean)
+            if half_width <= target or batches >= max_batches:
+                break
+            # Lots nécessaires d'après la variance observée (la demi-largeur décroît en 1/√n), 10 % de marge
+            needed = math.ceil(batches * (half_width / target) ** 2 * 1.1) if target else max_batches
+            goal = min(max_batches, max(batches + 1, needed))
+        result.turns = batches * batch_turns
+        result.total_damage = sum(batch_totals)
+        result.dps = result.total_damage / result.turns
+        result.ci_low, result.ci_high = mean - half_width, mean + half_width
+        result.converged = half_width <= target
+
+    if verbose:
+        status = "précision atteinte" if result.converged else "budget épuisé"
+        print(f"\n--- Simulation adaptative ({result.formula}): {player.class_id} niv {player.level} vs {monster.name} "
+              f"avec {skill_id} ---")
+        print(f"-> DPS moyen: {result.dps:.2f} [{result.ci_low:.2f}, {result.ci_high:.2f}] à {confidence:.0%} "
+              f"en {result.turns} tours ({status})")
+    return result
+
+# --- Comparaison A/B à nombres aléatoires communs ---
+#
+# Les deux variantes sont simulées sur les mêmes jets d'arme : chaque tour tire
+# un nombre uniforme par WeaponStep et l'utilise pour les deux plans. La
+# différence par tour ne garde que l'effet du changement, sans le bruit des
+# jets, et l'intervalle de confiance porte sur cette différence appariée.
 
-    average_dps = total_damage / turns
-    print(f"-> DPS moyen sur {turns} tours: {average_dps:.2f}")
-    return average_dps
+@dataclass
+class PairedComparison:
+    """Différence appariée B - A des dégâts par tour, avec son intervalle de confiance."""
+    label_a: str
+    label_b: str
+    turns: int
+    mean_a: float
+    mean_b: float
+    diff: float
+    diff_std: float
+    ci_low: float
+    ci_high: float
+    confidence: float
+    # (Var A + Var B) / Var(B - A) : facteur d'échantillons économisés par rapport à des tirages indépendants
+    variance_reduction: float
+
+    @property
+    def std_error(self):
+        return self.diff_std / math.sqrt(self.turns)
+
+def plan_turn_damage(plan, draws):
+    """Dégâts d'un tour pour des tirages uniformes donnés (un par WeaponStep), calculés comme `run_skill_plan`."""
+    turn_damage = 0
+    draw = 0
+    for step in plan.steps:
+        if isinstance(step, WeaponStep):
+            attack_damage = step.att_min + (step.att_max - step.att_min) * draws[draw]
+            draw += 1
+            mitigated = (attack_damage * step.multiplier + step.bonus_flat_damage) * step.mitigation
+            turn_damage += mitigated
+            for p, q in step.percent_pairs:
+                turn_damage += round(mitigated * p * q)
+            for bonus in step.flat_bonuses:
+                turn_damage += bonus
+        else:
+            turn_damage += step.base
+            for bonus in step.bonuses:
+                turn_damage += bonus
+    return turn_damage
+
+def run_paired_plans(plan_a, plan_b, turns, rng=random, confidence=0.95, labels=('A', 'B')):
+    """Simule deux plans sur les mêmes tirages et retourne un PairedComparison."""
+    random_ = rng.random
+    draws_per_turn = max(sum(isinstance(step, WeaponStep) for step in plan.steps) for plan in (plan_a, plan_b))
+    # Moyennes et sommes des carrés des écarts (Welford) pour A, B et B - A
+    mean_a = mean_b = mean_d = m2_a = m2_b = m2_d = 0.0
+    for n in range(1, turns + 1):
+        draws = [random_() for _ in range(draws_per_turn)]
+        a = plan_turn_damage(plan_a, draws)
+        b = plan_turn_damage(plan_b, draws)
+        d = b - a
+        delta_a, delta_b, delta_d = a - mean_a, b - mean_b, d - mean_d
+        mean_a += delta_a / n
+        mean_b += delta_b / n
+        mean_d += delta_d / n
+        m2_a += delta_a * (a - mean_a)
+        m2_b += delta_b * (b - mean_b)
+        m2_d += delta_d * (d - mean_d)
+    ddof = max(turns - 1, 1)
+    var_a, var_b, var_d = m2_a / ddof, m2_b / ddof, m2_d / ddof
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(var_d / turns) if turns else 0.0
+    if var_d > 0:
+        variance_reduction = (var_a + var_b) / var_d
+    else:
+        variance_reduction = math.inf if var_a + var_b > 0 else 1.0
+    return PairedComparison(labels[0], labels[1], turns, mean_a, mean_b, mean_d, math.sqrt(var_d),
+                            mean_d - half_width, mean_d + half_width, confidence, variance_reduction)
+
+def compare_formulas(player, monster_id, skill_id, turns=10000, debuff_stacks=0, rng=None, confidence=0.95,
+                     formula_a=FORMULA_PERCENTAGE, formula_b=FORMULA_FLAT, verbose=True):
+    """A/B des deux formules sur les mêmes jets. Retourne un PairedComparison (None si monstre ou compétence inconnus)."""
+    if rng is None:
+        rng = random
+    monster = Monster(monster_id, player.data)
+    if not monster.id:
+        print(f"--- ERREUR: Monstre '{monster_id}' non trouvé dans monsters.json ---")
+        return None
+    skill_to_use = player.get_skill(skill_id)
+    if not skill_to_use:
+        print(f"--- ERREUR: Compétence '{skill_id}' non trouvée pour la classe {player.class_id} ---")
+        return None
+    formula_a, formula_b = resolve_formula(formula_a), resolve_formula(formula_b)
+    plan_a, plan_b = (compile_skill_plan(player.stats, player.level, player.class_id, monster, skill_to_use,
+                                         debuff_stacks=debuff_stacks, use_percentage=formula == FORMULA_PERCENTAGE)
+                      for formula in (formula_a, formula_b))
+    comparison = run_paired_plans(plan_a, plan_b, turns, rng, confidence,
+                                  labels=(FORMULA_NAMES[formula_a], FORMULA_NAMES[formula_b]))
+    if verbose:
+        print(f"\n--- A/B ({comparison.label_a} -> {comparison.label_b}): {player.class_id} niv {player.level} "
+              f"vs {monster.name} avec {skill_id} ---")
+        print(f"-> DPS {comparison.mean_a:.2f} -> {comparison.mean_b:.2f} ; différence {comparison.diff:+.3f} "
+              f"[{comparison.ci_low:+.3f}, {comparison.ci_high:+.3f}] à {confidence:.0%} sur {turns} tours "
+              f"(variance réduite x{comparison.variance_reduction:.1f})")
+    return comparison
+
+# --- LISTES D'ÉQUIPEMENT VÉRIFIÉES ET CORRIGÉES (niveau 25) ---
+mage_gear = [
+    'staff_of_the_comet_caller', 'rep_magma_callers_cowl', 'set_mage_t2_shoulders', 'robes_of_the_void',
+    'set_mage_t2_gloves', 'sash_of_the_adept', 'set_mage_t2_legs', 'set_mage_t2_boots',
+    'amulet_fire_ruby', 'sapphire_ring'
+]
+berserker_gear = [
+    'axe_of_the_deathbringer', 'set_berserker_t2_helm', 'set_berserker_t2_shoulders', 'dragonscale_cuirass',
+    'set_berserker_t2_gloves', 'set_berserker_t2_belt', 'set_berserker_t2_legs', 'set_berserker_t2_boots',
+    'mark_of_the_soldier', 'iron_ring_of_power'
+]
+rogue_gear = [
+    'kingslayers_fangs', 'set_shadow_shroud_mask', 'set_rogue_t2_shoulders', 'wraithstalker_jerkin',
+    'set_rogue_t2_gloves', 'set_rogue_t2_belt', 'set_rogue_t2_leggings', 'set_rogue_t2_boots',
+    'shadow_gem_amulet', 'main_gauche'
+]
+cleric_gear = [
+    'hammer_of_divine_light', 'rep_faithsworn_diadem', 'set_cleric_t2_shoulders', 'vestments_of_the_redeemer',
+    'set_cleric_t2_gloves', 'set_cleric_t2_belt', 'set_cleric_t2_legs', 'set_cleric_t2_boots',
+    'silver_amulet', 'wooden_shield' # 'ring_of_divine_favor' n'existe pas
+]
+
+DEFAULT_GEAR = {
+    'berserker': berserker_gear,
+    'rogue': rogue_gear,
+    'mage': mage_gear,
+    'cleric': cleric_gear,
+}
+
+# --- Mode analytique : espérance et variance exactes ---
+#
+# Le jet d'arme X est uniforme sur [AttMin, AttMax] ; les dégâts physiques
+# L = (X * multiplicateur + bonus) * (1 - DR) sont donc uniformes eux aussi.
+# Les bonus élémentaires en pourcentage ajoutent round(L * c), une fonction en
+# escalier de L : entre deux points de rupture (L * c = k + 0.5), les dégâts du
+# tour valent L + constante, ce qui donne les moments exacts segment par segment.
+
+@dataclass
+class DpsEstimate:
+    """Espérance et variance des dégâts d'un tour. `fallbacks` liste les effets estimés par Monte Carlo."""
+    mean: float
+    variance: float
+    fallbacks: list = field(default_factory=list)
+
+    @property
+    def exact(self):
+        return not self.fallbacks
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+def _count_rounding_breakpoints(lo, hi, coeffs):
+    count = 0
+    for c in coeffs:
+        a, b = sorted((c * lo, c * hi))
+        count += max(0, math.floor(b - 0.5) - math.ceil(a - 0.5) + 1)
+    return count
+
+def _uniform_rounded_moments(lo, hi, coeffs):
+    """Moments exacts de g(L) = L + somme(round(L * c)) pour L uniforme sur [lo, hi]."""
+    points = [lo, hi]
+    for c in coeffs:
+        a, b = sorted((c * lo, c * hi))
+        for k in range(math.ceil(a - 0.5), math.floor(b - 0.5) + 1):
+            t = (k + 0.5) / c
+            if lo < t < hi:
+                points.append(t)
+    points.sort()
+    width = hi - lo
+    mean = second_moment = 0.0
+    for u, v in zip(points, points[1:]):
+        if v <= u: continue
+        mid = (u + v) / 2
+        step = sum(round(mid * c) for c in coeffs)
+        weight = (v - u) / width
+        mean += weight * (mid + step)
+        second_moment += weight * ((u * u + u * v + v * v) / 3 + 2 * step * mid + step * step)
+    return mean, max(0.0, second_moment - mean * mean)
+
+def expected_dps(player, monster_id, skill_id, debuff_stacks=0, max_segments=100000, fallback_samples=100000, seed=0,
+                 formula=None):
+    """Espérance et variance exactes des dégâts par tour du modèle de `simulate_combat`.
+
+    Un effet d'arme dont la fonction en escalier dépasse `max_segments` segments
+    est estimé par Monte Carlo (`fallback_samples` tirages) et signalé dans `fallbacks`.
+    """
+    monster = Monster(monster_id, player.data)
+    if not monster.id:
+        print(f"--- ERREUR: Monstre '{monster_id}' non trouvé dans monsters.json ---")
+        return DpsEstimate(0, 0)
+    skill_to_use = player.get_skill(skill_id)
+    if not skill_to_use:
+        print(f"--- ERREUR: Compétence '{skill_id}' non trouvée pour la classe {player.class_id} ---")
+        return DpsEstimate(0, 0)
+    return estimate_turn_damage(player.stats, player.level, player.class_id, monster, skill_to_use,
+                                debuff_stacks, max_segments, fallback_samples, seed, formula)
+
+def estimate_turn_damage(stats, level, class_id, monster, skill_to_use, debuff_stacks=0, max_segments=100000,
+                         fallback_samples=100000, seed=0, formula=None):
+    """Cœur de `expected_dps` sur des stats brutes (sans Character), pour les recherches de builds."""
+    plan = compile_skill_plan(stats, level, class_id, monster, skill_to_use, debuff_stacks=debuff_stacks,
+                              use_percentage=resolve_formula(formula) == FORMULA_PERCENTAGE)
+    return estimate_plan(plan, max_segments, fallback_samples, seed)
+
+def estimate_plan(plan, max_segments=100000, fallback_samples=100000, seed=0):
+    """Espérance et variance exactes des dégâts d'un tour d'un SkillPlan compilé."""
+    estimate = DpsEstimate(0.0, 0.0)
+    for step in plan.steps:
+        if isinstance(step, ConstStep):
+            estimate.mean += step.base + sum(step.bonuses)
+            continue
+
+        lo, hi = sorted(((step.att_min * step.multiplier + step.bonus_flat_damage) * step.mitigation,
+                         (step.att_max * step.multiplier + step.bonus_flat_damage) * step.mitigation))
+        percent_pairs = step.percent_pairs
+        coeffs = [p * q for p, q in percent_pairs if p * q]
+        if hi == lo:
+            estimate.mean += lo + sum(round(lo * p * q) for p, q in percent_pairs) + sum(step.flat_bonuses)
+        elif not coeffs:
+            estimate.mean += (lo + hi) / 2 + sum(step.flat_bonuses)
+            estimate.variance += (hi - lo) ** 2 / 12
+        elif _count_rounding_breakpoints(lo, hi, coeffs) <= max_segments:
+            mean, variance = _uniform_rounded_moments(lo, hi, coeffs)
+            estimate.mean += mean
+            estimate.variance += variance
+        else:
+            rng = random.Random(f"{seed}:{step.effect_index}")
+            samples = []
+            for _ in range(fallback_samples):
+                physical = lo + (hi - lo) * rng.random()
+                samples.append(physical + sum(round(physical * p * q) for p, q in percent_pairs))
+            mean = sum(samples) / len(samples)
+            estimate.mean += mean
+            estimate.variance += sum((x - mean) ** 2 for x in samples) / (len(samples) - 1)
+            estimate.fallbacks.append(
+                f"effet #{step.effect_index} (weapon): plus de {max_segments} segments, "
+                f"estimé par Monte Carlo sur {fallback_samples} tirages")
+    return estimate
+
+# --- Outils communs des scripts (campagnes, donjons, serveur...) ---
+
+# Personnages équipés gardés en mémoire par processus, (classe, niveau, équipement) -> Character
+PLAYER_CACHE_SIZE = 256
+_player_cache = OrderedDict()
+
+def cached_player(class_id, level, gear):
+    """Character équipé de `gear` (tuple d'identifiants), partagé via un cache LRU : à ne pas modifier."""
+    key = (class_id, level, tuple(gear))
+    player = _player_cache.get(key)
+    if player is None:
+        player = Character(level=level, class_id=class_id)
+        player.equip_set(list(gear))
+        _player_cache[key] = player
+        while len(_player_cache) > PLAYER_CACHE_SIZE:
+            _player_cache.popitem(last=False)
+    else:
+        _player_cache.move_to_end(key)
+    return player
+
+@contextmanager
+def cli_errors(file=None):
+    """Pour les blocs __main__ : affiche une donnée manquante ou un paramètre invalide puis quitte (code 1)."""
+    try:
+        yield
+    except FileNotFoundError as e:
+        print(f"--- ERREUR CRITIQUE: Fichier de données non trouvé. Détail de l'erreur: {e} ---", file=file)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"--- ERREUR: {e} ---", file=file)
+        sys.exit(1)
 
 # --- Bloc d'Exécution ---
 if __name__ == '__main__':
-    # --- LISTES D'ÉQUIPEMENT VÉRIFIÉES ET CORRIGÉES ---
-    mage_gear = [
-        'staff_of_the_comet_caller', 'rep_magma_callers_cowl', 'set_mage_t2_shoulders', 'robes_of_the_void',
-        'set_mage_t2_gloves', 'sash_of_the_adept', 'set_mage_t2_legs', 'set_mage_t2_boots',
-        'amulet_fire_ruby', 'sapphire_ring'
-    ]
-    berserker_gear = [
-        'axe_of_the_deathbringer', 'set_berserker_t2_helm', 'set_berserker_t2_shoulders', 'dragonscale_cuirass',
-        'set_berserker_t2_gloves', 'set_berserker_t2_belt', 'set_berserker_t2_legs', 'set_berserker_t2_boots',
-        'mark_of_the_soldier', 'iron_ring_of_power'
-    ]
-    rogue_gear = [
-        'kingslayers_fangs', 'set_shadow_shroud_mask', 'set_rogue_t2_shoulders', 'wraithstalker_jerkin',
-        'set_rogue_t2_gloves', 'set_rogue_t2_belt', 'set_rogue_t2_leggings', 'set_rogue_t2_boots',
-        'shadow_gem_amulet', 'main_gauche'
-    ]
-    cleric_gear = [
-        'hammer_of_divine_light', 'rep_faithsworn_diadem', 'set_cleric_t2_shoulders', 'vestments_of_the_redeemer',
-        'set_cleric_t2_gloves', 'set_cleric_t2_belt', 'set_cleric_t2_legs', 'set_cleric_t2_boots',
-        'silver_amulet', 'wooden_shield' # 'ring_of_divine_favor' n'existe pas
-    ]
-    
+    try:
+        game_data.loader.load('items.json')
+        game_data.loader.load('monsters.json')
+        game_data.loader.load('skills.json')
+        game_data.loader.load('classes.json')
+    except FileNotFoundError as e:
+        print(f"--- ERREUR CRITIQUE: Fichier de données non trouvé. Vérifiez la structure de vos dossiers. ---")
+        print(f"Le script s'attend à trouver un dossier 'data' dans le même répertoire que lui.")
+        print(f"Détail de l'erreur: {e}")
+        sys.exit(1)
+
     print("--- SIMULATIONS AVEC ÉQUIPEMENT COMPLET (Niveau 25) ---")
     
     player_berserker = Character(level=25, class_id='berserker')
-    player_berserker.equip_set(berserker_gear)
+    player_berserker.equip_set(DEFAULT_GEAR['berserker'])
     simulate_combat(player_berserker, 'cinder_lord', 'berserker_heroic_strike')
     
     player_shadow_rogue = Character(level=25, class_id='rogue')
-    player_shadow_rogue.equip_set(rogue_gear)
+    player_shadow_rogue.equip_set(DEFAULT_GEAR['rogue'])
     simulate_combat(player_shadow_rogue, 'ghoul', 'rogue_subtlety_surprise_attack')
     
     player_fire_mage = Character(level=25, class_id='mage')
-    player_fire_mage.equip_set(mage_gear)
+    player_fire_mage.equip_set(DEFAULT_GEAR['mage'])
     simulate_combat(player_fire_mage, 'cinder_lord', 'mage_fire_fireball')
 
     player_cleric = Character(level=25, class_id='cleric')
-    player_cleric.equip_set(cleric_gear)
-    simulate_combat(player_cleric, 'ghoul', 'cleric_shadow_smite')
\ No newline at end of file
+    player_cleric.equip_set(DEFAULT_GEAR['cleric'])
+    simulate_combat(player_cleric, 'ghoul', 'cleric_shadow_smite')
+
+    print("\n--- COMPARAISON A/B DES FORMULES (mêmes jets d'arme) ---")
+    compare_formulas(player_berserker, 'cinder_lord', 'berserker_heroic_strike', rng=random.Random(0))
+    compare_formulas(player_shadow_rogue, 'ghoul', 'rogue_subtlety_surprise_attack', rng=random.Random(0))
+    compare_formulas(player_fire_mage, 'cinder_lord', 'mage_fire_fireball', rng=random.Random(0))
+    compare_formulas(player_cleric, 'ghoul', 'cleric_shadow_smite', rng=random.Random(0))
@@ -0,0 +1,270 @@
+# Duel joueur contre monstre : les deux camps attaquent, jusqu'à la mort de l'un d'eux.
+#
+# Le joueur frappe toutes les `Vitesse` secondes avec une seule compétence (modèle
+# de tour de `simulate_combat`), puis le jeu applique son jet de critique
+# (calculateCritChance : pas de critique si l'attaque « rate », Precision - Esquive
+# du monstre), CritDmg / 100, DamageMultiplier et arrondit le résultat.
+#
+# Le monstre frappe toutes les `Vitesse` secondes de sa fiche (enemyAttacks) :
+# esquive du joueur (Esquive %), dégâts physiques AttMin-AttMax réduits par
+# l'armure et dégâts élémentaires (`elementalDamage`) réduits par la résistance,
+# toutes deux au niveau du monstre, chacun arrondi, puis DamageReductionMultiplier.
+# Le jeu ne lance ni critique ni précision pour les monstres : CritPct, CritDmg et
+# Precision du monstre ne servent qu'avec `monster_crits=True` (même règle que le
+# joueur, pour tester un équilibrage).
+#
+# Les PV du joueur suivent calculateMaxHP. Les deux barres d'attaque partent de
+# zéro : le joueur frappe aux instants k × Vj, le monstre aux instants k × Vm. À
+# instant égal, le joueur frappe d'abord (ordre de la boucle de combat), donc un
+# monstre tué à cet instant ne frappe pas.
+#
+# Les instants de frappe ne dépendent pas des jets : tous les combats d'un monstre
+# avancent ensemble par fenêtres de temps. Dans chaque fenêtre, les frappes des deux
+# camps sont tirées d'un bloc avec NumPy, la première mort (monstre ou joueur) de
+# chaque combat décide de son issue, et seuls les combats indécis continuent.
+#
+# Exemple :
+#   python duel_simulation.py --class berserker --level 25 --skill berserker_heroic_strike
+
+import argparse
+import csv
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+import damage_simulation as sim
+from dungeon_simulation import MAX_DRAWS_PER_CHUNK, expected_hit_taken
+from item_generator import js_round
+from vectorized_simulation import stack_plans, sample_turn_damage
+
+# Tolérance sur la comparaison des instants de frappe (Vitesse décimales)
+TIME_EPSILON = 1e-9
+
+FIELDNAMES = ['monster_id', 'name', 'level', 'fights', 'player_hp', 'monster_hp', 'survival', 'time_to_kill',
+              'ttk_p90', 'time_to_death', 'hp_left', 'damage_taken']
+
+
+@dataclass
+class DuelResult:
+    """Résultats de `fights` duels contre un monstre (temps en secondes).
+
+    time_to_kill : temps moyen nécessaire au joueur pour tuer le monstre (s'il survivait) ;
+    time_to_death : temps moyen avant la mort du joueur, sur les duels perdus (nan sans défaite) ;
+    hp_left : fraction moyenne des PV restants, sur les duels gagnés (nan sans victoire).
+    """
+    monster_id: str
+    name: str
+    level: int
+    fights: int
+    player_hp: float
+    monster_hp: float
+    survival: float
+    time_to_kill: float
+    ttk_p90: float
+    time_to_death: float
+    hp_left: float
+    damage_taken: float
+
+
+def crit_factor(stats, target_stats):
+    """Multiplicateur moyen des critiques du jeu : chance de toucher × CritPct, × CritDmg / 100."""
+    hit_chance = max(0, min(100, stats.get('Precision', 0) - target_stats.get('Esquive', 0))) / 100
+    crit_chance = max(0, min(100, stats.get('CritPct', 0))) / 100 * hit_chance
+    return 1 + crit_chance * (stats.get('CritDmg', 100) / 100 - 1)
+
+
+def _roll_crits(damage, stats, target_stats, rng):
+    # calculateCritChance : Math.random() > hitChance annule le critique, puis CritPct
+    hit_chance = min(100, stats.get('Precision', 0) - target_stats.get('Esquive', 0)) / 100
+    crit = (rng.random(damage.shape) <= hit_chance) & (rng.random(damage.shape) * 100 < stats.get('CritPct', 0))
+    return np.where(crit, damage * (stats.get('CritDmg', 100) / 100), damage)
+
+
+def player_hits(player_stats, monster, weapon_terms, constant):
+    """Tireur des dégâts d'une frappe du joueur : tour de compétence, critique, DamageMultiplier, arrondi."""
+    multiplier = player_stats.get('DamageMultiplier', 1)
+
+    def draw(shape, rng):
+        damage = sample_turn_damage(weapon_terms, constant, 0, shape, rng)
+        return js_round(_roll_crits(damage, player_stats, monster.stats, rng) * multiplier)
+    return draw
+
+
+def monster_hits(player_stats, monster, monster_crits=False):
+    """Tireur des dégâts d'une frappe du monstre sur le joueur (calculateAttackDamage)."""
+    stats = monster.stats
+    dodge = player_stats.get('Esquive', 0)
+    armor_factor = 1 - sim.calculate_armor_dr(player_stats.get('Armure', 0), monster.level)
+    elemental = monster.elemental_damage
+    if elemental:
+        resistance = (player_stats.get('ResElems') or {}).get(elemental['type'], 0)
+        resistance_factor = 1 - sim.calculate_resistance_dr(resistance, monster.level)
+    reduction = player_stats.get('DamageReductionMultiplier') or 1
+
+    def draw(shape, rng):
+        damage = js_round(rng.uniform(stats.get('AttMin', 0), stats.get('AttMax', 0), size=shape) * armor_factor)
+        if elemental:
+            damage += js_round(rng.uniform(elemental['min'], elemental['max'], size=shape) * resistance_factor)
+        if monster_crits:
+            damage = _roll_crits(damage, stats, player_stats, rng)
+        damage = js_round(damage * reduction)
+        return np.where(rng.random(shape) * 100 < dodge, 0.0, damage)
+    return draw
+
+
+def _attack_times(done, until, interval):
+    # Instants des frappes suivant les `done` premières, jusqu'à `until` inclus
+    last = int(np.floor(until / interval + TIME_EPSILON))
+    return np.arange(done + 1, last + 1) * interval
+
+
+def simulate_duel(player, monster_id, skill_id, fights=10000, seed=None, rng=None, debuff_stacks=0,
+                  monster_crits=False):
+    """Simule `fights` duels du personnage équipé contre un monstre ; retourne un DuelResult."""
+    monster = sim.Monster(monster_id, player.data)
+    if not monster.id:
+        raise ValueError(f"Monstre '{monster_id}' non trouvé dans monsters.json")
+    skill = player.get_skill(skill_id)
+    if not skill:
+        raise ValueError(f"Compétence '{skill_id}' non trouvée pour la classe {player.class_id}")
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    stats = player.stats
+    player_hp = sim.calculate_max_hp(player.level, stats)
+    monster_hp = monster.stats.get('PV', 0)
+    player_interval = stats.get('Vitesse', 1)
+    monster_interval = monster.stats.get('Vitesse', 1)
+
+    plan = sim.compile_skill_plan(stats, player.level, player.class_id, monster, skill, debuff_stacks=debuff_stacks)
+    player_mean = sim.estimate_plan(plan).mean * crit_factor(stats, monster.stats) * stats.get('DamageMultiplier', 1)
+    monster_mean = expected_hit_taken(stats, monster)
+    if monster_crits:
+        monster_mean *= crit_factor(monster.stats, stats)
+    if player_mean <= 0:
+        # Monstre insensible à la compétence : le joueur ne peut pas gagner (mort estimée en moyenne)
+        death_time = player_hp / monster_mean * monster_interval if monster_mean > 0 else float('inf')
+        return DuelResult(monster.id, monster.name, monster.level, fights, player_hp, monster_hp, 0.0,
+                          float('nan'), float('nan'), death_time, float('nan'), float(player_hp))
+
+    weapon_terms, constant = stack_plans([plan])
+    draw_player = player_hits(stats, monster, weapon_terms, constant)
+    draw_monster = monster_hits(stats, monster, monster_crits)
+    rates = [player_mean / player_interval] + ([monster_mean / monster_interval] if monster_mean > 0 else [])
+
+    monster_left = np.full(fights, float(monster_hp))
+    player_left = np.full(fights, float(player_hp))
+    end_time = np.zeros(fights)
+    won = np.zeros(fights, dtype=bool)
+    alive = np.arange(fights)
+    now, player_swings, monster_swings = 0.0, 0, 0
+    while alive.size:
+        # Fenêtre de temps commune à tous les combats restants : assez longue pour que le plus
+        # rapide des deux camps finisse presque tous les combats, bornée en mémoire
+        horizon = min(monster_left[alive].max() / rates[0],
+                      player_left[alive].max() / rates[1] if len(rates) > 1 else float('inf')) * 1.25
+        budget = MAX_DRAWS_PER_CHUNK // alive.size
+        horizon = min(horizon, budget * min(player_interval, monster_interval) / 2)
+        until = max(now + horizon, min((player_swings + 1) * player_interval,
+                                       (monster_swings + 1) * monster_interval))
+        player_times = _attack_times(player_swings, until, player_interval)
+        monster_times = _attack_times(monster_swings, until, monster_interval) if len(rates) > 1 else np.zeros(0)
+
+        dealt = np.cumsum(draw_player((alive.size, player_times.size), rng), axis=1)
+        killed = dealt >= monster_left[alive, None]
+        kill_time = np.where(killed.any(axis=1), player_times[killed.argmax(axis=1)], np.inf) \
+            if player_times.size else np.full(alive.size, np.inf)
+        taken = np.cumsum(draw_monster((alive.size, monster_times.size), rng), axis=1)
+        died = taken >= player_left[alive, None]
+        death_time = np.where(died.any(axis=1), monster_times[died.argmax(axis=1)], np.inf) \
+            if monster_times.size else np.full(alive.size, np.inf)
+
+        # À instant égal le joueur frappe d'abord : le monstre ne frappe qu'avant la mise à mort
+        wins = np.isfinite(kill_time) & (kill_time <= death_time + TIME_EPSILON)
+        losses = ~wins & np.isfinite(death_time)
+        hits_before = np.searchsorted(monster_times, kill_time - TIME_EPSILON, side='left')
+        taken_before = np.where(hits_before > 0, taken[np.arange(alive.size), np.maximum(hits_before - 1, 0)], 0) \
+            if monster_times.size else np.zeros(alive.size)
+        finished = alive[wins]
+        won[finished] = True
+        end_time[finished] = kill_time[wins]
+        player_left[finished] -= taken_before[wins]
+        end_time[alive[losses]] = death_time[losses]
+        player_left[alive[losses]] = 0
+
+        going = ~wins & ~losses
+        rows = alive[going]
+        if player_times.size:
+            monster_left[rows] -= dealt[going, -1]
+        if monster_times.size:
+            player_left[rows] -= taken[going, -1]
+        alive = rows
+        now = until
+        player_swings += player_times.size
+        monster_swings += monster_times.size
+
+    lost = ~won
+    kill_times = end_time[won]
+    return DuelResult(
+        monster_id=monster.id, name=monster.name, level=monster.level, fights=fights, player_hp=player_hp,
+        monster_hp=monster_hp, survival=float(won.mean()),
+        time_to_kill=float(kill_times.mean()) if won.any() else float('nan'),
+        ttk_p90=float(np.percentile(kill_times, 90)) if won.any() else float('nan'),
+        time_to_death=float(end_time[lost].mean()) if lost.any() else float('nan'),
+        hp_left=float((player_left[won] / player_hp).mean()) if won.any() else float('nan'),
+        damage_taken=float((player_hp - player_left).mean()))
+
+
+def duel_seed(base_seed, class_id, level, skill_id, monster_id):
+    """Graine propre à un duel, stable d'une exécution à l'autre."""
+    return random.Random(f"{base_seed}:{class_id}:{level}:{skill_id}:{monster_id}").getrandbits(64)
+
+
+def run_all_monsters(player, skill_id, fights=10000, base_seed=0, monster_ids=None, debuff_stacks=0,
+                     monster_crits=False):
+    """Duels contre chaque monstre (tous ceux de monsters.json par défaut). Retourne les DuelResult dans l'ordre."""
+    monster_ids = monster_ids or list(player.data.monsters)
+    return [simulate_duel(player, monster_id, skill_id, fights=fights, debuff_stacks=debuff_stacks,
+                          seed=duel_seed(base_seed, player.class_id, player.level, skill_id, monster_id),
+                          monster_crits=monster_crits)
+            for monster_id in monster_ids]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Duels d'un build contre tous les monstres : temps de mise à mort "
+                                                 "et probabilité de survie.")
+    parser.add_argument('--class', dest='class_id', default='berserker')
+    parser.add_argument('--level', type=int, default=25)
+    parser.add_argument('--skill', default='berserker_heroic_strike')
+    parser.add_argument('--monsters', nargs='*', help="Identifiants des monstres (tous par défaut)")
+    parser.add_argument('--fights', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--monster-crits', action='store_true',
+                        help="Applique CritPct/CritDmg/Precision aux monstres (ignorés par le jeu)")
+    parser.add_argument('--output', help="Fichier CSV optionnel")
+    args = parser.parse_args()
+
+    with sim.cli_errors():
+        start = time.perf_counter()
+        player = sim.Character(level=args.level, class_id=args.class_id)
+        player.equip_set(sim.DEFAULT_GEAR.get(args.class_id, []))
+        results = run_all_monsters(player, args.skill, fights=args.fights, base_seed=args.seed,
+                                   monster_ids=args.monsters, monster_crits=args.monster_crits)
+    elapsed = time.perf_counter() - start
+
+    print(f"--- Duels: {args.class_id} niv {args.level} avec {args.skill} ({args.fights} combats chacun, "
+          f"{results[0].player_hp if results else 0:.0f} PV) ---")
+    for r in results:
+        if r.survival > 0:
+            outcome = (f"mise à mort {r.time_to_kill:>7.1f}s (p90 {r.ttk_p90:>7.1f}s)  "
+                       f"PV restants {r.hp_left:>6.1%}")
+        else:
+            outcome = f"mort du joueur en {r.time_to_death:.1f}s"
+        print(f"{r.monster_id:<28} niv {r.level:>2}  survie {r.survival:>7.1%}  {outcome}")
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(asdict(r) for r in results)
+    print(f"-> {len(results)} monstres simulés en {elapsed:.2f}s")
@@ -0,0 +1,271 @@
+# Simulation d'un donjon complet (dungeons.json) pour vérifier le rythme de progression.
+#
+# Un donjon se déroule comme dans gameStore.ts : des groupes de 1 à 3 monstres
+# tirés au hasard parmi les monstres non-boss du donjon apparaissent jusqu'à
+# atteindre `killTarget` victimes, puis le boss (`bossId`) apparaît seul. Le
+# joueur frappe une cible à la fois avec la même compétence, une frappe toutes
+# les `Vitesse` secondes, avec le modèle de dégâts de `simulate_combat`.
+#
+# Modificateurs de donjon :
+#   - `elementalResistance` du biome : ajoutée aux ResElems de tous les monstres ;
+#   - palier mondial (worldTier) : stats numériques × (1 + (worldTier - 1) * 0.25) ;
+#   - héroïque : dégâts élémentaires des familles Élémentaire/Draconien/Démon × 1.5
+#     (seule différence de combat du mode héroïque dans le jeu, elle ne change que
+#     les dégâts subis).
+#
+# Les stats des monstres d'un donjon sont compilées ensemble (un SkillPlan par
+# monstre, empilés pour NumPy). Pour chaque monstre, `pool_size` mises à mort sont
+# simulées frappe par frappe ; les parcours complets tirent ensuite leurs mises à
+# mort dans ces échantillons. Les 48 donjons, en normal et en héroïque, sont
+# répartis sur un pool de processus.
+#
+# Exemple :
+#   python dungeon_simulation.py --class berserker --level 25 --skill berserker_heroic_strike
+
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from types import SimpleNamespace
+
+import numpy as np
+
+import damage_simulation as sim
+from vectorized_simulation import stack_plans, sample_turn_damage
+
+PACK_SIZES = (1, 2, 3)
+HEROIC_ELEMENTAL_MULTIPLIER = 1.5
+# Familles dont les dégâts élémentaires dépendent du donjon (startCombat)
+FAMILY_TO_ELEMENT = {'Elemental': 'biome', 'Dragonkin': 'biome', 'Demon': 'fire'}
+# Nombre maximal de jets tirés d'un coup lors d'une mise à mort (borne la mémoire)
+MAX_DRAWS_PER_CHUNK = 1 << 22
+
+FIELDNAMES = ['dungeon_id', 'name', 'palier', 'heroic', 'runs', 'kills', 'time_to_clear', 'time_std',
+              'time_p90', 'boss_time', 'damage_dealt', 'damage_taken']
+
+@dataclass
+class DungeonResult:
+    """Moyennes sur `runs` parcours d'un donjon (temps en secondes de combat)."""
+    dungeon_id: str
+    name: str
+    palier: int
+    heroic: bool
+    runs: int
+    kills: float
+    time_to_clear: float
+    time_std: float
+    time_p90: float
+    boss_time: float
+    damage_dealt: float
+    damage_taken: float
+
+
+def dungeon_monster_stats(dungeon, monster, heroic=False, world_tier=1):
+    """Stats d'un monstre dans un donjon : palier mondial, résistance du biome, dégâts élémentaires."""
+    scaling = 1 + (world_tier - 1) * 0.25
+    stats = {key: value * scaling if isinstance(value, (int, float)) else value
+             for key, value in monster['stats'].items()}
+    resistance = dungeon.get('elementalResistance')
+    if resistance:
+        res_elems = dict(stats.get('ResElems', {}))
+        res_elems[resistance['type']] = res_elems.get(resistance['type'], 0) + resistance['value']
+        stats['ResElems'] = res_elems
+
+    elemental_damage = monster.get('elementalDamage')
+    element = FAMILY_TO_ELEMENT.get(monster.get('famille'))
+    if element and not monster.get('isBoss'):
+        heroic_multiplier = HEROIC_ELEMENTAL_MULTIPLIER if heroic else 1
+        base_damage = dungeon['palier'] * 2
+        elemental_damage = {
+            'type': dungeon['biome'] if element == 'biome' else element,
+            'min': round(base_damage * 0.8 * heroic_multiplier),
+            'max': round(base_damage * 1.2 * heroic_multiplier),
+        }
+    return SimpleNamespace(id=monster['id'], name=monster['nom'], level=monster['level'], stats=stats,
+                           elemental_damage=elemental_damage)
+
+
+def expected_hit_taken(player_stats, monster):
+    """Dégâts moyens d'une attaque du monstre sur le joueur (enemyAttacks, sans critique)."""
+    stats = monster.stats
+    physical = (stats.get('AttMin', 0) + stats.get('AttMax', 0)) / 2
+    damage = physical * (1 - sim.calculate_armor_dr(player_stats.get('Armure', 0), monster.level))
+    if monster.elemental_damage:
+        elemental = (monster.elemental_damage['min'] + monster.elemental_damage['max']) / 2
+        resistance = player_stats.get('ResElems', {}).get(monster.elemental_damage['type'], 0)
+        damage += elemental * (1 - sim.calculate_resistance_dr(resistance, monster.level))
+    return damage * (1 - player_stats.get('Esquive', 0) / 100)
+
+
+def sample_kills(weapon_terms, constant, index, hp, samples, mean, rng):
+    """Simule `samples` mises à mort du monstre n° `index` ; retourne (frappes, dégâts infligés).
+
+    `mean` (dégâts moyens d'une frappe, > 0) ne sert qu'à dimensionner les blocs de tirages.
+    """
+    swings = np.zeros(samples)
+    dealt = np.zeros(samples)
+    remaining = np.full(samples, float(hp))
+    alive = np.arange(samples)
+    while alive.size:
+        # Assez de frappes pour finir presque tous les monstres restants en un bloc
+        width = int(np.ceil(remaining[alive].max() / mean * 1.25)) + 2
+        width = max(1, min(width, MAX_DRAWS_PER_CHUNK // alive.size))
+        damage = np.cumsum(sample_turn_damage(weapon_terms, constant, index, (alive.size, width), rng), axis=1)
+        killed = damage >= remaining[alive, None]
+        done = killed.any(axis=1)
+        first = killed.argmax(axis=1)
+        finished = alive[done]
+        swings[finished] += first[done] + 1
+        dealt[finished] += damage[done, first[done]]
+        unfinished = alive[~done]
+        swings[unfinished] += damage.shape[1]
+        dealt[unfinished] += damage[~done, -1]
+        remaining[unfinished] -= damage[~done, -1]
+        alive = unfinished
+    return swings, dealt
+
+
+def simulate_dungeon(player, dungeon_id, skill_id, heroic=False, runs=1000, seed=None, world_tier=1,
+                     pool_size=1000, debuff_stacks=0):
+    """Temps de nettoyage et dégâts d'un donjon complet pour un personnage équipé et une compétence."""
+    data = player.data
+    dungeon = data.get_dungeon(dungeon_id)
+    if not dungeon:
+        raise ValueError(f"Donjon '{dungeon_id}' non trouvé dans dungeons.json")
+    skill = player.get_skill(skill_id)
+    if not skill:
+        raise ValueError(f"Compétence '{skill_id}' non trouvée pour la classe {player.class_id}")
+    boss = data.get_monster(dungeon['bossId'])
+    # Même filtre que le jeu : identifiants inconnus ignorés, boss exclus des groupes
+    trash = [m for m in (data.get_monster(monster_id) for monster_id in dungeon['monsters'])
+             if m and not m.get('isBoss')]
+    if not trash:
+        raise ValueError(f"Donjon '{dungeon_id}' sans monstre combattable")
+    rng = np.random.default_rng(seed)
+
+    monsters = [dungeon_monster_stats(dungeon, m, heroic, world_tier) for m in trash + ([boss] if boss else [])]
+    plans = [sim.compile_skill_plan(player.stats, player.level, player.class_id, monster, skill,
+                                     debuff_stacks=debuff_stacks) for monster in monsters]
+    means = [sim.estimate_plan(plan).mean for plan in plans]
+    if min(means) <= 0:
+        # Un monstre insensible à la compétence (ex. résistance de biome à 100) : donjon impossible
+        return DungeonResult(dungeon['id'], dungeon['name'], dungeon['palier'], heroic, runs, 0.0,
+                             float('inf'), 0.0, float('inf'), float('inf'), 0.0, float('inf'))
+    weapon_terms, constant = stack_plans(plans)
+    pools = [sample_kills(weapon_terms, constant, i, monster.stats['PV'], pool_size, mean, rng)
+             for i, (monster, mean) in enumerate(zip(monsters, means))]
+    interval = player.stats.get('Vitesse', 1)
+    hits_taken = np.array([expected_hit_taken(player.stats, monster) for monster in monsters])
+    monster_intervals = np.array([monster.stats.get('Vitesse', 1) for monster in monsters])
+
+    # --- Groupes : tailles 1-3 jusqu'à killTarget, monstres tirés uniformément ---
+    kill_target = dungeon['killTarget']
+    pack_sizes = rng.choice(PACK_SIZES, size=(runs, kill_target))
+    kills_after_pack = np.cumsum(pack_sizes, axis=1)
+    packs_needed = (kills_after_pack < kill_target).sum(axis=1) + 1
+    total_kills = kills_after_pack[np.arange(runs), packs_needed - 1]
+    slots = int(total_kills.max())
+    active = np.arange(slots)[None, :] < total_kills[:, None]
+    # Indice du groupe de chaque mise à mort, puis première mise à mort de ce groupe
+    pack_of_slot = (np.arange(slots)[None, :, None] >= kills_after_pack[:, None, :]).sum(axis=2)
+    pack_start = np.concatenate([np.zeros((runs, 1), dtype=np.int64), kills_after_pack[:, :-1]], axis=1)
+    first_slot = np.take_along_axis(pack_start, np.minimum(pack_of_slot, kill_target - 1), axis=1)
+
+    kind = rng.integers(0, len(trash), size=(runs, slots))
+    pick = rng.integers(0, pool_size, size=(runs, slots))
+    swings = np.zeros((runs, slots))
+    dealt = np.zeros((runs, slots))
+    for i in range(len(trash)):
+        mask = kind == i
+        swings[mask] = pools[i][0][pick[mask]]
+        dealt[mask] = pools[i][1][pick[mask]]
+    kill_time = np.where(active, swings * interval, 0)
+    dealt = np.where(active, dealt, 0)
+
+    # Dégâts subis : chaque monstre d'un groupe attaque jusqu'à sa mort (cibles tuées dans l'ordre)
+    elapsed = np.cumsum(kill_time, axis=1)
+    before = np.concatenate([np.zeros((runs, 1)), elapsed[:, :-1]], axis=1)
+    alive_time = elapsed - np.take_along_axis(before, first_slot, axis=1)
+    taken = np.where(active, alive_time / monster_intervals[kind] * hits_taken[kind], 0).sum(axis=1)
+
+    clear_time = kill_time.sum(axis=1)
+    boss_time = np.zeros(runs)
+    if boss:
+        b = len(trash)
+        pick = rng.integers(0, pool_size, size=runs)
+        boss_time = pools[b][0][pick] * interval
+        dealt_boss = pools[b][1][pick]
+        # Le boss commence avec une barre d'attaque vide
+        taken += np.floor(boss_time / monster_intervals[b]) * hits_taken[b]
+        clear_time = clear_time + boss_time
+        dealt = dealt.sum(axis=1) + dealt_boss
+    else:
+        dealt = dealt.sum(axis=1)
+
+    return DungeonResult(
+        dungeon_id=dungeon['id'], name=dungeon['name'], palier=dungeon['palier'], heroic=heroic, runs=runs,
+        kills=float(total_kills.mean()) + (1 if boss else 0),
+        time_to_clear=float(clear_time.mean()), time_std=float(clear_time.std()),
+        time_p90=float(np.percentile(clear_time, 90)), boss_time=float(boss_time.mean()),
+        damage_dealt=float(dealt.mean()), damage_taken=float(taken.mean()))
+
+
+def dungeon_seed(base_seed, class_id, skill_id, dungeon_id, heroic):
+    """Graine propre à un donjon, stable d'un processus à l'autre."""
+    return random.Random(f"{base_seed}:{class_id}:{skill_id}:{dungeon_id}:{heroic}").getrandbits(64)
+
+
+def run_task(task):
+    class_id, level, gear, skill_id, dungeon_id, heroic, runs, base_seed, world_tier = task
+    player = sim.cached_player(class_id, level, gear)
+    seed = dungeon_seed(base_seed, class_id, skill_id, dungeon_id, heroic)
+    return simulate_dungeon(player, dungeon_id, skill_id, heroic=heroic, runs=runs, seed=seed, world_tier=world_tier)
+
+
+def run_all_dungeons(class_id, level, skill_id, gear=None, runs=1000, base_seed=0, workers=None, world_tier=1,
+                     dungeon_ids=None):
+    """Simule chaque donjon en normal puis en héroïque, en parallèle. Retourne les DungeonResult dans l'ordre."""
+    gear = tuple(sim.DEFAULT_GEAR.get(class_id, ()) if gear is None else gear)
+    dungeon_ids = dungeon_ids or list(sim.game_data.dungeons)
+    tasks = [(class_id, level, gear, skill_id, dungeon_id, heroic, runs, base_seed, world_tier)
+             for dungeon_id in dungeon_ids for heroic in (False, True)]
+    if workers == 1:
+        return list(map(run_task, tasks))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_task, tasks))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Temps de nettoyage de tous les donjons pour un build.")
+    parser.add_argument('--class', dest='class_id', default='berserker')
+    parser.add_argument('--level', type=int, default=25)
+    parser.add_argument('--skill', default='berserker_heroic_strike')
+    parser.add_argument('--runs', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--world-tier', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', help="Fichier CSV optionnel")
+    args = parser.parse_args()
+
+    with sim.cli_errors():
+        start = time.perf_counter()
+        results = run_all_dungeons(args.class_id, args.level, args.skill, runs=args.runs, base_seed=args.seed,
+                                   workers=args.workers, world_tier=args.world_tier)
+    elapsed = time.perf_counter() - start
+
+    print(f"--- Donjons: {args.class_id} niv {args.level} avec {args.skill} ({args.runs} parcours chacun) ---")
+    for r in results:
+        mode = 'héroïque' if r.heroic else 'normal'
+        print(f"{r.dungeon_id:<12} {mode:<9} palier {r.palier:>2}  {r.time_to_clear / 60:>8.1f} min "
+              f"(p90 {r.time_p90 / 60:.1f}, boss {r.boss_time:.0f}s)  "
+              f"infligés {r.damage_dealt:>10.0f}  subis {r.damage_taken:>9.0f}")
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(asdict(r) for r in results)
+    print(f"-> {len(results)} donjons simulés en {elapsed:.2f}s")
@@ -0,0 +1,318 @@
+# Registre des données de jeu pour les outils de simulation Python.
+#
+# Les fichiers JSON de `data/` sont chargés à la demande (un fichier n'est lu
+# que lorsqu'un index en a besoin) puis indexés une seule fois par identifiant,
+# avec quelques index secondaires (compétences par classe et niveau, objets par
+# slot, monstres par palier et famille, talents par classe, donjons par palier).
+# Les affixes procéduraux et les affixes de noms sont aussi exposés, ainsi que
+# les recettes d'artisanat (par objet produit) et les composants.
+#
+# Un instantané précompilé (pickle) de chaque fichier peut être conservé dans
+# `.cache/data_snapshot/` à la racine du dépôt, hors de `public/` que Next.js
+# publie tel quel. Il est invalidé par la date de modification et la taille du
+# JSON, puis par son empreinte SHA-256 si la date a changé. Un instantané
+# illisible (tronqué, corrompu) est ignoré et le JSON est relu.
+#
+# Pour précompiler tous les fichiers : `python game_data.py`
+
+import bisect
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import defaultdict
+from functools import cached_property
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(script_dir, 'data')
+SNAPSHOT_DIR = os.path.join(os.path.dirname(script_dir), '.cache', 'data_snapshot')
+SNAPSHOT_VERSION = 1
+
+
+def get_data_path(filename):
+    """Construit le chemin d'accès correct vers les fichiers de données."""
+    return os.path.join(DATA_DIR, filename)
+
+
+class DataLoader:
+    """Charge les fichiers JSON à la demande, avec un cache mémoire et un instantané disque optionnel."""
+
+    def __init__(self, data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR, use_snapshot=True):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir
+        self.use_snapshot = use_snapshot
+        self._cache = {}
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def load(self, filename):
+        """Retourne le contenu parsé de `filename` (lève FileNotFoundError s'il est absent)."""
+        data = self._cache.get(filename)
+        if data is None:
+            data = self._load_uncached(filename)
+            self._cache[filename] = data
+        return data
+
+    def build_snapshot(self):
+        """Précompile tous les fichiers JSON du dossier de données. Retourne les noms traités."""
+        filenames = sorted(f for f in os.listdir(self.data_dir) if f.endswith('.json'))
+        for filename in filenames:
+            self._cache[filename] = self._load_uncached(filename, force_snapshot=True)
+        return filenames
+
+    # --- Interne ---
+
+    def _snapshot_path(self, filename):
+        return os.path.join(self.snapshot_dir, filename + '.pickle')
+
+    def _load_uncached(self, filename, force_snapshot=False):
+        json_path = self.path(filename)
+        st = os.stat(json_path)
+        if not (self.use_snapshot or force_snapshot):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        snapshot = self._read_snapshot(filename)
+        if snapshot and snapshot['mtime_ns'] == st.st_mtime_ns and snapshot['size'] == st.st_size:
+            return snapshot['data']
+
+        # Date ou taille différente : on compare l'empreinte avant de reparser le JSON
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if snapshot and snapshot['sha256'] == digest:
+            data = snapshot['data']
+        else:
+            data = json.loads(raw.decode('utf-8'))
+        self._write_snapshot(filename, {
+            'version': SNAPSHOT_VERSION,
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'sha256': digest,
+            'data': data,
+        })
+        return data
+
+    def _read_snapshot(self, filename):
+        try:
+            with open(self._snapshot_path(filename), 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            # Un pickle tronqué ou corrompu peut lever à peu près n'importe quoi : on relit le JSON
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, filename, snapshot):
+        # Écriture atomique ; un dossier en lecture seule désactive simplement l'instantané
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._snapshot_path(filename))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass
+
+
+def flatten_item_stats(item):
+    """Aplatit les affixes et les stats d'un objet en deltas (clé, valeur), clé pointée ('BonusDmg.fire')."""
+    deltas = []
+    for affix in item.get('affixes', []):
+        deltas.append((affix['ref'], affix['val']))
+    for key, value in item.get('stats', {}).items():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                deltas.append((f"{key}.{sub_key}", sub_value))
+        else:
+            deltas.append((key, value))
+    return tuple(deltas)
+
+
+def _index_by_id(entries):
+    """Indexe une liste d'entrées par 'id' (la première occurrence gagne, comme les anciens parcours)."""
+    index = {}
+    for entry in entries:
+        index.setdefault(entry['id'], entry)
+    return index
+
+
+class GameData:
+    """Index des données de jeu, chacun construit à la première utilisation."""
+
+    def __init__(self, loader=None):
+        self.loader = loader or DataLoader()
+
+    # --- Index principaux ---
+
+    @cached_property
+    def items(self):
+        return _index_by_id(self.loader.load('items.json')['items'])
+
+    @cached_property
+    def monsters(self):
+        return _index_by_id(self.loader.load('monsters.json')['monsters'])
+
+    @cached_property
+    def skills(self):
+        return _index_by_id(self.loader.load('skills.json')['skills'])
+
+    @cached_property
+    def classes(self):
+        return _index_by_id(self.loader.load('classes.json')['classes'])
+
+    @cached_property
+    def talents(self):
+        return _index_by_id(self.loader.load('talents.json')['talents'])
+
+    @cached_property
+    def dungeons(self):
+        return _index_by_id(self.loader.load('dungeons.json')['dungeons'])
+
+    @cached_property
+    def affixes(self):
+        return _index_by_id(self.loader.load('affixes.json')['affixes'])
+
+    @cached_property
+    def recipes(self):
+        # recipes.json et components.json sont des listes à la racine
+        return _index_by_id(self.loader.load('recipes.json'))
+
+    @cached_property
+    def components(self):
+        return _index_by_id(self.loader.load('components.json'))
+
+    @cached_property
+    def name_affixes(self):
+        # Préfixes, adjectifs et qualificatifs des noms de butin (clés de nameAffixes.json)
+        return self.loader.load('nameAffixes.json')
+
+    # --- Index secondaires ---
+
+    @cached_property
+    def _skills_by_class(self):
+        # Compétences par classe dans l'ordre de skills.json, niveaux requis triés pour une
+        # recherche par bissection, et sélections déjà calculées par (classe, seuil)
+        by_class = defaultdict(list)
+        for skill in self.skills.values():
+            by_class[skill.get('classeId')].append(skill)
+        levels = {class_id: sorted(s.get('niveauRequis', 1) for s in skills) for class_id, skills in by_class.items()}
+        return by_class, levels, {}
+
+    @cached_property
+    def item_stat_deltas(self):
+        """Deltas de stats aplatis de chaque objet, compilés une seule fois."""
+        return {item_id: flatten_item_stats(item) for item_id, item in self.items.items()}
+
+    @cached_property
+    def items_by_slot(self):
+        by_slot = defaultdict(list)
+        for item in self.items.values():
+            by_slot[item.get('slot')].append(item)
+        return by_slot
+
+    @cached_property
+    def monsters_by_palier(self):
+        by_palier = defaultdict(list)
+        for monster in self.monsters.values():
+            by_palier[monster.get('palier')].append(monster)
+        return by_palier
+
+    @cached_property
+    def monsters_by_famille(self):
+        by_famille = defaultdict(list)
+        for monster in self.monsters.values():
+            by_famille[monster.get('famille')].append(monster)
+        return by_famille
+
+    @cached_property
+    def talents_by_class(self):
+        by_class = defaultdict(list)
+        for talent in self.talents.values():
+            by_class[talent.get('classeId')].append(talent)
+        return by_class
+
+    @cached_property
+    def recipes_by_result(self):
+        # Première recette qui produit chaque objet
+        by_result = {}
+        for recipe in self.recipes.values():
+            by_result.setdefault(recipe['result'], recipe)
+        return by_result
+
+    @cached_property
+    def dungeons_by_palier(self):
+        by_palier = defaultdict(list)
+        for dungeon in self.dungeons.values():
+            by_palier[dungeon.get('palier')].append(dungeon)
+        return by_palier
+
+    # --- Recherches par identifiant ---
+
+    def get_item(self, item_id):
+        return self.items.get(item_id)
+
+    def get_monster(self, monster_id):
+        return self.monsters.get(monster_id)
+
+    def get_skill(self, skill_id):
+        return self.skills.get(skill_id)
+
+    def get_class(self, class_id):
+        return self.classes.get(class_id)
+
+    def get_talent(self, talent_id):
+        return self.talents.get(talent_id)
+
+    def get_dungeon(self, dungeon_id):
+        return self.dungeons.get(dungeon_id)
+
+    def get_recipe(self, recipe_id):
+        return self.recipes.get(recipe_id)
+
+    def get_component(self, component_id):
+        return self.components.get(component_id)
+
+    # --- Recherches secondaires ---
+
+    def skills_for(self, class_id, level):
+        """Compétences de la classe dont le niveau requis est <= level, dans l'ordre de skills.json."""
+        by_class, levels, selections = self._skills_by_class
+        skills = by_class.get(class_id)
+        if not skills:
+            return []
+        # Tous les niveaux qui débloquent le même nombre de compétences donnent la même sélection
+        key = (class_id, bisect.bisect_right(levels[class_id], level))
+        selected = selections.get(key)
+        if selected is None:
+            selected = selections[key] = [s for s in skills if s.get('niveauRequis', 1) <= level]
+        return list(selected)
+
+    def items_for_slot(self, slot):
+        return self.items_by_slot.get(slot, [])
+
+    def monsters_for_palier(self, palier):
+        return self.monsters_by_palier.get(palier, [])
+
+    def monsters_for_famille(self, famille):
+        return self.monsters_by_famille.get(famille, [])
+
+    def talents_for_class(self, class_id):
+        return self.talents_by_class.get(class_id, [])
+
+    def dungeons_for_palier(self, palier):
+        return self.dungeons_by_palier.get(palier, [])
+
+
+if __name__ == '__main__':
+    loader = DataLoader()
+    for filename in loader.build_snapshot():
+        print(f"-> Instantané à jour : {filename}")
+    print(f"Instantanés écrits dans {loader.snapshot_dir}")
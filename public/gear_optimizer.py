@@ -0,0 +1,188 @@
+# Recherche du meilleur équipement (best-in-slot) pour une classe, un niveau,
+# une compétence et un monstre cible.
+#
+# Chaque objet est réduit une seule fois à son vecteur de deltas sur les stats
+# qui influencent les dégâts de la compétence (AttMin/AttMax pour une arme,
+# Intelligence/Esprit pour un sort, bonus élémentaires). Un build candidat est
+# évalué en additionnant ces vecteurs, sans passer par Character.equip_set.
+#
+# La recherche est un branch-and-bound en profondeur :
+#   - les objets dominés (aucune stat utile meilleure qu'un autre du même slot) sont écartés ;
+#   - les dégâts moyens (voir `estimate_turn_damage`) ne décroissent avec aucune de
+#     ces stats, donc la somme des meilleurs deltas restants par slot donne une borne
+#     supérieure : toute branche dont la borne ne dépasse pas le meilleur build est coupée.
+#
+# Exemple :
+#   python gear_optimizer.py mage 25 mage_fire_fireball cinder_lord
+
+import sys
+import time
+from dataclasses import dataclass, field
+
+import damage_simulation as sim
+
+
+@dataclass
+class GearSearchResult:
+    items: dict
+    expected_dps: float
+    search_space: int
+    evaluated: int
+    pruned: int
+    free_slots: list = field(default_factory=list)
+
+
+def can_equip(item, class_id, level):
+    """Mêmes règles que les vendeurs du jeu : tagsClasse absent, 'common' ou la classe, et niveauMin atteint."""
+    if item.get('niveauMin', 1) > level:
+        return False
+    tags = item.get('tagsClasse')
+    return tags is None or 'common' in tags or class_id in tags
+
+
+def relevant_stat_keys(skill, deltas):
+    """Stats (clés pointées) qui peuvent modifier les dégâts de la compétence."""
+    keys = set()
+    for effect in skill.get('effects', []):
+        if effect.get('type') != 'damage':
+            continue
+        if effect['source'] == 'weapon':
+            keys.update(('AttMin', 'AttMax'))
+        elif effect['source'] == 'spell':
+            keys.update(('Intelligence', 'Esprit'))
+        keys.update(k for k in deltas if k.startswith(('DmgElems.', 'BonusDmg.')))
+    return sorted(keys)
+
+
+def _project(deltas, key_index):
+    vector = [0] * len(key_index)
+    for key, value in deltas:
+        index = key_index.get(key)
+        if index is not None:
+            vector[index] += value
+    return tuple(vector)
+
+
+def _dominates(other, vector, wins_ties):
+    return all(o >= v for o, v in zip(other, vector)) and (wins_ties or other != vector)
+
+
+def _to_stats(keys, vector):
+    stats = {}
+    for key, value in zip(keys, vector):
+        if '.' in key:
+            group, sub_key = key.split('.', 1)
+            stats.setdefault(group, {})[sub_key] = value
+        else:
+            stats[key] = value
+    return stats
+
+
+def optimize_gear(class_id, level, skill_id, monster_id, data=None, debuff_stacks=0):
+    data = data or sim.game_data
+    monster = sim.Monster(monster_id, data)
+    if not monster.id:
+        raise ValueError(f"Monstre '{monster_id}' non trouvé dans monsters.json")
+    skill = data.get_skill(skill_id)
+    if not skill or skill.get('classeId') != class_id or skill.get('niveauRequis', 1) > level:
+        raise ValueError(f"Compétence '{skill_id}' non trouvée pour la classe {class_id} au niveau {level}")
+    base_stats = data.get_class(class_id)['statsBase']
+
+    # --- Candidats par slot, projetés sur les stats utiles ---
+    candidates_by_slot = {}
+    for slot, items in data.items_by_slot.items():
+        if slot is None:
+            continue
+        usable = [item for item in items if can_equip(item, class_id, level)]
+        if usable:
+            candidates_by_slot[slot] = usable
+    all_delta_keys = {key for items in candidates_by_slot.values() for item in items
+                      for key, _ in data.item_stat_deltas[item['id']]}
+    keys = relevant_stat_keys(skill, all_delta_keys | set(base_stats))
+    key_index = {key: i for i, key in enumerate(keys)}
+
+    search_space = 1
+    slots = []
+    free_slots = []
+    for slot, items in candidates_by_slot.items():
+        search_space *= len(items) + 1
+        projected = [(item['id'], _project(data.item_stat_deltas[item['id']], key_index)) for item in items]
+        projected.append((None, tuple([0] * len(keys))))
+        if all(not any(vector) for _, vector in projected):
+            free_slots.append(slot)
+            continue
+        # Élimine les objets dominés ; à égalité, le premier rencontré est conservé (un objet avant le slot vide)
+        kept = [(item_id, vector) for i, (item_id, vector) in enumerate(projected)
+                if not any(_dominates(other, vector, j < i) for j, (_, other) in enumerate(projected) if j != i)]
+        slots.append((slot, kept))
+
+    cache = {}
+
+    def score(vector):
+        value = cache.get(vector)
+        if value is None:
+            stats = _to_stats(keys, vector)
+            value = sim.estimate_turn_damage(stats, level, class_id, monster, skill, debuff_stacks).mean
+            cache[vector] = value
+        return value
+
+    start = _project(tuple(base_stats.items()), key_index)
+
+    # Slots à plus fort impact en premier, candidats triés par gain individuel
+    base_score = score(start)
+    for _, kept in slots:
+        kept.sort(key=lambda c: -score(tuple(a + b for a, b in zip(start, c[1]))))
+    slots.sort(key=lambda s: -(score(tuple(a + b for a, b in zip(start, s[1][0][1]))) - base_score))
+
+    # Borne optimiste : meilleur delta restant par stat et par slot
+    suffix_max = [tuple([0] * len(keys))] * (len(slots) + 1)
+    for depth in range(len(slots) - 1, -1, -1):
+        slot_max = tuple(max(v[i] for _, v in slots[depth][1]) for i in range(len(keys)))
+        suffix_max[depth] = tuple(a + b for a, b in zip(suffix_max[depth + 1], slot_max))
+
+    best = {'score': float('-inf'), 'choice': None}
+    counters = {'evaluated': 0, 'pruned': 0}
+    choice = [None] * len(slots)
+
+    def search(depth, vector):
+        if depth == len(slots):
+            counters['evaluated'] += 1
+            value = score(vector)
+            if value > best['score']:
+                best['score'] = value
+                best['choice'] = list(choice)
+            return
+        bound = score(tuple(a + b for a, b in zip(vector, suffix_max[depth])))
+        if bound <= best['score']:
+            counters['pruned'] += 1
+            return
+        for item_id, delta in slots[depth][1]:
+            choice[depth] = item_id
+            search(depth + 1, tuple(a + b for a, b in zip(vector, delta)))
+
+    search(0, start)
+
+    items = {slot: item_id for (slot, _), item_id in zip(slots, best['choice']) if item_id is not None}
+    return GearSearchResult(items=items, expected_dps=best['score'], search_space=search_space,
+                            evaluated=counters['evaluated'], pruned=counters['pruned'], free_slots=free_slots)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5:
+        scenarios = [(sys.argv[1], int(sys.argv[2]), sys.argv[3], sys.argv[4])]
+    else:
+        scenarios = [
+            ('berserker', 25, 'berserker_heroic_strike', 'cinder_lord'),
+            ('rogue', 25, 'rogue_subtlety_surprise_attack', 'ghoul'),
+            ('mage', 25, 'mage_fire_fireball', 'cinder_lord'),
+            ('cleric', 25, 'cleric_shadow_smite', 'ghoul'),
+        ]
+    for class_id, level, skill_id, monster_id in scenarios:
+        start = time.perf_counter()
+        result = optimize_gear(class_id, level, skill_id, monster_id)
+        elapsed = time.perf_counter() - start
+        print(f"\n--- Meilleur équipement: {class_id} niv {level} vs {monster_id} avec {skill_id} ---")
+        for slot, item_id in sorted(result.items.items()):
+            print(f"  {slot:<10} {item_id}")
+        print(f"-> DPS attendu: {result.expected_dps:.2f} (espace de recherche: {result.search_space:.3g} builds, "
+              f"{result.evaluated} évalués, {result.pruned} branches coupées, {elapsed * 1000:.0f} ms)")
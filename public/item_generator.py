@@ -0,0 +1,332 @@
+# Génération procédurale d'objets par lots, pour étudier la distribution du butin.
+#
+# Reprend `generateProceduralItem` et `generateLootItemName` (src/core/itemGenerator.ts),
+# `scaleAffixValue` (src/core/formulas.ts) et le choix des modèles de
+# `generateEquipmentLoot` (gameStore.ts), avec affixes.json et nameAffixes.json.
+#
+# Un lot n'est pas une liste de dictionnaires : chaque colonne est un tableau
+# NumPy (modèle de base, niveau, rareté, prix, valeur de chaque affixe). Les
+# affixes sont tirés sans remise avec des poids (score de biome et bonus de
+# cohérence avec les tags de l'objet) : le tirage séquentiel du jeu suit la même
+# loi que les k plus petites clés -log(U) / score, calculées pour tout le lot
+# d'un coup. Les noms, coûteux, ne sont générés qu'à la demande.
+#
+# Comme dans le jeu, un objet procédural perd les affixes de son modèle (seuls
+# ses affixes tirés comptent) ; `keep_base_affixes=True` les conserve.
+#
+# Exemple :
+#   python item_generator.py --count 1000000 --level 25 --rarity Rare --class berserker
+
+import argparse
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+import damage_simulation as sim
+from game_data import flatten_item_stats
+
+RARITIES = ("Commun", "Magique", "Rare", "Épique", "Légendaire", "Unique")
+# Nombre d'affixes [min, max] par rareté (rarityAffixCount)
+RARITY_AFFIX_COUNT = {
+    "Commun": (0, 1),
+    "Magique": (1, 2),
+    "Rare": (2, 3),
+    "Épique": (3, 4),
+    "Légendaire": (0, 0),
+    "Unique": (0, 0),
+}
+# formulas.rarityMultiplier, appliqué au prix de vente
+RARITY_MULTIPLIER = {"Commun": 1, "Magique": 1.5, "Rare": 2.5, "Épique": 5, "Légendaire": 10, "Unique": 20}
+BIOME_TAG_WEIGHT = 20
+COHERENCE_BONUS = 50
+QUALIFIER_CHANCE = 0.3
+MATERIAL_PATTERN = re.compile(r"( en | de | d'| de la )(.+)$", re.IGNORECASE)
+
+
+def js_round(x):
+    """Math.round de JavaScript (demi arrondi vers le haut), scalaire ou tableau."""
+    return np.floor(np.asarray(x) + 0.5)
+
+
+def scale_affix_value(base_value, level):
+    """scaleAffixValue : round(base + base * niveau * 0.1 + niveau * 0.5), vectorisé."""
+    return js_round(base_value + base_value * level * 0.1 + level * 0.5)
+
+
+def loot_templates(data=None, class_id=None, slot=None):
+    """Modèles de base du butin procédural (mêmes filtres que generateEquipmentLoot)."""
+    data = data or sim.game_data
+    templates = []
+    for item in data.items.values():
+        if not item.get('slot') or item['slot'] == 'potion' or item.get('set'):
+            continue
+        if item.get('rarity') in ("Légendaire", "Unique"):
+            continue
+        tags = item.get('tagsClasse') or []
+        if 'common' not in tags and (class_id is None or class_id not in tags):
+            continue
+        if slot is not None and item['slot'] != slot:
+            continue
+        templates.append(item)
+    return templates
+
+
+def affix_scores(templates, affixes, biome=None):
+    """Matrice (modèles × affixes) des poids de tirage de generateProceduralItem."""
+    scores = np.ones((len(templates), len(affixes)))
+    for j, affix in enumerate(affixes):
+        affix_tags = affix.get('tags') or []
+        biome_score = 1 + BIOME_TAG_WEIGHT * sum(tag == biome for tag in affix_tags) if biome else 1
+        for i, template in enumerate(templates):
+            base_tags = template.get('tags') or []
+            coherent = any(tag in base_tags for tag in affix_tags)
+            scores[i, j] = biome_score * (COHERENCE_BONUS if coherent else 1)
+    return scores
+
+
+@dataclass
+class ItemBatch:
+    """Lot d'objets procéduraux stocké par colonnes ; `item(i)` reconstruit l'objet n° i au format items.json."""
+    templates: list
+    affixes: list
+    base_index: np.ndarray
+    level: np.ndarray
+    rarity: np.ndarray
+    vendor_price: np.ndarray
+    # Valeur de chaque affixe (colonne j = affixes[j]) et masque des affixes tirés
+    affix_values: np.ndarray
+    affix_mask: np.ndarray
+    keep_base_affixes: bool = False
+
+    def __len__(self):
+        return len(self.base_index)
+
+    def item(self, i):
+        template = self.templates[self.base_index[i]]
+        item = {key: value for key, value in template.items() if key not in ('id', 'niveauMin', 'rarity', 'affixes')}
+        affixes = list(template.get('affixes', [])) if self.keep_base_affixes else []
+        affixes += [{'ref': self.affixes[j]['ref'], 'val': int(self.affix_values[i, j])}
+                    for j in np.flatnonzero(self.affix_mask[i])]
+        item.update({
+            'id': f"{template['id']}#{i}",
+            'baseId': template['id'],
+            'niveauMin': int(self.level[i]),
+            'rarity': RARITIES[self.rarity[i]],
+            'affixes': affixes,
+            'vendorPrice': int(self.vendor_price[i]),
+        })
+        return item
+
+    def items(self):
+        for i in range(len(self)):
+            yield self.item(i)
+
+    def stat_matrix(self):
+        """(clés de stats, tableau lots × clés) des deltas apportés par chaque objet, sans passer par des dict."""
+        refs = list(dict.fromkeys(affix['ref'] for affix in self.affixes))
+        columns = {ref: refs.index(ref) for ref in refs}
+        template_deltas = []
+        for template in self.templates:
+            source = template if self.keep_base_affixes else {'stats': template.get('stats', {})}
+            template_deltas.append(flatten_item_stats(source))
+        for deltas in template_deltas:
+            for key, _ in deltas:
+                if key not in columns:
+                    columns[key] = len(columns)
+        base = np.zeros((len(self.templates), len(columns)))
+        for t, deltas in enumerate(template_deltas):
+            for key, value in deltas:
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    base[t, columns[key]] += value
+        matrix = base[self.base_index]
+        for j, affix in enumerate(self.affixes):
+            matrix[:, columns[affix['ref']]] += np.where(self.affix_mask[:, j], self.affix_values[:, j], 0)
+        return tuple(columns), matrix
+
+    def names(self, rng=None, data=None, indices=None):
+        """Noms générés (generateLootItemName) des objets `indices` (tout le lot par défaut), dans l'ordre."""
+        rng = rng or random.Random()
+        name_affixes = (data or sim.game_data).name_affixes
+        names = []
+        for i in range(len(self)) if indices is None else indices:
+            template = self.templates[self.base_index[i]]
+            tags = list(template.get('tags') or [])
+            for j in np.flatnonzero(self.affix_mask[i]):
+                tags.extend(self.affixes[j].get('tags') or [])
+            names.append(generate_loot_item_name(template, RARITIES[self.rarity[i]], list(dict.fromkeys(tags)),
+                                                 name_affixes, rng))
+        return names
+
+
+def generate_procedural_items(templates, count, item_level, rarity, biome=None, seed=None, rng=None, data=None,
+                              keep_base_affixes=False):
+    """Génère `count` objets à partir de `templates` (modèle tiré uniformément pour chaque objet).
+
+    `item_level` et `rarity` sont des scalaires ou des tableaux de longueur `count`.
+    `biome` est celui du donjon (poids de biome des affixes). Retourne un ItemBatch.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if not templates:
+        raise ValueError("Aucun modèle d'objet à générer")
+    affixes = list((data or sim.game_data).affixes.values())
+    base_index = rng.integers(0, len(templates), size=count)
+    level = np.broadcast_to(np.asarray(item_level, dtype=np.int64), (count,)).copy()
+    codes = {name: code for code, name in enumerate(RARITIES)}
+    if isinstance(rarity, str):
+        rarity_codes = np.full(count, codes[rarity], dtype=np.int8)
+    else:
+        rarity_codes = np.array([codes[name] for name in rarity], dtype=np.int8)
+
+    # Prix : prix du modèle × multiplicateur de rareté, sinon niveau × 2
+    template_prices = np.array([template.get('vendorPrice') or 0 for template in templates], dtype=float)
+    multipliers = np.array([RARITY_MULTIPLIER[name] for name in RARITIES])[rarity_codes]
+    prices = template_prices[base_index]
+    vendor_price = np.where(prices > 0, js_round(prices * multipliers), level * 2).astype(np.int64)
+
+    # Nombre d'affixes : entier uniforme sur [min, max] de la rareté, borné par le nombre d'affixes
+    bounds = np.array([RARITY_AFFIX_COUNT[name] for name in RARITIES])[rarity_codes]
+    num_affixes = np.minimum(rng.integers(bounds[:, 0], bounds[:, 1] + 1), len(affixes))
+
+    affix_values = np.zeros((count, len(affixes)), dtype=np.int64)
+    affix_mask = np.zeros((count, len(affixes)), dtype=bool)
+    if affixes and num_affixes.any():
+        # Tirage pondéré sans remise : les k plus petites clés -log(U) / score
+        scores = affix_scores(templates, affixes, biome)[base_index]
+        keys = -np.log(rng.random((count, len(affixes)))) / scores
+        ranks = np.argsort(np.argsort(keys, axis=1), axis=1)
+        affix_mask = ranks < num_affixes[:, None]
+        lows = np.array([affix['portée'][0] for affix in affixes])
+        highs = np.array([affix['portée'][1] for affix in affixes])
+        base_values = rng.integers(lows, highs + 1, size=(count, len(affixes)))
+        affix_values = np.where(affix_mask, scale_affix_value(base_values, level[:, None]), 0).astype(np.int64)
+
+    return ItemBatch(list(templates), affixes, base_index, level, rarity_codes, vendor_price, affix_values, affix_mask,
+                     keep_base_affixes)
+
+
+def generate_loot(count, monster_level, rarity, class_id=None, slot=None, world_tier=1, dungeon_id=None, seed=None,
+                  rng=None, data=None, keep_base_affixes=False):
+    """Butin procédural d'un monstre : niveau d'objet = niveau du monstre + (palier mondial - 1) × 5."""
+    data = data or sim.game_data
+    biome = None
+    if dungeon_id is not None:
+        dungeon = data.get_dungeon(dungeon_id)
+        if dungeon is None:
+            raise ValueError(f"Donjon '{dungeon_id}' non trouvé dans dungeons.json")
+        biome = dungeon.get('biome')
+    item_level = np.asarray(monster_level) + (world_tier - 1) * 5
+    return generate_procedural_items(loot_templates(data, class_id, slot), count, item_level, rarity, biome=biome,
+                                     seed=seed, rng=rng, data=data, keep_base_affixes=keep_base_affixes)
+
+
+def power_curve(batch, player, skill_id, monster_id, indices=None, debuff_stacks=0):
+    """Dégâts moyens par tour (expected_dps) du joueur avec chaque objet du lot à la place de celui de son slot."""
+    indices = range(len(batch)) if indices is None else indices
+    dps = np.zeros(len(indices))
+    for k, i in enumerate(indices):
+        item = batch.item(i)
+        previous = player.equipment.get(item['slot'])
+        player.equip(item)
+        dps[k] = sim.expected_dps(player, monster_id, skill_id, debuff_stacks).mean
+        if previous is not None:
+            player.equip(previous)
+        else:
+            player.unequip(item['slot'])
+    return dps
+
+
+def generate_loot_item_name(base_item, rarity, tags, name_affixes, rng=random):
+    """generateLootItemName : nom accordé (genre, nombre) à partir des adjectifs et qualificatifs thématiques."""
+    form_key = f"{base_item.get('gender') or 'm'}{'p' if base_item.get('isPlural') else 's'}"
+    adjectives = [a for a in name_affixes['prefixes'] + name_affixes['suffixes_adjectives']
+                  if any(tag in tags for tag in a['tags'])]
+    qualifiers = [q for q in name_affixes['suffixes_qualifiers'] if any(tag in tags for tag in q['tags'])]
+
+    def select(entries):
+        return entries[int(rng.random() * len(entries))] if entries else None
+
+    affix_count_roll = rng.random()
+    affix_count = 0
+    if rarity == "Magique":
+        affix_count = 1
+    elif rarity == "Rare":
+        affix_count = 1 if affix_count_roll < 0.7 else 2
+    elif rarity in ("Épique", "Légendaire"):
+        affix_count = 1 if affix_count_roll < 0.2 else 2
+
+    adjective1 = adjective2 = qualifier = None
+    if affix_count > 0:
+        adjective1 = select(adjectives)
+        if adjective1 and affix_count == 2:
+            used_tags = set(adjective1['tags'])
+            adjective2 = select([a for a in adjectives if not any(tag in used_tags for tag in a['tags'])])
+        if rng.random() < QUALIFIER_CHANCE:
+            qualifier = select(qualifiers)
+
+    name = base_item['name']
+    material = ""
+    match = MATERIAL_PATTERN.search(name)
+    if match and match.start():
+        name, material = name[:match.start()].strip(), name[match.start():].strip()
+    for part in (adjective1 and adjective1[form_key], adjective2 and adjective2[form_key], material,
+                 qualifier and qualifier['text']):
+        if part:
+            name += f" {part}"
+    return re.sub(r"\s+", " ", name).strip()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Génération procédurale d'objets par lots.")
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--level', type=int, default=25, help="Niveau du monstre qui lâche le butin")
+    parser.add_argument('--rarity', default='Rare', choices=RARITIES)
+    parser.add_argument('--class', dest='class_id', help="Classe du joueur (modèles 'common' seulement sinon)")
+    parser.add_argument('--slot')
+    parser.add_argument('--world-tier', type=int, default=1)
+    parser.add_argument('--dungeon', help="Donjon d'origine (poids de biome)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-base-affixes', action='store_true',
+                        help="Conserve les affixes du modèle (le jeu les retire)")
+    parser.add_argument('--names', type=int, default=5, help="Nombre de noms d'exemple à afficher")
+    parser.add_argument('--skill', help="Compétence pour la courbe de puissance (avec --class et --monster)")
+    parser.add_argument('--monster')
+    parser.add_argument('--samples', type=int, default=2000, help="Objets évalués pour la courbe de puissance")
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error("--count doit être au moins 1")
+
+    with sim.cli_errors():
+        start = time.perf_counter()
+        batch = generate_loot(args.count, args.level, args.rarity, class_id=args.class_id, slot=args.slot,
+                              world_tier=args.world_tier, dungeon_id=args.dungeon, seed=args.seed,
+                              keep_base_affixes=args.keep_base_affixes)
+        elapsed = time.perf_counter() - start
+
+    print(f"-> {len(batch)} objets {args.rarity} générés en {elapsed * 1000:.0f} ms "
+          f"({len(batch.templates)} modèles, niveau {batch.level[0]})")
+    keys, matrix = batch.stat_matrix()
+    for k, key in enumerate(keys):
+        column = matrix[:, k]
+        present = column != 0
+        if present.any():
+            print(f"  {key:<18} présent {present.mean():6.1%}  moyenne {column[present].mean():7.2f}  "
+                  f"max {column.max():5.0f}")
+    sample = range(min(args.names, len(batch)))
+    for i, name in zip(sample, batch.names(random.Random(args.seed), indices=sample)):
+        print(f"  {name}: {batch.item(i)['affixes']}")
+
+    if args.skill and args.class_id and args.monster:
+        player = sim.Character(level=args.level, class_id=args.class_id)
+        player.equip_set(sim.DEFAULT_GEAR.get(args.class_id, []))
+        baseline = sim.expected_dps(player, args.monster, args.skill).mean
+        dps = power_curve(batch, player, args.skill, args.monster, range(min(args.samples, len(batch))))
+        quantiles = np.percentile(dps, [5, 25, 50, 75, 95])
+        print(f"\n--- Courbe de puissance: {args.class_id} niv {args.level} vs {args.monster} avec {args.skill} ---")
+        print(f"-> Équipement par défaut: {baseline:.2f} ; avec un objet tiré (p5/p25/p50/p75/p95): "
+              + " / ".join(f"{q:.2f}" for q in quantiles))
+        print(f"-> Amélioration dans {np.mean(dps > baseline):.1%} des {len(dps)} tirages")
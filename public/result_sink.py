@@ -0,0 +1,207 @@
+# Écriture en flux et reprise des campagnes de simulation.
+#
+# Les lignes de résultats sont mises en tampon puis écrites par lots, soit une
+# ligne JSON par résultat ('jsonl'), soit une ligne JSON par lot avec une liste
+# par colonne ('columnar', plus compact et rapide à relire colonne par colonne).
+#
+# Après chaque lot, les données sont synchronisées sur disque puis un point de
+# reprise est ajouté au fichier `<chemin>.checkpoint` : la taille du fichier de
+# données et les clés (build, monstre, compétence, graine) du lot. À la
+# réouverture, le fichier de données est tronqué au dernier point de reprise
+# valide (un lot interrompu est simplement refait) et les clés déjà présentes
+# sont connues : une campagne interrompue reprend sans rien recalculer.
+#
+# La première ligne du fichier de reprise enregistre le format et les paramètres
+# de la campagne (tours, précision, formule...). La reprise est refusée
+# (ValueError) si ces paramètres ont changé, ou si le fichier de données existe
+# sans point de reprise : rien n'est écrasé sans resume=False.
+#
+# Exemple :
+#   with ResultSink('campagne.jsonl') as sink:
+#       for row in rows:
+#           if sink.is_done(sink.key_of(row)): continue
+#           sink.write(row)
+
+import dataclasses
+import hashlib
+import json
+import os
+
+FORMATS = ('jsonl', 'columnar')
+DEFAULT_BATCH_SIZE = 1000
+
+# Champs d'une ligne qui forment sa clé de reprise
+KEY_FIELDS = ('build', 'monster_id', 'skill_id', 'seed')
+
+
+def build_key(class_id, level, gear):
+    """Identifiant stable d'un build : classe, niveau et empreinte de l'équipement."""
+    digest = hashlib.sha1('\n'.join(gear).encode('utf-8')).hexdigest()[:12]
+    return f"{class_id}:{level}:{digest}"
+
+
+def result_fields(result):
+    """Valeurs d'un CombatResult pour une ligne de résultats (clés d'effet converties en texte pour JSON)."""
+    fields = dataclasses.asdict(result)
+    fields['by_effect'] = {str(index): damage for index, damage in fields['by_effect'].items()}
+    fields['percentiles'] = {str(q): value for q, value in fields['percentiles'].items()}
+    return fields
+
+
+class ResultSink:
+    """Écrit des lignes de résultats par lots, avec points de reprise. S'utilise comme gestionnaire de contexte."""
+
+    def __init__(self, path, format='jsonl', batch_size=DEFAULT_BATCH_SIZE, resume=True, key_fields=KEY_FIELDS,
+                 params=None):
+        if format not in FORMATS:
+            raise ValueError(f"Format '{format}' inconnu (attendu : {', '.join(FORMATS)})")
+        self.path = path
+        self.checkpoint_path = path + '.checkpoint'
+        self.format = format
+        self.batch_size = batch_size
+        self.key_fields = key_fields
+        # Paramètres de la campagne, comparés à ceux du fichier de reprise (valeurs JSON)
+        self.params = json.loads(json.dumps(params or {}))
+        self.done = set()
+        self.written = 0
+        self._buffer = []
+        resuming = resume and os.path.exists(path)
+        offset = self._load_checkpoint() if resuming else 0
+        self._file = open(path, 'r+b' if resuming else 'wb')
+        # Tout ce qui suit le dernier point de reprise est un lot incomplet
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self._checkpoint = open(self.checkpoint_path, 'ab' if resuming else 'wb')
+        if not resuming:
+            self._write_checkpoint({'format': self.format, 'params': self.params})
+
+    def key_of(self, row):
+        return tuple(row[field] for field in self.key_fields)
+
+    def is_done(self, key):
+        return key in self.done
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Écrit le lot en attente, le synchronise sur disque puis enregistre le point de reprise."""
+        if not self._buffer:
+            return
+        if self.format == 'jsonl':
+            payload = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in self._buffer)
+        else:
+            fieldnames = list(dict.fromkeys(field for row in self._buffer for field in row))
+            columns = {field: [row.get(field) for row in self._buffer] for field in fieldnames}
+            payload = json.dumps({'rows': len(self._buffer), 'columns': columns}, ensure_ascii=False) + '\n'
+        self._file.write(payload.encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        keys = [self.key_of(row) for row in self._buffer]
+        self._write_checkpoint({'offset': self._file.tell(), 'keys': keys})
+        self.done.update(keys)
+        self.written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            self._checkpoint.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Interne ---
+
+    def _write_checkpoint(self, record):
+        self._checkpoint.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._checkpoint.flush()
+        os.fsync(self._checkpoint.fileno())
+
+    def _load_checkpoint(self):
+        """Relit les points de reprise d'un fichier de données existant ; retourne la taille de données validée.
+
+        Lève ValueError si le fichier n'a pas de point de reprise ou a été écrit avec d'autres paramètres.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            raise ValueError(f"'{self.path}' existe sans point de reprise ({self.checkpoint_path}) : "
+                             f"reprise impossible, relancer sans reprise pour l'écraser")
+        offset = 0
+        size = os.path.getsize(self.path)
+        with open(self.checkpoint_path, 'rb') as f:
+            header_line = f.readline()
+            try:
+                header = json.loads(header_line)
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or 'params' not in header:
+                raise ValueError(f"Point de reprise '{self.checkpoint_path}' sans paramètres de campagne : "
+                                 f"reprise impossible, relancer sans reprise pour l'écraser")
+            if header.get('format') != self.format or header['params'] != self.params:
+                raise ValueError(f"'{self.path}' a été écrit avec d'autres paramètres "
+                                 f"({header.get('format')}, {header['params']}) que cette campagne "
+                                 f"({self.format}, {self.params}) : relancer sans reprise ou changer de fichier")
+            valid_bytes = len(header_line)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    break
+                if record['offset'] > size:
+                    break
+                offset = record['offset']
+                valid_bytes += len(line)
+                self.done.update(tuple(key) for key in record['keys'])
+                self.written += len(record['keys'])
+        # Le fichier de reprise ne garde que les enregistrements valides
+        with open(self.checkpoint_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+        return offset
+
+
+def read_results(path):
+    """Relit un fichier écrit par ResultSink (jsonl ou columnar) ligne de résultat par ligne de résultat."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'columns' in record and 'rows' in record:
+                columns = record['columns']
+                for i in range(record['rows']):
+                    yield {field: values[i] for field, values in columns.items()}
+            else:
+                yield record
+
+
+def read_columns(path, fields=None):
+    """Colonnes {champ: liste de valeurs} d'un fichier de résultats (tous les champs par défaut)."""
+    columns = {}
+    count = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'columns' in record and 'rows' in record:
+                block, rows = record['columns'], record['rows']
+            else:
+                block, rows = {field: [value] for field, value in record.items()}, 1
+            for field in fields or block:
+                columns.setdefault(field, [None] * count).extend(block.get(field, [None] * rows))
+            count += rows
+            # Champs absents de ce lot
+            for values in columns.values():
+                if len(values) < count:
+                    values.extend([None] * (count - len(values)))
+    return columns
@@ -0,0 +1,518 @@
+# Simulateur de rotation à événements discrets, en temps réel de combat.
+#
+# Là où `simulate_combat` enchaîne des tours abstraits d'une seule compétence,
+# ce moteur fait avancer une horloge (en secondes) à l'aide d'une file de
+# priorité (heapq) d'événements datés :
+#   - action du joueur : une action (compétence ou attaque automatique) par
+#     intervalle d'attaque, `Vitesse` secondes, comme la barre d'attaque du jeu
+#     qui repart de zéro après chaque compétence ;
+#   - attaque du monstre (gain de Rage, Esquive, étourdissements) ;
+#   - fin des buffs et debuffs, ticks des dégâts sur la durée (DoT).
+#
+# La rotation est une liste de compétences par priorité : à chaque action, la
+# première compétence hors recharge et dont le coût est payable est lancée,
+# sinon le joueur fait une attaque automatique. Les dégâts de chaque frappe
+# reprennent le modèle de `simulate_combat` (SkillPlan compilé), recompilé
+# seulement quand un buff ou un debuff modifie les stats.
+#
+# Règles reprises de gameStore.ts / skillProcessor.ts : régénération de 10 Mana
+# et 20 Énergie par seconde, +5 Rage par attaque automatique et +10 par coup
+# reçu, coûts arrondis, charges arcaniques, Poison mortel, Forme d'Archonte.
+# Les effets défensifs (bouclier, soin, invulnérabilité...) sont ignorés.
+#
+# Exemple :
+#   python rotation_simulation.py
+
+import heapq
+import random
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import damage_simulation as sim
+
+# Régénération par seconde (gameTick) ; la Rage ne se régénère pas
+RESOURCE_REGEN = {'Mana': 10, 'Énergie': 20}
+RAGE_MAX = 100
+RAGE_PER_AUTO_ATTACK = 5
+RAGE_PER_HIT_TAKEN = 10
+
+# Poison mortel (applyPoisonProc) : une charge par frappe tant que le buff est actif
+DEADLY_POISON_BUFF = 'deadly_poison_buff'
+DEADLY_POISON_DEBUFF = 'deadly_poison_debuff'
+DEADLY_POISON_MAX_STACKS = 5
+DEADLY_POISON_DURATION = 12.0
+DEADLY_POISON_AP_RATIO = 0.05
+
+ARCHON_BUFF = 'archon_buff'
+STEALTH_BUFF = 'stealth'
+
+AUTO_ATTACK_ID = 'auto_attack'
+AUTO_ATTACK = {
+    'id': AUTO_ATTACK_ID,
+    'nom': 'Attaque',
+    'rangMax': 1,
+    'effects': [{'type': 'damage', 'source': 'weapon', 'multiplier': 1, 'bonus_flat_damage': 0,
+                 'damageType': 'physical'}],
+}
+
+# Types d'événements (ordre de traitement à date égale : l'ordre d'insertion)
+_PLAYER_ACTION, _MONSTER_ATTACK, _BUFF_EXPIRE, _DEBUFF_EXPIRE, _DOT_TICK = range(5)
+
+
+@dataclass
+class RotationResult:
+    """Bilan d'une simulation de rotation. `casts` et `damage_by_skill` incluent 'auto_attack' et les DoT."""
+    duration: float
+    total_damage: float
+    dps: float
+    casts: dict = field(default_factory=dict)
+    damage_by_skill: dict = field(default_factory=dict)
+    events: int = 0
+
+
+def modified_stats(stats, mods):
+    """Applique des statMods (getModifiedStats du jeu) ; `mods` est une suite de (statMod, charges).
+
+    Une stat absente vaut 0 pour un modificateur additif et 1 pour un modificateur
+    multiplicatif, pour que les buffs de type DamageMultiplier aient un effet.
+    """
+    result = dict(stats)
+    for mod, stacks in mods:
+        stat, value = mod['stat'], mod['value']
+        if not isinstance(value, (int, float)):
+            continue
+        modifier = mod.get('modifier')
+        if modifier == 'additive':
+            result[stat] = result.get(stat, 0) + value * stacks
+        elif modifier == 'multiplicative':
+            if value != 1:
+                result[stat] = result.get(stat, 1) * (1 + (value - 1) * stacks)
+        elif modifier == 'multiplicative_add':
+            result[stat] = result.get(stat, 1) * (1 + value * stacks)
+    return result
+
+
+def calculate_max_mana(level, stats):
+    # formulas.ts : aussi utilisé pour le maximum d'Énergie
+    return 50 + 15 * level + 10 * stats.get('Intelligence', 0)
+
+
+def _hit_effects(skill, rank):
+    """Effets de dégâts directs d'une compétence, multi_strike déplié en autant d'effets 'damage'."""
+    effects = []
+    for effect in skill.get('effects', []):
+        kind = effect.get('type')
+        if kind == 'damage':
+            effects.append(effect)
+        elif kind == 'multi_strike':
+            strikes = sim.get_rank_value(effect['strikes'], rank)
+            effects.extend([{**effect['damage'], 'type': 'damage'}] * strikes)
+        elif kind == 'stacking_damage_and_cost':
+            effects.append({**effect['damage'], 'type': 'damage'})
+    return effects
+
+
+def _aura_ids(skill):
+    """Buffs et debuffs de stats posés par une compétence, ou None si elle fait autre chose."""
+    ids = []
+    for effect in skill.get('effects', []):
+        kind = effect.get('type')
+        if kind == 'buff' or (kind == 'debuff' and effect.get('debuffType') == 'stat_modifier'):
+            ids.append((kind, effect['id']))
+        elif kind != 'resource_cost':
+            return None
+    return tuple(ids)
+
+
+def _find_effect(skill, kind):
+    for effect in skill.get('effects', []):
+        if effect.get('type') == kind:
+            return effect
+    return None
+
+
+class _Aura:
+    """Buff ou debuff actif : fin prévue, charges et modificateurs de stats."""
+    __slots__ = ('expires_at', 'stacks', 'stat_mods')
+
+    def __init__(self, expires_at, stacks=1, stat_mods=()):
+        self.expires_at = expires_at
+        self.stacks = stacks
+        self.stat_mods = stat_mods
+
+
+class RotationSimulator:
+    """Un combat joueur contre monstre (mannequin aux PV infinis) piloté par une file d'événements."""
+
+    def __init__(self, player, monster, rotation, rng=None):
+        self.player = player
+        self.monster = monster
+        self.rng = rng or random
+        self.skills = [player.get_skill(skill_id) for skill_id in rotation]
+        self.ranks = {skill['id']: skill.get('rangMax', 1) for skill in self.skills}
+        self.ranks[AUTO_ATTACK_ID] = 1
+
+        self.resource_type = player.data.get_class(player.class_id).get('ressource')
+        self.regen = RESOURCE_REGEN.get(self.resource_type, 0)
+        if self.resource_type == 'Rage':
+            self.resource_max, self.resource = RAGE_MAX, 0
+        else:
+            self.resource_max = self.resource = calculate_max_mana(player.level, player.stats)
+        self.resource_time = 0.0
+
+        self.now = 0.0
+        self._queue = []
+        self._seq = 0
+        self.events = 0
+        self.cooldowns = {}
+        self.buffs = {}
+        self.debuffs = {}
+        self.stealthed = False
+        self.monster_next_attack = None
+
+        self.casts = {}
+        self.damage_by_skill = {}
+        self.total_damage = 0.0
+
+        self._plans = {}
+        self._player_stats = player.stats
+        self._monster_view = monster
+        self._poison_per_stack = sim.js_round(2 * player.stats.get('Force', 0) * DEADLY_POISON_AP_RATIO)
+        # Effets de dégâts directs de chaque compétence, rangs résolus une seule fois
+        self._hit_effects = {skill['id']: _hit_effects(skill, self.ranks[skill['id']])
+                             for skill in self.skills + [AUTO_ATTACK]}
+        # Compétences de pur buff/debuff : inutile de les relancer tant que leurs effets sont actifs
+        self._aura_only = {skill['id']: _aura_ids(skill) for skill in self.skills
+                           if not self._hit_effects[skill['id']] and _aura_ids(skill)}
+
+    # --- File d'événements ---
+
+    def _push(self, at, kind, payload=None):
+        self._seq += 1
+        heapq.heappush(self._queue, (at, self._seq, kind, payload))
+
+    def run(self, duration):
+        self._push(0.0, _PLAYER_ACTION)
+        self._schedule_monster_attack(self.monster.stats.get('Vitesse', 1))
+        queue = self._queue
+        while queue and queue[0][0] <= duration:
+            at, _, kind, payload = heapq.heappop(queue)
+            self.now = at
+            self.events += 1
+            if kind == _PLAYER_ACTION:
+                self._player_action()
+            elif kind == _MONSTER_ATTACK:
+                self._monster_attack(payload)
+            elif kind == _BUFF_EXPIRE:
+                self._expire(self.buffs, payload, player_side=True)
+            elif kind == _DEBUFF_EXPIRE:
+                self._expire(self.debuffs, payload, player_side=False)
+            else:
+                self._dot_tick(*payload)
+        return RotationResult(duration, self.total_damage, self.total_damage / duration if duration else 0,
+                              self.casts, self.damage_by_skill, self.events)
+
+    # --- Stats modifiées ---
+
+    def _refresh_stats(self, player_side):
+        # Les plans compilés dépendent des stats : on les jette après chaque changement
+        if player_side:
+            mods = [(mod, aura.stacks) for aura in self.buffs.values() for mod in aura.stat_mods]
+            self._player_stats = modified_stats(self.player.stats, mods) if mods else self.player.stats
+        else:
+            mods = [(mod, aura.stacks) for aura in self.debuffs.values() for mod in aura.stat_mods]
+            stats = modified_stats(self.monster.stats, mods) if mods else self.monster.stats
+            self._monster_view = SimpleNamespace(id=self.monster.id, level=self.monster.level, stats=stats)
+        self._plans.clear()
+
+    def _plan(self, skill, consumed_stacks=0):
+        key = (skill['id'], consumed_stacks)
+        plan = self._plans.get(key)
+        if plan is None:
+            effects = self._hit_effects[skill['id']]
+            consume = _find_effect(skill, 'consume_debuff_for_damage')
+            if consume:
+                effects = effects + [consume]
+            plan = sim.compile_skill_plan(self._player_stats, self.player.level, self.player.class_id,
+                                          self._monster_view, {'id': skill['id'], 'effects': effects},
+                                          skill_rank=self.ranks[skill['id']], debuff_stacks=consumed_stacks)
+            self._plans[key] = plan
+        return plan
+
+    # --- Ressources ---
+
+    def _current_resource(self):
+        if self.regen:
+            self.resource = min(self.resource_max, self.resource + self.regen * (self.now - self.resource_time))
+        self.resource_time = self.now
+        return self.resource
+
+    def _gain_resource(self, amount):
+        self.resource = min(self.resource_max, self._current_resource() + amount)
+
+    def _cost(self, skill):
+        if ARCHON_BUFF in self.buffs:
+            return 0
+        rank = self.ranks[skill['id']]
+        cost = 0
+        cost_effect = _find_effect(skill, 'resource_cost')
+        if cost_effect:
+            cost = sim.get_rank_value(cost_effect.get('amount'), rank)
+        stacking = _find_effect(skill, 'stacking_damage_and_cost')
+        if stacking:
+            aura = self.buffs.get(stacking['stacking_buff']['id'])
+            stacks = aura.stacks if aura else 0
+            cost = stacking['cost']['base_amount'] * (1 + stacks * stacking['cost']['stack_multiplier'])
+        return sim.js_round(cost)
+
+    # --- Actions du joueur ---
+
+    def _usable(self, skill):
+        if self.cooldowns.get(skill['id'], 0) > self.now:
+            return False
+        auras = self._aura_only.get(skill['id'])
+        if auras and all(aura_id in (self.buffs if kind == 'buff' else self.debuffs) for kind, aura_id in auras):
+            return False
+        consume = _find_effect(skill, 'consume_debuff_for_damage')
+        if consume and consume['debuff_id_to_consume'] not in self.debuffs:
+            return False
+        return self._current_resource() >= self._cost(skill)
+
+    def _player_action(self):
+        for skill in self.skills:
+            if self._usable(skill):
+                self._cast(skill)
+                break
+        else:
+            self._auto_attack()
+        # Prochaine action après un intervalle complet (Vitesse courante, buffs compris)
+        self._push(self.now + self._player_stats.get('Vitesse', 1), _PLAYER_ACTION)
+
+    def _auto_attack(self):
+        self.stealthed = False
+        self._count_cast(AUTO_ATTACK_ID)
+        self._hit(AUTO_ATTACK)
+        if self.resource_type == 'Rage':
+            self._gain_resource(RAGE_PER_AUTO_ATTACK)
+
+    def _cast(self, skill):
+        skill_id = skill['id']
+        self.resource = self._current_resource() - self._cost(skill)
+        self._count_cast(skill_id)
+        rank = self.ranks[skill_id]
+
+        # Lancer une autre compétence dissipe les charges d'un sort à charges
+        for other in self.skills:
+            stacking = _find_effect(other, 'stacking_damage_and_cost')
+            if other is not skill and stacking:
+                self.buffs.pop(stacking['stacking_buff']['id'], None)
+
+        stacking = _find_effect(skill, 'stacking_damage_and_cost')
+        stack_factor = 1
+        if stacking:
+            aura = self.buffs.get(stacking['stacking_buff']['id'])
+            stack_factor = 1 + (aura.stacks if aura else 0) * stacking['damage']['stack_multiplier']
+
+        consume = _find_effect(skill, 'consume_debuff_for_damage')
+        consumed_stacks = 0
+        if consume:
+            consumed_stacks = self.debuffs.pop(consume['debuff_id_to_consume']).stacks
+            self._refresh_stats(player_side=False)
+        self._hit(skill, stack_factor, consumed_stacks)
+
+        for effect in skill.get('effects', []):
+            kind = effect.get('type')
+            if kind == 'buff':
+                self._apply_buff(effect, rank)
+            elif kind == 'debuff':
+                self._apply_debuff(effect, rank)
+            elif kind == 'stacking_damage_and_cost':
+                buff = stacking['stacking_buff']
+                aura = self.buffs.get(buff['id'])
+                stacks = min(buff['max_stacks'], (aura.stacks if aura else 0) + 1)
+                # Durée du jeu déjà exprimée en millisecondes pour ce buff
+                self._set_aura(self.buffs, buff['id'], buff['duration'] / 1000, stacks, (), _BUFF_EXPIRE)
+
+        if skill.get('cooldown'):
+            self.cooldowns[skill_id] = self.now + skill['cooldown']
+
+    def _hit(self, skill, stack_factor=1, consumed_stacks=0):
+        plan = self._plan(skill, consumed_stacks)
+        if not plan.steps:
+            return
+        multiplier = self._player_stats.get('DamageMultiplier', 1)
+        if ARCHON_BUFF in self.buffs:
+            multiplier *= 2
+        damage = 0
+        hits = 0
+        for step in plan.steps:
+            step_damage = sim.run_skill_plan(plan._replace(steps=(step,)), 1, self.rng)
+            if getattr(step, 'source', None) == 'consumed_debuff':
+                # Le jeu n'applique pas les multiplicateurs de dégâts au poison consommé
+                damage += step_damage
+            else:
+                damage += step_damage * stack_factor * multiplier
+                hits += 1
+        self._record(skill['id'], damage)
+        if hits and DEADLY_POISON_BUFF in self.buffs:
+            for _ in range(hits):
+                self._apply_poison()
+
+    def _count_cast(self, skill_id):
+        self.casts[skill_id] = self.casts.get(skill_id, 0) + 1
+
+    def _record(self, source, damage):
+        self.total_damage += damage
+        self.damage_by_skill[source] = self.damage_by_skill.get(source, 0) + damage
+
+    # --- Buffs et debuffs ---
+
+    def _set_aura(self, auras, aura_id, duration, stacks, stat_mods, expire_kind):
+        expires_at = self.now + duration
+        auras[aura_id] = _Aura(expires_at, stacks, stat_mods)
+        # Fin planifiée ; un rafraîchissement rend les anciens événements obsolètes
+        self._push(expires_at, expire_kind, (aura_id, expires_at))
+        self._refresh_stats(player_side=auras is self.buffs)
+
+    def _expire(self, auras, payload, player_side):
+        aura_id, expires_at = payload
+        aura = auras.get(aura_id)
+        if aura is None or aura.expires_at != expires_at:
+            return
+        del auras[aura_id]
+        if player_side and aura_id == STEALTH_BUFF:
+            self.stealthed = False
+        self._refresh_stats(player_side)
+
+    def _apply_buff(self, effect, rank):
+        stat_mods = tuple({**mod, 'value': sim.get_rank_value(mod['value'], rank)}
+                          for mod in effect.get('statMods') or ())
+        self._set_aura(self.buffs, effect['id'], effect['duration'], 1, stat_mods, _BUFF_EXPIRE)
+        if effect['id'] == STEALTH_BUFF:
+            self.stealthed = True
+
+    def _apply_debuff(self, effect, rank):
+        kind = effect.get('debuffType')
+        if kind == 'dot':
+            self._apply_dot(effect, rank)
+        elif kind == 'stat_modifier':
+            aura = self.debuffs.get(effect['id'])
+            stacks = 1
+            if aura and effect.get('is_stacking'):
+                stacks = min(effect.get('max_stacks') or 1, aura.stacks + 1)
+            stat_mods = tuple({**mod, 'value': sim.get_rank_value(mod['value'], rank)}
+                              for mod in effect.get('statMods') or ())
+            self._set_aura(self.debuffs, effect['id'], effect['duration'], stacks, stat_mods, _DEBUFF_EXPIRE)
+        elif kind == 'cc' and effect.get('ccType') == 'stun':
+            # L'étourdissement repousse l'attaque en cours du monstre
+            if self.monster_next_attack is not None:
+                self._schedule_monster_attack(self.monster_next_attack + effect['duration'])
+
+    def _apply_dot(self, effect, rank):
+        stats = self._player_stats
+        total_damage = effect.get('totalDamage', {})
+        source = total_damage.get('source')
+        if source == 'spell':
+            spell_power = sim.calculate_spell_power(stats, self.player.class_id)
+            total = sim.get_rank_value(total_damage.get('baseValue'), rank) * (1 + spell_power / 100)
+        elif source == 'weapon':
+            roll = sim.calculate_player_attack_damage(stats, self.rng)
+            total = roll * sim.get_rank_value(total_damage.get('multiplier'), rank)
+        else:
+            total = sim.get_rank_value(total_damage.get('multiplier'), rank)
+        if ARCHON_BUFF in self.buffs:
+            total *= 2
+        ticks = effect.get('num_ticks') or effect['duration']
+        interval = effect['duration'] / ticks
+        # Chaque application est indépendante (le jeu empile les DoT identiques)
+        self._push(self.now + interval, _DOT_TICK,
+                   (effect['id'], sim.js_round(total / ticks), interval, self.now + effect['duration'], None))
+
+    def _dot_tick(self, dot_id, damage, interval, expires_at, chain=None):
+        if chain is not None:
+            # Poison mortel : dégâts par charge × charges courantes, tant que l'application
+            # qui a lancé cette chaîne de ticks est active (une réapplication a sa propre chaîne)
+            aura = self.debuffs.get(dot_id)
+            if aura is not chain:
+                return
+            damage = self._poison_per_stack * aura.stacks
+        elif self.now >= expires_at:
+            # Comme gameTick : l'expiration est testée avant le tick, le tick final est perdu
+            return
+        self._record(dot_id, damage)
+        self._push(self.now + interval, _DOT_TICK, (dot_id, damage, interval, expires_at, chain))
+
+    def _apply_poison(self):
+        aura = self.debuffs.get(DEADLY_POISON_DEBUFF)
+        if aura is None:
+            self._set_aura(self.debuffs, DEADLY_POISON_DEBUFF, DEADLY_POISON_DURATION, 1, (), _DEBUFF_EXPIRE)
+            aura = self.debuffs[DEADLY_POISON_DEBUFF]
+            self._push(self.now + 1, _DOT_TICK, (DEADLY_POISON_DEBUFF, None, 1, None, aura))
+        else:
+            aura.stacks = min(DEADLY_POISON_MAX_STACKS, aura.stacks + 1)
+            aura.expires_at = self.now + DEADLY_POISON_DURATION
+            self._push(aura.expires_at, _DEBUFF_EXPIRE, (DEADLY_POISON_DEBUFF, aura.expires_at))
+
+    # --- Monstre ---
+
+    def _schedule_monster_attack(self, at):
+        # Seule la dernière attaque planifiée est valide (un étourdissement la repousse)
+        self.monster_next_attack = at
+        self._push(at, _MONSTER_ATTACK, at)
+
+    def _monster_attack(self, scheduled_at):
+        if scheduled_at != self.monster_next_attack:
+            return
+        if not self.stealthed:
+            dodged = self.rng.random() * 100 < self._player_stats.get('Esquive', 0)
+            if not dodged and self.resource_type == 'Rage':
+                self._gain_resource(RAGE_PER_HIT_TAKEN)
+        self._schedule_monster_attack(self.now + self._monster_view.stats.get('Vitesse', 1))
+
+
+def simulate_rotation(player, monster_id, rotation, duration=3600.0, rng=None, verbose=True):
+    """Simule `duration` secondes de combat avec une rotation (compétences par priorité).
+
+    Retourne un RotationResult (DPS réel par seconde, lancers et dégâts par compétence).
+    """
+    monster = sim.Monster(monster_id, player.data)
+    if not monster.id:
+        print(f"--- ERREUR: Monstre '{monster_id}' non trouvé dans monsters.json ---")
+        return RotationResult(duration, 0, 0)
+    if isinstance(rotation, str):
+        rotation = [rotation]
+    for skill_id in rotation:
+        if not player.get_skill(skill_id):
+            print(f"--- ERREUR: Compétence '{skill_id}' non trouvée pour la classe {player.class_id} ---")
+            return RotationResult(duration, 0, 0)
+
+    if verbose:
+        print(f"\n--- Rotation: {player.class_id} niv {player.level} vs {monster.name} "
+              f"({', '.join(rotation)}) pendant {duration:.0f}s ---")
+    simulator = RotationSimulator(player, monster, rotation, rng)
+    result = simulator.run(duration)
+    if verbose:
+        print(f"-> DPS réel sur {duration:.0f}s: {result.dps:.2f}")
+        sources = dict.fromkeys([*result.casts, *result.damage_by_skill])
+        for source in sorted(sources, key=lambda s: -result.damage_by_skill.get(s, 0)):
+            print(f"   {source:<35} {result.casts.get(source, 0):>6} lancers  "
+                  f"{result.damage_by_skill.get(source, 0):>12.0f} dégâts")
+    return result
+
+
+if __name__ == '__main__':
+    rotations = [
+        ('berserker', 'cinder_lord', ['berserker_bloodthirst', 'berserker_fury_rampage',
+                                      'berserker_arms_mortal_strike', 'berserker_heroic_strike']),
+        ('rogue', 'ghoul', ['rogue_poison_deadly', 'rogue_assassination_envenom', 'rogue_sinister_strike']),
+        ('mage', 'cinder_lord', ['mage_arcane_blast']),
+        ('mage', 'cinder_lord', ['mage_fire_pyroblast', 'mage_fire_fireball']),
+        ('cleric', 'ghoul', ['cleric_discipline_penance', 'cleric_shadow_mind_blast', 'cleric_shadow_smite']),
+    ]
+    for class_id, monster_id, rotation in rotations:
+        player = sim.Character(level=30, class_id=class_id)
+        player.equip_set(sim.DEFAULT_GEAR[class_id])
+        start = time.perf_counter()
+        simulate_rotation(player, monster_id, rotation, duration=3600.0, rng=random.Random(1))
+        print(f"   (simulé en {(time.perf_counter() - start) * 1000:.0f} ms)")
@@ -0,0 +1,299 @@
+# Serveur de simulation local, maintenu chaud entre les requêtes.
+#
+# Les données du jeu sont chargées une fois, les personnages équipés (builds)
+# sont gardés en mémoire et les résultats sont mis en cache dans un LRU borné.
+# Le protocole est une ligne JSON par requête et par réponse, sur l'entrée et la
+# sortie standard ou sur une socket Unix (`--socket`). Les requêtes sont traitées
+# en parallèle et les réponses arrivent dans l'ordre où elles sont prêtes : le
+# champ `id` de la requête est renvoyé pour les rapprocher.
+#
+# Requêtes :
+#   {"id": 1, "op": "simulate", "class": "berserker", "level": 25, "monster": "cinder_lord",
+#    "skill": "berserker_heroic_strike", "turns": 10000, "seed": 42}
+#       champs optionnels : gear (DEFAULT_GEAR de la classe par défaut), formula,
+#       debuff_stacks, detailed ; résultat : champs du CombatResult
+#   {"op": "expected_dps", ...mêmes champs sans turns...} -> espérance exacte (DpsEstimate)
+#   {"op": "stats"} -> compteurs du serveur ; {"op": "ping"}
+# Réponse : {"id": ..., "ok": true, "cached": false, "elapsed_ms": 3.2, "result": {...}}
+#       ou  {"id": ..., "ok": false, "error": "..."}
+#
+# La clé du cache est une empreinte de (build, niveau, monstre, compétence,
+# formule, graine) complétée par l'opération, le nombre de tours, les piles de
+# débuff et le mode détaillé. Une simulation sans graine est aléatoire : elle
+# n'est jamais mise en cache. Deux requêtes identiques en cours partagent le même
+# calcul.
+#
+# Exemples :
+#   python sim_server.py < requetes.jsonl
+#   python sim_server.py --socket /tmp/sim.sock --workers 4
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict
+
+import damage_simulation as sim
+from result_sink import build_key, result_fields
+
+OPERATIONS = ('simulate', 'expected_dps', 'stats', 'ping')
+DEFAULT_CACHE_SIZE = 10000
+
+
+class LRUCache:
+    """Dictionnaire borné : l'entrée la moins récemment utilisée est évincée en premier."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def normalize_request(request):
+    """Requête complétée par ses valeurs par défaut et validée ; lève ValueError si elle est invalide."""
+    op = request.get('op', 'simulate')
+    if op not in OPERATIONS:
+        raise ValueError(f"Opération '{op}' inconnue (attendu : {', '.join(OPERATIONS)})")
+    if op in ('stats', 'ping'):
+        return {'op': op}
+    data = sim.game_data
+    class_id = request.get('class')
+    if not data.get_class(class_id):
+        raise ValueError(f"Classe '{class_id}' non trouvée dans classes.json")
+    gear = request.get('gear')
+    if gear is not None and not (isinstance(gear, list) and all(isinstance(item_id, str) for item_id in gear)):
+        raise ValueError("Champ 'gear' invalide : liste d'identifiants d'objets attendue")
+    gear = tuple(sim.DEFAULT_GEAR.get(class_id, ()) if gear is None else gear)
+    for item_id in gear:
+        item = data.get_item(item_id)
+        if not item or 'slot' not in item:
+            raise ValueError(f"Objet '{item_id}' non trouvé ou non équipable dans items.json")
+    if not data.get_monster(request.get('monster')):
+        raise ValueError(f"Monstre '{request.get('monster')}' non trouvé dans monsters.json")
+    normalized = {
+        'op': op,
+        'class': class_id,
+        'level': int(request.get('level', 1)),
+        'gear': gear,
+        'monster': request['monster'],
+        'skill': request.get('skill'),
+        'formula': sim.resolve_formula(request.get('formula')),
+        'seed': request.get('seed'),
+        'debuff_stacks': int(request.get('debuff_stacks', 0)),
+    }
+    skill = data.get_skill(normalized['skill'])
+    if not skill or skill.get('classeId') != class_id or skill.get('niveauRequis', 1) > normalized['level']:
+        raise ValueError(f"Compétence '{normalized['skill']}' non trouvée pour la classe {class_id} "
+                         f"au niveau {normalized['level']}")
+    if op == 'simulate':
+        normalized['turns'] = int(request.get('turns', 100))
+        if normalized['turns'] < 1:
+            raise ValueError(f"Nombre de tours invalide : {normalized['turns']} (au moins 1)")
+        normalized['detailed'] = bool(request.get('detailed', False))
+    return normalized
+
+
+def request_key(request):
+    """Empreinte de cache d'une requête normalisée (None si le résultat est aléatoire)."""
+    if request['op'] == 'simulate' and request['seed'] is None:
+        return None
+    fields = [request['op'], build_key(request['class'], request['level'], request['gear']), request['level'],
+              request['monster'], request['skill'], request['formula'], request['seed'],
+              request.get('turns'), request['debuff_stacks'], request.get('detailed')]
+    return hashlib.sha1(json.dumps(fields).encode('utf-8')).hexdigest()
+
+
+def execute(request):
+    """Exécute une requête normalisée (dans un processus ou un thread de travail) ; retourne un dict JSON."""
+    player = sim.cached_player(request['class'], request['level'], request['gear'])
+    if request['op'] == 'simulate':
+        rng = random.Random(request['seed']) if request['seed'] is not None else None
+        result = sim.simulate_combat(player, request['monster'], request['skill'], turns=request['turns'],
+                                     debuff_stacks=request['debuff_stacks'], rng=rng, verbose=False,
+                                     detailed=request['detailed'], formula=request['formula'])
+        return result_fields(result)
+    seed = request['seed'] if request['seed'] is not None else 0
+    estimate = sim.expected_dps(player, request['monster'], request['skill'], debuff_stacks=request['debuff_stacks'],
+                                seed=seed, formula=request['formula'])
+    return {**asdict(estimate), 'std': estimate.std, 'exact': estimate.exact}
+
+
+class SimulationServer:
+    """Traite les requêtes JSON avec un cache LRU de résultats et des calculs partagés entre requêtes identiques."""
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, workers=1):
+        self.cache = LRUCache(cache_size)
+        self.workers = workers
+        # Un seul thread garde les builds chauds dans ce processus ; au-delà, chaque processus a les siens
+        self.executor = ThreadPoolExecutor(max_workers=1) if workers <= 1 else ProcessPoolExecutor(workers)
+        self.requests = 0
+        self.errors = 0
+        # Requêtes servies par un calcul identique déjà en cours
+        self.shared = 0
+        self.started = time.perf_counter()
+        self._inflight = {}
+
+    async def handle(self, request):
+        """Réponse (dict) à une requête décodée."""
+        start = time.perf_counter()
+        self.requests += 1
+        response = {'id': request.get('id') if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Requête attendue : un objet JSON")
+            normalized = normalize_request(request)
+            cached = False
+            if normalized['op'] == 'ping':
+                result = 'pong'
+            elif normalized['op'] == 'stats':
+                result = self.stats()
+            else:
+                result, cached = await self._compute(normalized)
+            response.update(ok=True, cached=cached, result=result)
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            response.update(ok=False, error=str(e) if not isinstance(e, KeyError) else f"Champ manquant : {e}")
+        except Exception as e:
+            # Erreur inattendue du calcul : la requête reçoit quand même sa réponse
+            self.errors += 1
+            response.update(ok=False, error=f"Erreur interne : {type(e).__name__}: {e}")
+        response['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return response
+
+    async def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.requests += 1
+            self.errors += 1
+            return json.dumps({'id': None, 'ok': False, 'error': f"JSON invalide : {e}", 'elapsed_ms': 0.0},
+                              ensure_ascii=False)
+        return json.dumps(await self.handle(request), ensure_ascii=False)
+
+    def stats(self):
+        return {'requests': self.requests, 'errors': self.errors, 'cache_size': len(self.cache),
+                'cache_max': self.cache.maxsize, 'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses,
+                'shared': self.shared, 'inflight': len(self._inflight), 'workers': self.workers,
+                'uptime_s': round(time.perf_counter() - self.started, 3)}
+
+    async def _compute(self, request):
+        key = request_key(request)
+        if key is not None:
+            result = self.cache.get(key)
+            if result is not None:
+                return result, True
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.shared += 1
+                return await asyncio.shield(pending), True
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, execute, request)
+        if key is None:
+            return await future, False
+        self._inflight[key] = future
+        try:
+            result = await future
+            self.cache.put(key, result)
+        finally:
+            self._inflight.pop(key, None)
+        return result, False
+
+    async def serve_connection(self, reader, writer):
+        """Lit les requêtes d'un flux jusqu'à sa fin ; chaque ligne est traitée dans sa propre tâche."""
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            payload = (await self.handle_line(line) + '\n').encode('utf-8')
+            async with lock:
+                writer.write(payload)
+                await writer.drain()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        writer.close()
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.serve_connection, path=path)
+        print(f"-> Serveur de simulation à l'écoute sur {path}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_stdio(self):
+        await self.serve_connection(_StdinReader(), _StdoutWriter())
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class _StdinReader:
+    # Lecture ligne à ligne de l'entrée standard dans un thread (fichier, tube ou terminal)
+    async def readline(self):
+        return await asyncio.get_running_loop().run_in_executor(None, sys.stdin.buffer.readline)
+
+
+class _StdoutWriter:
+    # Interface minimale d'un StreamWriter pour répondre sur la sortie standard
+    def write(self, payload):
+        sys.stdout.buffer.write(payload)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serveur de simulation (une ligne JSON par requête).")
+    parser.add_argument('--socket', help="Chemin de la socket Unix (entrée/sortie standard par défaut)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help="Résultats gardés en cache")
+    parser.add_argument('--workers', type=int, default=1, help="Processus de calcul (1 : dans le serveur)")
+    args = parser.parse_args()
+
+    with sim.cli_errors(file=sys.stderr):
+        # Chargement des données avant la première requête
+        sim.game_data.items, sim.game_data.monsters, sim.game_data.skills, sim.game_data.classes
+
+    server = SimulationServer(cache_size=args.cache_size, workers=args.workers)
+    try:
+        asyncio.run(server.serve_unix(args.socket) if args.socket else server.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
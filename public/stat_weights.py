@@ -0,0 +1,194 @@
+# Poids des stats : DPS gagné par point de chaque stat, pour classer l'équipement.
+#
+# Le DPS d'un jeu de stats est celui de l'optimiseur de talents
+# (`expected_talent_dps`) : dégâts moyens d'un tour × critiques × DamageMultiplier
+# / Vitesse. Chaque stat est décalée de ± `step` autour de `Character.stats`
+# (différence centrée) et le poids vaut (DPS+ - DPS-) / (2 × step).
+#
+# Deux méthodes :
+#   - 'analytic' : dégâts de tour exacts (`estimate_turn_damage`). L'erreur donnée
+#     est l'écart avec la même différence sur un pas double (erreur de troncature,
+#     sensible aux arrondis des bonus en pourcentage) ;
+#   - 'crn' : tous les plans décalés sont empilés et simulés sur les mêmes tirages
+#     (nombres aléatoires communs, `common_turn_damage`), en un seul lot NumPy ; le
+#     bruit commun s'annule dans les différences, l'erreur est l'intervalle de
+#     confiance de la moyenne des différences par tour.
+#
+# Exemple :
+#   python stat_weights.py --class berserker --level 25 --skill berserker_heroic_strike --monster cinder_lord
+
+import argparse
+import sys
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
+
+import damage_simulation as sim
+from talent_optimizer import dps_factor, expected_talent_dps
+from vectorized_simulation import stack_plans, common_turn_damage
+
+METHODS = ('analytic', 'crn')
+PRIMARY_STATS = ('Force', 'Intelligence', 'Esprit', 'Dexterite', 'AttMin', 'AttMax', 'CritPct', 'CritDmg',
+                 'Precision', 'Vitesse')
+DEFAULT_STEP = 10
+# Pas propres à certaines stats (Vitesse est un intervalle en secondes)
+STAT_STEPS = {'Vitesse': 0.1}
+# Unité d'affichage des poids : (quantité de la stat, libellé), un point par défaut
+STAT_UNITS = {'Vitesse': (0.1, '0.1 s')}
+DEFAULT_UNIT = (1, 'point')
+# Stats du passage tour -> DPS (dps_factor), utiles quelle que soit la compétence
+DPS_FACTOR_STATS = ('CritPct', 'CritDmg', 'Precision', 'Vitesse', 'DamageMultiplier')
+DEFAULT_TURNS = 20000
+# Tours simulés d'un bloc par la méthode 'crn' (borne la mémoire)
+CHUNK_TURNS = 1 << 14
+
+
+@dataclass
+class StatWeight:
+    """DPS par point d'une stat. `error` : demi-largeur de l'incertitude ; `relative` : poids par unité
+    d'affichage (`stat_unit`) / meilleur poids."""
+    stat: str
+    weight: float
+    error: float
+    step: float
+    relative: float = 0.0
+
+
+def elements(data):
+    """Éléments du jeu : types de dégâts des compétences et résistances des monstres (sauf physique)."""
+    found = set()
+    for skill in data.skills.values():
+        found.update(effect['damageType'] for effect in skill.get('effects', []) if effect.get('damageType'))
+    for monster in data.monsters.values():
+        found.update((monster['stats'].get('ResElems') or {}).keys())
+    found.discard('physical')
+    return sorted(found)
+
+
+def default_weight_stats(data):
+    return list(PRIMARY_STATS) + [f"DmgElems.{element}" for element in elements(data)]
+
+
+def affects_dps(stat, skill, class_id):
+    """Faux si la stat n'entre pas dans le calcul du DPS de la compétence (poids nul par construction)."""
+    if stat in DPS_FACTOR_STATS:
+        return True
+    sources = {effect.get('source') for effect in skill.get('effects', []) if effect.get('type') == 'damage'}
+    if stat in ('AttMin', 'AttMax'):
+        return 'weapon' in sources
+    if stat.startswith(('DmgElems.', 'BonusDmg.')):
+        return bool(sources)
+    # Puissance des sorts : Intelligence ou Esprit selon la classe
+    return 'spell' in sources and sim.calculate_spell_power({stat: 1}, class_id) != 0
+
+
+def stat_unit(stat):
+    """(quantité, libellé) de l'unité dans laquelle afficher le poids d'une stat."""
+    return STAT_UNITS.get(stat, DEFAULT_UNIT)
+
+
+def perturb(stats, stat, delta):
+    """Copie des stats avec `delta` ajouté à la stat (clé pointée pour les sous-stats, ex. 'DmgElems.fire')."""
+    stats = dict(stats)
+    *groups, leaf = stat.split('.')
+    current_level = stats
+    for group in groups:
+        current_level[group] = dict(current_level.get(group) or {})
+        current_level = current_level[group]
+    current_level[leaf] = current_level.get(leaf, 0) + delta
+    return stats
+
+
+def stat_weights(player, skill_id, monster_id, stats=None, method='analytic', step=DEFAULT_STEP, turns=DEFAULT_TURNS,
+                 seed=0, confidence=0.95, debuff_stacks=0):
+    """Poids des stats du personnage équipé, triés du plus fort au plus faible. Retourne une liste de StatWeight.
+
+    Sans liste `stats`, les stats sans effet sur la compétence (`affects_dps`) ne sont pas évaluées.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Méthode '{method}' inconnue (attendu : {', '.join(METHODS)})")
+    data = player.data
+    monster = sim.Monster(monster_id, data)
+    if not monster.id:
+        raise ValueError(f"Monstre '{monster_id}' non trouvé dans monsters.json")
+    skill = player.get_skill(skill_id)
+    if not skill:
+        raise ValueError(f"Compétence '{skill_id}' non trouvée pour la classe {player.class_id}")
+    if stats:
+        names = list(stats)
+    else:
+        names = [name for name in default_weight_stats(data) if affects_dps(name, skill, player.class_id)]
+    steps = np.array([STAT_STEPS.get(name, step) for name in names], dtype=float)
+    base = player.stats
+
+    if method == 'analytic':
+        def dps(stats):
+            return expected_talent_dps(stats, player.level, player.class_id, monster, skill, debuff_stacks)
+
+        def difference(name, h):
+            return (dps(perturb(base, name, h)) - dps(perturb(base, name, -h))) / (2 * h)
+        weights = [difference(name, h) for name, h in zip(names, steps)]
+        errors = [abs(weight - difference(name, 2 * h)) for weight, name, h in zip(weights, names, steps)]
+    else:
+        # Plans -step puis +step de chaque stat, empilés et tirés ensemble
+        shifted = [perturb(base, name, sign * h) for name, h in zip(names, steps) for sign in (-1, 1)]
+        plans = [sim.compile_skill_plan(stats, player.level, player.class_id, monster, skill,
+                                        debuff_stacks=debuff_stacks) for stats in shifted]
+        factors = np.array([dps_factor(stats, monster) for stats in shifted])
+        weapon_terms, constant = stack_plans(plans)
+        rng = np.random.default_rng(seed)
+        total = np.zeros(len(names))
+        total_sq = np.zeros(len(names))
+        done = 0
+        while done < turns:
+            n = min(CHUNK_TURNS, turns - done)
+            damage = common_turn_damage(weapon_terms, constant, rng.random((n, len(weapon_terms))))
+            dps = damage * factors[:, None]
+            diffs = (dps[1::2] - dps[0::2]) / (2 * steps[:, None])
+            total += diffs.sum(axis=1)
+            total_sq += (diffs ** 2).sum(axis=1)
+            done += n
+        weights = total / turns
+        variances = np.maximum(total_sq / turns - weights ** 2, 0) * turns / max(turns - 1, 1)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        errors = z * np.sqrt(variances / turns)
+
+    # Référence des poids relatifs : la meilleure stat (Vitesse, à poids négatif, n'est jamais la référence)
+    best = max((float(w) for w in weights), default=0)
+    results = [StatWeight(name, float(weight), float(error), float(h),
+                          float(weight) * stat_unit(name)[0] / best if best else 0.0)
+               for name, weight, error, h in zip(names, weights, errors, steps)]
+    return sorted(results, key=lambda r: r.weight, reverse=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DPS par point de chaque stat pour un build équipé.")
+    parser.add_argument('--class', dest='class_id', default='berserker')
+    parser.add_argument('--level', type=int, default=25)
+    parser.add_argument('--skill', default='berserker_heroic_strike')
+    parser.add_argument('--monster', default='cinder_lord')
+    parser.add_argument('--method', choices=METHODS, default='analytic')
+    parser.add_argument('--stats', nargs='*', help="Stats à évaluer (clés pointées pour les sous-stats)")
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP)
+    parser.add_argument('--turns', type=int, default=DEFAULT_TURNS, help="Tours simulés (méthode 'crn')")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with sim.cli_errors():
+        player = sim.Character(level=args.level, class_id=args.class_id)
+        player.equip_set(sim.DEFAULT_GEAR.get(args.class_id, []))
+        weights = stat_weights(player, args.skill, args.monster, stats=args.stats, method=args.method,
+                               step=args.step, turns=args.turns, seed=args.seed)
+
+    print(f"--- Poids des stats ({args.method}): {args.class_id} niv {args.level} vs {args.monster} "
+          f"avec {args.skill} ---")
+    for w in weights:
+        amount, unit = stat_unit(w.stat)
+        print(f"  {w.stat:<18} {w.weight * amount:>+9.4f} ± {w.error * amount:.4f} DPS / {unit:<6} "
+              f"({w.relative:>+6.2f})")
+    if not args.stats:
+        skill = player.get_skill(args.skill)
+        ignored = [name for name in PRIMARY_STATS if not affects_dps(name, skill, args.class_id)]
+        if ignored:
+            print(f"Sans effet sur {args.skill}: {', '.join(ignored)}")
@@ -0,0 +1,203 @@
+# Balayage classe × monstre × compétence pour l'équilibrage.
+#
+# Énumère chaque classe, chaque monstre de monsters.json et chaque compétence
+# offensive de la classe au niveau demandé, répartit les simulations sur un pool
+# de processus et écrit les résultats au fil de l'eau dans un fichier CSV.
+#
+# Chaque simulation tire ses nombres dans son propre random.Random, dont la graine
+# dérive de (graine globale, classe, compétence, monstre) : le résultat ne dépend
+# ni du nombre de processus ni de l'ordre d'exécution.
+#
+# Avec --profile, chaque simulation est détaillée et instrumentée (CombatHooks) :
+# le balayage reste silencieux et affiche à la fin la répartition du temps par
+# étape et des dégâts par source et par type de bonus élémentaire.
+#
+# Avec --precision, chaque simulation s'arrête dès que l'intervalle de confiance
+# du DPS est assez étroit (simulate_combat_adaptive) ; --turns devient alors le
+# budget maximal et la colonne turns donne les tours réellement simulés.
+#
+# Avec --format jsonl ou columnar, les résultats complets (CombatResult) passent
+# par un ResultSink : écriture par lots et reprise automatique d'une campagne
+# interrompue (les clés build × monstre × compétence × graine déjà écrites sont
+# sautées ; --fresh repart de zéro).
+#
+# Exemple :
+#   python sweep.py --level 25 --turns 1000 --output sweep_niv25.csv
+
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import damage_simulation as sim
+from result_sink import DEFAULT_BATCH_SIZE, ResultSink, build_key, result_fields
+
+# Effets pris en compte par le modèle de dégâts de simulate_combat
+DAMAGE_EFFECT_TYPES = ('damage', 'consume_debuff_for_damage')
+
+FIELDNAMES = ['class_id', 'level', 'skill_id', 'monster_id', 'monster_level', 'palier', 'turns', 'seed', 'average_dps']
+# Colonnes ajoutées en mode adaptatif (--precision)
+ADAPTIVE_FIELDNAMES = ['ci_low', 'ci_high', 'converged']
+
+def is_damage_skill(skill):
+    return any(effect.get('type') in DAMAGE_EFFECT_TYPES for effect in skill.get('effects', []))
+
+
+def task_seed(base_seed, class_id, skill_id, monster_id):
+    """Graine propre à une simulation, stable d'un processus à l'autre."""
+    return random.Random(f"{base_seed}:{class_id}:{skill_id}:{monster_id}").getrandbits(64)
+
+
+def build_tasks(level, turns, base_seed, class_ids=None, monster_ids=None, gear=None, debuff_stacks=0, chunk_size=32,
+                profile=False, precision=None):
+    """Découpe le balayage en tâches (une classe, une compétence, un lot de monstres)."""
+    data = sim.game_data
+    gear = sim.DEFAULT_GEAR if gear is None else gear
+    class_ids = class_ids or list(data.classes)
+    monster_ids = monster_ids or list(data.monsters)
+    tasks = []
+    for class_id in class_ids:
+        for skill in data.skills_for(class_id, level):
+            if not is_damage_skill(skill):
+                continue
+            for start in range(0, len(monster_ids), chunk_size):
+                tasks.append((class_id, level, tuple(gear.get(class_id, ())), skill['id'],
+                              tuple(monster_ids[start:start + chunk_size]), turns, base_seed, debuff_stacks, profile,
+                              precision))
+    return tasks
+
+
+def run_task(task):
+    """Simule une tâche. Retourne (lignes de résultats, CombatHooks de la tâche ou None sans profilage)."""
+    class_id, level, gear, skill_id, monster_ids, turns, base_seed, debuff_stacks, profile, precision = task
+    hooks = sim.CombatHooks() if profile else None
+    player = sim.cached_player(class_id, level, gear)
+    build = build_key(class_id, level, gear)
+    rows = []
+    for monster_id in monster_ids:
+        monster = sim.game_data.get_monster(monster_id)
+        seed = task_seed(base_seed, class_id, skill_id, monster_id)
+        if precision is None:
+            result = sim.simulate_combat(player, monster_id, skill_id, turns=turns, debuff_stacks=debuff_stacks,
+                                         rng=random.Random(seed), verbose=False, detailed=profile, hooks=hooks)
+        else:
+            result = sim.simulate_combat_adaptive(player, monster_id, skill_id, rel_precision=precision,
+                                                  max_turns=turns, debuff_stacks=debuff_stacks,
+                                                  rng=random.Random(seed), verbose=False)
+            if hooks is not None:
+                hooks.count('simulations')
+                hooks.count('turns', result.turns)
+        rows.append({
+            'build': build,
+            'class_id': class_id,
+            'level': level,
+            'skill_id': skill_id,
+            'monster_id': monster_id,
+            'monster_level': monster['level'],
+            'palier': monster.get('palier'),
+            'turns': result.turns,
+            'seed': seed,
+            'average_dps': result.dps,
+            **{name: value for name, value in result_fields(result).items()
+               if name not in ('class_id', 'level', 'monster_id', 'skill_id', 'turns', 'dps')},
+        })
+    return rows, hooks
+
+
+def pending_tasks(tasks, done):
+    """Tâches restantes : retire les monstres dont la clé (build, monstre, compétence, graine) est déjà écrite."""
+    pending = []
+    for task in tasks:
+        class_id, level, gear, skill_id, monster_ids, turns, base_seed, debuff_stacks, profile, precision = task
+        build = build_key(class_id, level, gear)
+        remaining = tuple(monster_id for monster_id in monster_ids
+                          if (build, monster_id, skill_id, task_seed(base_seed, class_id, skill_id, monster_id))
+                          not in done)
+        if remaining:
+            pending.append((class_id, level, gear, skill_id, remaining, turns, base_seed, debuff_stacks, profile,
+                            precision))
+    return pending
+
+
+def _run_tasks(tasks, workers, write, hooks=None):
+    if workers == 1:
+        results = map(run_task, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(run_task, tasks)
+    count = 0
+    try:
+        # map() conserve l'ordre des tâches : le fichier est identique quel que soit le nombre de processus
+        for rows, task_hooks in results:
+            if task_hooks is not None:
+                hooks.merge(task_hooks)
+            write(rows)
+            count += len(rows)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return count
+
+
+def run_sweep(output_path, level=25, turns=1000, base_seed=0, workers=None, class_ids=None, monster_ids=None,
+              debuff_stacks=0, hooks=None, format='csv', batch_size=DEFAULT_BATCH_SIZE, resume=True, precision=None):
+    """Lance le balayage complet et écrit les lignes dans `output_path`. Retourne le nombre de lignes écrites.
+
+    Si `hooks` (CombatHooks) est fourni, les simulations sont détaillées et leurs mesures y sont fusionnées.
+    `format` : 'csv' (colonnes FIELDNAMES, réécrit à chaque fois), ou 'jsonl' / 'columnar' (ResultSink,
+    résultats complets et reprise si `resume`).
+    `precision` : précision relative visée (mode adaptatif, `turns` sert alors de budget).
+    """
+    tasks = build_tasks(level, turns, base_seed, class_ids, monster_ids, debuff_stacks=debuff_stacks,
+                        profile=hooks is not None, precision=precision)
+    if format != 'csv':
+        # Le niveau et la graine font partie des clés de reprise ; ces paramètres-ci changent les résultats
+        params = {'turns': turns, 'precision': precision, 'debuff_stacks': debuff_stacks,
+                  'formula': sim.resolve_formula(None), 'detailed': hooks is not None}
+        with ResultSink(output_path, format=format, batch_size=batch_size, resume=resume, params=params) as sink:
+            return _run_tasks(pending_tasks(tasks, sink.done), workers, sink.write_many, hooks)
+
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        fieldnames = FIELDNAMES + ADAPTIVE_FIELDNAMES if precision is not None else FIELDNAMES
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+
+        def write(rows):
+            writer.writerows({**row, 'average_dps': f"{row['average_dps']:.4f}"} for row in rows)
+            f.flush()
+
+        return _run_tasks(tasks, workers, write, hooks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Balayage classe × monstre × compétence.")
+    parser.add_argument('--level', type=int, default=25)
+    parser.add_argument('--turns', type=int, default=1000, help="Tours par simulation (budget maximal avec --precision)")
+    parser.add_argument('--precision', type=float,
+                        help="Demi-largeur relative visée de l'IC à 95 %% du DPS (ex. 0.01) : mode adaptatif")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--debuff-stacks', type=int, default=0)
+    parser.add_argument('--classes', nargs='*', help="Classes à simuler (toutes par défaut)")
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--format', choices=('csv', 'jsonl', 'columnar'), default='csv')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Lignes par lot écrit (jsonl / columnar)")
+    parser.add_argument('--fresh', action='store_true', help="Ignore les résultats déjà écrits (jsonl / columnar)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Détaille et chronomètre chaque simulation, puis affiche les composantes dominantes")
+    args = parser.parse_args()
+
+    hooks = sim.CombatHooks() if args.profile else None
+    with sim.cli_errors():
+        start = time.perf_counter()
+        count = run_sweep(args.output, level=args.level, turns=args.turns, base_seed=args.seed, workers=args.workers,
+                          class_ids=args.classes, debuff_stacks=args.debuff_stacks, hooks=hooks, format=args.format,
+                          batch_size=args.batch_size, resume=not args.fresh, precision=args.precision)
+    print(f"-> {count} simulations écrites dans {args.output} en {time.perf_counter() - start:.2f}s")
+    if hooks is not None:
+        print("\n".join(hooks.report()))
@@ -0,0 +1,223 @@
+# Recherche de la meilleure répartition des points de talent pour un build équipé,
+# une compétence et un monstre cible.
+#
+# Les talents modifient surtout des stats que le modèle par tour de
+# `simulate_combat` ignore (CritPct, CritDmg, Vitesse, DamageMultiplier). Une
+# répartition est donc notée en dégâts par seconde attendus :
+#   dégâts moyens d'un tour (estimate_turn_damage)
+#   × (1 + chance de critique × (CritDmg / 100 - 1)) × DamageMultiplier / Vitesse
+# avec la chance de critique du jeu (CritPct, nulle si l'attaque rate : Precision - Esquive).
+#
+# L'énumération parcourt les talents de la classe dans l'ordre des prérequis et
+# essaie chaque rang permis par le budget (1 point par niveau). Les piles de
+# modificateurs composées (`talent_stack`) sont mémorisées par préfixe
+# d'allocation : deux allocations qui ne diffèrent que par leurs derniers talents
+# réutilisent la même pile. Les skill_mods qui visent la compétence notée sont
+# appliqués comme dans le jeu. Les talents sans effet sur la note ne prennent que
+# les rangs exigés par un autre talent, et une borne optimiste (tous les
+# modificateurs favorables restants appliqués) coupe les branches sans espoir.
+#
+# Exemple :
+#   python talent_optimizer.py berserker 25 berserker_heroic_strike cinder_lord
+
+import sys
+import time
+from dataclasses import dataclass
+
+import damage_simulation as sim
+
+# Stats qui entrent dans la note d'une répartition
+SCORED_STATS = ('AttMin', 'AttMax', 'Intelligence', 'Esprit', 'CritPct', 'CritDmg', 'Precision',
+                'Vitesse', 'DamageMultiplier')
+
+
+@dataclass
+class TalentSearchResult:
+    talents: dict
+    expected_dps: float
+    points: int
+    evaluated: int
+    pruned: int
+    stacks: int
+
+
+def dps_factor(stats, monster):
+    """Passage des dégâts moyens d'un tour au DPS : critiques, DamageMultiplier et intervalle d'attaque."""
+    hit_chance = max(0, min(100, stats.get('Precision', 0) - monster.stats.get('Esquive', 0))) / 100
+    crit_chance = max(0, min(100, stats.get('CritPct', 0))) / 100 * hit_chance
+    crit_factor = 1 + crit_chance * (stats.get('CritDmg', 100) / 100 - 1)
+    return crit_factor * stats.get('DamageMultiplier', 1) / max(stats.get('Vitesse', 1), 1e-9)
+
+
+def expected_talent_dps(stats, level, class_id, monster, skill, debuff_stacks=0):
+    """Dégâts par seconde attendus : tour moyen, critiques, DamageMultiplier et intervalle d'attaque."""
+    turn = sim.estimate_turn_damage(stats, level, class_id, monster, skill, debuff_stacks).mean
+    return turn * dps_factor(stats, monster)
+
+
+def _is_favorable(stat, modifier, value):
+    # Vitesse est un intervalle : plus petit est meilleur
+    if stat == 'Vitesse':
+        return value < 1 if modifier == 'multiplicative' else value < 0
+    return value > 1 if modifier == 'multiplicative' else value > 0
+
+
+def _prerequisites(talent):
+    return [(required_id, int(required_rank)) for required_id, required_rank in
+            (requirement.split(':') for requirement in talent.get('exigences', []))]
+
+
+def _ordered_talents(talents):
+    """Talents triés pour que chaque prérequis précède les talents qui l'exigent."""
+    remaining = sorted(talents, key=lambda t: t.get('niveauRequis', 1))
+    known = {t['id'] for t in talents}
+    ordered, placed = [], set()
+    while remaining:
+        for talent in remaining:
+            if all(required_id in placed or required_id not in known for required_id, _ in _prerequisites(talent)):
+                ordered.append(talent)
+                placed.add(talent['id'])
+                remaining.remove(talent)
+                break
+        else:
+            break
+    return ordered
+
+
+def optimize_talents(player, skill_id, monster_id, debuff_stacks=0):
+    """Meilleure répartition des `player.level` points de talent pour l'équipement de `player`."""
+    data = player.data
+    monster = sim.Monster(monster_id, data)
+    if not monster.id:
+        raise ValueError(f"Monstre '{monster_id}' non trouvé dans monsters.json")
+    skill = player.get_skill(skill_id)
+    if not skill:
+        raise ValueError(f"Compétence '{skill_id}' non trouvée pour la classe {player.class_id}")
+
+    # Stats d'équipement seules (les talents actuels du joueur sont ignorés)
+    gear_player = sim.Character(player.level, player.class_id, data)
+    for item in player.equipment.values():
+        gear_player.equip(item)
+    gear_stats = gear_player.stats
+    weapon = player.equipment.get('weapon')
+    weapon_type = weapon and weapon.get('type')
+    points = player.level
+
+    talents = _ordered_talents([t for t in data.talents_for_class(player.class_id)
+                                if t.get('niveauRequis', 1) <= player.level])
+    # Modificateurs qui comptent : stat notée et déjà présente (sinon le jeu l'ignore)
+    scored_mods = {t['id']: [(stat, modifier, value) for stat, modifier, value
+                             in compile_all_ranks(t, weapon_type)
+                             if stat in SCORED_STATS and isinstance(gear_stats.get(stat), (int, float))]
+                   for t in talents}
+    # Talents qui modifient la compétence notée (skill_mods)
+    skill_talents = {t['id'] for t in talents
+                     if any(mod.get('skill_id') == skill_id for mod in t.get('skill_mods') or [])}
+    required = {}
+    for talent in talents:
+        for required_id, required_rank in _prerequisites(talent):
+            required[required_id] = max(required.get(required_id, 0), required_rank)
+    rank_options = []
+    for talent in talents:
+        if scored_mods[talent['id']] or talent['id'] in skill_talents:
+            rank_options.append(range(talent.get('rangMax', 1) + 1))
+        elif talent['id'] in required:
+            rank_options.append((0, min(required[talent['id']], talent.get('rangMax', 1))))
+        else:
+            rank_options.append((0,))
+
+    # Borne optimiste : modificateurs favorables des talents restants, au rang maximal
+    suffix_mods = [()] * (len(talents) + 1)
+    for depth in range(len(talents) - 1, -1, -1):
+        talent = talents[depth]
+        best = [mod for mod in sim.compile_talent(talent, talent.get('rangMax', 1), weapon_type)
+                if mod[0] in SCORED_STATS and _is_favorable(*mod)]
+        suffix_mods[depth] = suffix_mods[depth + 1] + tuple(best)
+    suffix_skill_talents = [tuple((t['id'], t.get('rangMax', 1)) for t in talents[depth:] if t['id'] in skill_talents)
+                            for depth in range(len(talents) + 1)]
+
+    cache = {}
+
+    def score(stack, skill_ranks):
+        stats = sim.apply_talent_stack(gear_stats, stack)
+        key = (tuple(stats.get(stat) for stat in SCORED_STATS), skill_ranks)
+        value = cache.get(key)
+        if value is None:
+            modified_skill = sim.apply_skill_mods(data, skill, dict(skill_ranks)) if skill_ranks else skill
+            value = cache[key] = expected_talent_dps(stats, player.level, player.class_id, monster, modified_skill,
+                                                     debuff_stacks)
+        return value
+
+    def skill_ranks_of(allocation):
+        return tuple((talent_id, rank) for talent_id, rank in allocation if talent_id in skill_talents)
+
+    def bound(stack, allocation, depth):
+        optimistic = dict(stack)
+        # Additifs d'abord puis multiplicatifs : l'ordre le plus favorable pour des gains positifs
+        for stat, modifier, value in sorted(suffix_mods[depth], key=lambda mod: mod[1] != 'additive'):
+            a, b = optimistic.get(stat, (1, 0))
+            optimistic[stat] = (a, b + value) if modifier == 'additive' else (a * value, b * value)
+        return score(optimistic, skill_ranks_of(allocation) + suffix_skill_talents[depth])
+
+    best = {'score': float('-inf'), 'allocation': ()}
+    counters = {'evaluated': 0, 'pruned': 0}
+    stacks_before = sim.talent_stacks_built()
+    ranks = {}
+
+    def search(depth, allocation, points_left):
+        stack = sim.talent_stack(data, allocation, weapon_type)
+        if depth == len(talents):
+            counters['evaluated'] += 1
+            value = score(stack, skill_ranks_of(allocation))
+            if value > best['score']:
+                best['score'] = value
+                best['allocation'] = allocation
+            return
+        if bound(stack, allocation, depth) <= best['score']:
+            counters['pruned'] += 1
+            return
+        talent = talents[depth]
+        prerequisites_met = all(ranks.get(required_id, 0) >= required_rank
+                                for required_id, required_rank in _prerequisites(talent))
+        for rank in rank_options[depth]:
+            if rank > points_left or (rank and not prerequisites_met):
+                break
+            ranks[talent['id']] = rank
+            search(depth + 1, allocation + ((talent['id'], rank),) if rank else allocation, points_left - rank)
+        ranks.pop(talent['id'], None)
+
+    search(0, (), points)
+    return TalentSearchResult(talents=dict(best['allocation']), expected_dps=best['score'], points=points,
+                              evaluated=counters['evaluated'], pruned=counters['pruned'],
+                              stacks=sim.talent_stacks_built() - stacks_before)
+
+
+def compile_all_ranks(talent, weapon_type=None):
+    """statMods d'un talent pour chacun de ses rangs (pour savoir quelles stats il touche)."""
+    mods = []
+    for rank in range(1, talent.get('rangMax', 1) + 1):
+        mods.extend(sim.compile_talent(talent, rank, weapon_type))
+    return mods
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5:
+        scenarios = [(sys.argv[1], int(sys.argv[2]), sys.argv[3], sys.argv[4])]
+    else:
+        scenarios = [
+            ('berserker', 25, 'berserker_heroic_strike', 'cinder_lord'),
+            ('rogue', 25, 'rogue_subtlety_surprise_attack', 'ghoul'),
+            ('mage', 25, 'mage_fire_fireball', 'cinder_lord'),
+            ('cleric', 25, 'cleric_shadow_smite', 'ghoul'),
+        ]
+    for class_id, level, skill_id, monster_id in scenarios:
+        player = sim.Character(level=level, class_id=class_id)
+        player.equip_set(sim.DEFAULT_GEAR.get(class_id, []))
+        start = time.perf_counter()
+        result = optimize_talents(player, skill_id, monster_id)
+        elapsed = time.perf_counter() - start
+        print(f"\n--- Meilleurs talents: {class_id} niv {level} vs {monster_id} avec {skill_id} ---")
+        for talent_id, rank in result.talents.items():
+            print(f"  {talent_id:<45} rang {rank}")
+        print(f"-> DPS attendu: {result.expected_dps:.2f} ({result.points} points, {result.evaluated} répartitions "
+              f"évaluées, {result.pruned} branches coupées, {result.stacks} piles composées, {elapsed * 1000:.0f} ms)")
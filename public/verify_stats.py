@@ -0,0 +1,217 @@
+# Vérification hors navigateur de l'agrégation des stats d'équipement.
+#
+# Remplace les vérifications Playwright de jules-scratch/verification (un
+# navigateur et le serveur de dev par objet) : chaque objet de items.json est
+# équipé sur un Character de chaque classe qui peut le porter, et ses stats sont
+# comparées à des valeurs attendues calculées indépendamment depuis le JSON.
+#
+# Contrôles par objet :
+#   - equip : stats après `equip` (chemin incrémental) = stats de base + objet,
+#     calculées par le parcours imbriqué d'origine (sans flatten_item_stats) ;
+#   - update_stats : mêmes stats après un recalcul complet ;
+#   - unequip : retour exact aux stats de base ;
+#   - jeu : DmgElems (BonusDmg compris) et ResElems comparés à recalculateStats
+#     de gameStore.ts, qui ignore les stats absentes des stats de base et les
+#     blocs `stats` autres que DmgElems/ResElems.
+# Les équipements par défaut (`DEFAULT_GEAR`) sont aussi vérifiés avec `equip_set`.
+#
+# Les trois premiers contrôles valident le simulateur (code de sortie 1 en cas
+# d'écart) ; le dernier signale où le simulateur et le jeu divergent (bloquant
+# seulement avec --strict).
+#
+# Exemple :
+#   python verify_stats.py
+#   python verify_stats.py --items amulet_fire_ruby --strict
+
+import argparse
+import copy
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import damage_simulation as sim
+
+# Contrôles du simulateur, puis contrôle de conformité au jeu
+SIMULATOR_CHECKS = ('equip', 'update_stats', 'unequip', 'equip_set')
+GAME_CHECK = 'jeu'
+ELEMENT_GROUPS = ('DmgElems', 'ResElems')
+
+
+@dataclass
+class StatMismatch:
+    item_id: str
+    class_id: str
+    check: str
+    stat: str
+    expected: object
+    actual: object
+
+
+@dataclass
+class VerificationReport:
+    items: int = 0
+    checks: int = 0
+    skipped: list = field(default_factory=list)
+    mismatches: list = field(default_factory=list)
+    # Stats d'objets que recalculateStats ignore : stat -> nombre d'objets
+    ignored_by_game: Counter = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+    def failures(self, strict=False):
+        return [m for m in self.mismatches if strict or m.check != GAME_CHECK]
+
+
+def expected_stats(base_stats, items):
+    """Stats attendues, par le parcours imbriqué d'origine de update_stats : affixes puis `stats`, objet par objet.
+
+    Calcul indépendant de flatten_item_stats et des deltas compilés qu'utilise le simulateur.
+    """
+    stats = copy.deepcopy(base_stats)
+    for item in items:
+        for affix in item.get('affixes', []):
+            *groups, leaf = affix['ref'].split('.')
+            current_level = stats
+            for group in groups:
+                current_level = current_level.setdefault(group, {})
+            current_level[leaf] = current_level.get(leaf, 0) + affix['val']
+        for key, value in item.get('stats', {}).items():
+            if isinstance(value, dict):
+                group = stats.setdefault(key, {})
+                for sub_key, sub_value in value.items():
+                    group[sub_key] = group.get(sub_key, 0) + sub_value
+            else:
+                stats[key] = stats.get(key, 0) + value
+    return stats
+
+
+def game_elemental_stats(base_stats, items):
+    """DmgElems et ResElems comme recalculateStats les calcule ; retourne (stats, stats ignorées)."""
+    groups = {group: dict(base_stats.get(group) or {}) for group in ELEMENT_GROUPS + ('BonusDmg',)}
+    ignored = []
+    for item in items:
+        for key, value in (item.get('stats') or {}).items():
+            if key in ELEMENT_GROUPS and isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    if isinstance(sub_value, (int, float)):
+                        groups[key][sub_key] = groups[key].get(sub_key, 0) + sub_value
+            elif not (isinstance(base_stats.get(key), (int, float)) and isinstance(value, (int, float))):
+                ignored.append(key)
+        for affix in item.get('affixes', []):
+            ref, value = affix['ref'], affix['val']
+            if '.' in ref:
+                main_key, sub_key = ref.split('.', 1)
+                if main_key in groups:
+                    groups[main_key][sub_key] = groups[main_key].get(sub_key, 0) + value
+                elif not isinstance(base_stats.get(main_key), dict):
+                    ignored.append(ref)
+            elif not isinstance(base_stats.get(ref), (int, float)):
+                ignored.append(ref)
+    # BonusDmg est ensuite versé dans DmgElems
+    for element, value in groups['BonusDmg'].items():
+        groups['DmgElems'][element] = groups['DmgElems'].get(element, 0) + value
+    return {group: groups[group] for group in ELEMENT_GROUPS}, ignored
+
+
+def simulator_elemental_stats(stats):
+    """DmgElems (BonusDmg compris, comme l'affiche le jeu) et ResElems des stats du simulateur."""
+    damage = dict(stats.get('DmgElems') or {})
+    for element, value in (stats.get('BonusDmg') or {}).items():
+        damage[element] = damage.get(element, 0) + value
+    return {'DmgElems': damage, 'ResElems': dict(stats.get('ResElems') or {})}
+
+
+def _flatten(stats, prefix=''):
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def diff_stats(expected, actual):
+    """Écarts (stat pointée, attendu, obtenu) entre deux jeux de stats imbriqués (égalité exacte)."""
+    expected, actual = _flatten(expected), _flatten(actual)
+    return [(key, expected.get(key), actual.get(key)) for key in dict.fromkeys([*expected, *actual])
+            if expected.get(key) != actual.get(key)]
+
+
+def item_classes(item, classes):
+    """Classes qui peuvent porter l'objet (toutes pour les objets 'common' ou sans classe connue)."""
+    allowed = [class_id for class_id in item.get('tagsClasse', []) if class_id in classes]
+    return allowed or list(classes)
+
+
+def verify_items(data=None, item_ids=None, gear_sets=None):
+    """Vérifie l'agrégation des stats de chaque objet (tous par défaut) ; retourne un VerificationReport."""
+    data = data or sim.game_data
+    report = VerificationReport()
+    start = time.perf_counter()
+    items = [data.get_item(item_id) for item_id in item_ids] if item_ids else list(data.items.values())
+    characters = {class_id: sim.Character(1, class_id, data) for class_id in data.classes}
+    base = {class_id: data.get_class(class_id)['statsBase'] for class_id in data.classes}
+
+    def check(item_id, class_id, name, expected, actual):
+        report.checks += 1
+        report.mismatches.extend(StatMismatch(item_id, class_id, name, stat, want, got)
+                                 for stat, want, got in diff_stats(expected, actual))
+
+    for item_id, item in zip(item_ids or [i['id'] for i in items], items):
+        if not item or 'slot' not in item:
+            # Composants et objets inconnus : rien à équiper
+            report.skipped.append(item_id)
+            continue
+        report.items += 1
+        for class_id in item_classes(item, data.classes):
+            player = characters[class_id]
+            expected = expected_stats(base[class_id], [item])
+            player.equip(item)
+            check(item_id, class_id, 'equip', expected, player.stats)
+            player.update_stats()
+            check(item_id, class_id, 'update_stats', expected, player.stats)
+            game, ignored = game_elemental_stats(base[class_id], [item])
+            check(item_id, class_id, GAME_CHECK, game, simulator_elemental_stats(player.stats))
+            player.unequip(item['slot'])
+            check(item_id, class_id, 'unequip', base[class_id], player.stats)
+        report.ignored_by_game.update(set(ignored))
+
+    for class_id, gear in (gear_sets if gear_sets is not None else sim.DEFAULT_GEAR).items():
+        if item_ids or class_id not in data.classes:
+            continue
+        player = sim.Character(1, class_id, data)
+        player.equip_set(gear)
+        gear_items = list(player.equipment.values())
+        check('+'.join(gear), class_id, 'equip_set', expected_stats(base[class_id], gear_items), player.stats)
+        game, _ = game_elemental_stats(base[class_id], gear_items)
+        check('+'.join(gear), class_id, GAME_CHECK, game, simulator_elemental_stats(player.stats))
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vérifie l'agrégation des stats de tous les objets sans navigateur.")
+    parser.add_argument('--items', nargs='*', help="Identifiants des objets (tous par défaut)")
+    parser.add_argument('--strict', action='store_true',
+                        help="Les écarts avec le jeu font aussi échouer la vérification")
+    args = parser.parse_args()
+
+    with sim.cli_errors():
+        report = verify_items(item_ids=args.items)
+
+    print(f"--- Vérification des stats: {report.items} objets, {report.checks} contrôles "
+          f"en {report.elapsed * 1000:.1f} ms ---")
+    if report.skipped:
+        print(f"Non équipables (ignorés): {', '.join(report.skipped)}")
+    for m in report.mismatches:
+        print(f"  [{m.check}] {m.item_id} ({m.class_id}) {m.stat}: attendu {m.expected}, obtenu {m.actual}")
+    if report.ignored_by_game:
+        ignored = ', '.join(f"{stat} ({count})" for stat, count in report.ignored_by_game.most_common())
+        print(f"Stats d'objets ignorées par le jeu: {ignored}")
+    failures = report.failures(args.strict)
+    if failures:
+        print(f"-> {len(failures)} écart(s)")
+        sys.exit(1)
+    print(f"-> Aucun écart ({len(report.mismatches)} écart(s) avec le jeu)")
@@ -0,0 +1,5 @@
+# Les scripts du simulateur vivent à plat dans public/ et s'importent entre eux par leur nom.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'public'))
@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+import damage_simulation as sim
+
+
+@pytest.fixture(scope='module')
+def rogue():
+    player = sim.Character(level=25, class_id='rogue')
+    player.equip_set(sim.DEFAULT_GEAR['rogue'])
+    return player
+
+
+@pytest.mark.parametrize('max_turns', [1, 2, 7, 200, 2499, 2500, 10000])
+def test_adaptive_never_exceeds_budget(rogue, max_turns):
+    result = sim.simulate_combat_adaptive(rogue, 'cinder_lord', 'rogue_sinister_strike', rel_precision=1e-4,
+                                          max_turns=max_turns, rng=random.Random(1), verbose=False)
+    assert 1 <= result.turns <= max_turns
+    assert not result.converged
+
+
+def test_adaptive_stops_once_precise(rogue):
+    result = sim.simulate_combat_adaptive(rogue, 'cinder_lord', 'rogue_sinister_strike', rel_precision=0.01,
+                                          max_turns=10**6, rng=random.Random(1), verbose=False)
+    assert result.converged
+    assert result.turns < 10**6
+    assert result.ci_high - result.dps <= 0.01 * result.dps
+
+
+def test_adaptive_rejects_empty_budget(rogue):
+    with pytest.raises(ValueError):
+        sim.simulate_combat_adaptive(rogue, 'cinder_lord', 'rogue_sinister_strike', max_turns=0, verbose=False)
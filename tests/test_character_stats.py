@@ -0,0 +1,45 @@
+import copy
+import random
+
+import damage_simulation as sim
+
+
+def _equippable(class_id):
+    return [item for item in sim.game_data.items.values()
+            if 'slot' in item and class_id in (item.get('tagsClasse') or [class_id])]
+
+
+def test_incremental_equip_matches_full_recalculation():
+    rng = random.Random(3)
+    for class_id in sim.game_data.classes:
+        items = _equippable(class_id)
+        player = sim.Character(25, class_id)
+        for _ in range(60):
+            item = rng.choice(items)
+            if rng.random() < 0.3 and item['slot'] in player.equipment:
+                player.unequip(item['slot'])
+            else:
+                player.equip(item)
+            incremental = copy.deepcopy(player.stats)
+            player.update_stats()
+            assert player.stats == incremental
+
+
+def test_unequip_restores_base_stats():
+    player = sim.Character(25, 'rogue')
+    base = copy.deepcopy(player.stats)
+    player.equip_set(sim.DEFAULT_GEAR['rogue'])
+    for slot in list(player.equipment):
+        player.unequip(slot)
+    assert player.stats == base
+
+
+def test_transient_items_are_not_cached():
+    player = sim.Character(25, 'berserker')
+    registry_item = sim.game_data.get_item('axe_of_the_deathbringer')
+    before = len(sim._compiled_sources.get(sim.game_data, {}))
+    for k in range(50):
+        player.equip({**registry_item, 'id': f'generated_{k}'})
+    assert len(sim._compiled_sources.get(sim.game_data, {})) <= before + 1
+    player.equip(registry_item)
+    assert ('item', 'axe_of_the_deathbringer') in sim._compiled_sources[sim.game_data]
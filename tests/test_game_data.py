@@ -0,0 +1,38 @@
+import json
+import os
+
+import pytest
+
+from game_data import DATA_DIR, DataLoader
+
+
+def _loader(tmp_path):
+    return DataLoader(snapshot_dir=str(tmp_path / 'snapshot'))
+
+
+def test_snapshot_round_trip(tmp_path):
+    expected = DataLoader(use_snapshot=False).load('classes.json')
+    _loader(tmp_path).load('classes.json')
+    assert os.path.exists(tmp_path / 'snapshot' / 'classes.json.pickle')
+    assert _loader(tmp_path).load('classes.json') == expected
+
+
+@pytest.mark.parametrize('corrupt', [lambda raw: raw[:len(raw) // 3], lambda raw: b'\x80\x05garbage',
+                                     lambda raw: raw[:40] + b'\x00' * 64])
+def test_corrupt_snapshot_falls_back_to_json(tmp_path, corrupt):
+    _loader(tmp_path).load('classes.json')
+    path = tmp_path / 'snapshot' / 'classes.json.pickle'
+    path.write_bytes(corrupt(path.read_bytes()))
+    with open(os.path.join(DATA_DIR, 'classes.json'), encoding='utf-8') as f:
+        assert _loader(tmp_path).load('classes.json') == json.load(f)
+
+
+def test_skills_for_keeps_file_order():
+    from game_data import GameData
+    data = GameData()
+    skills = DataLoader(use_snapshot=False).load('skills.json')['skills']
+    for class_id in data.classes:
+        for level in range(0, 101):
+            expected = [s['id'] for s in skills
+                        if s.get('classeId') == class_id and s.get('niveauRequis', 1) <= level]
+            assert [s['id'] for s in data.skills_for(class_id, level)] == expected
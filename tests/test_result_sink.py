@@ -0,0 +1,55 @@
+import pytest
+
+from result_sink import ResultSink, read_results
+
+PARAMS = {'turns': 1000, 'precision': None, 'formula': 'percentage'}
+
+
+def _rows(start, count):
+    return [{'build': 'b', 'monster_id': f'm{i}', 'skill_id': 's', 'seed': i, 'dps': i * 1.5}
+            for i in range(start, start + count)]
+
+
+@pytest.mark.parametrize('format', ['jsonl', 'columnar'])
+def test_resume_keeps_committed_batches_and_drops_partial_one(tmp_path, format):
+    path = str(tmp_path / 'results.jsonl')
+    with ResultSink(path, format=format, batch_size=4, params=PARAMS) as sink:
+        sink.write_many(_rows(0, 8))
+    # Lot interrompu : octets écrits après le dernier point de reprise
+    with open(path, 'ab') as f:
+        f.write(b'{"build": "b", "monster_id": "partial"')
+    with ResultSink(path, format=format, batch_size=4, params=PARAMS) as sink:
+        assert sink.written == 8
+        assert sink.is_done(('b', 'm3', 's', 3))
+        sink.write_many(row for row in _rows(0, 10) if not sink.is_done(sink.key_of(row)))
+    assert [row['monster_id'] for row in read_results(path)] == [f'm{i}' for i in range(10)]
+
+
+def test_resume_refuses_existing_file_without_checkpoint(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    path.write_text('{"dps": 1}\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        ResultSink(str(path), params=PARAMS)
+    assert path.read_text(encoding='utf-8') == '{"dps": 1}\n'
+
+
+@pytest.mark.parametrize('changed', [{'turns': 2000}, {'precision': 0.01}, {'formula': 'flat'}])
+def test_resume_refuses_changed_parameters(tmp_path, changed):
+    path = str(tmp_path / 'results.jsonl')
+    with ResultSink(path, batch_size=2, params=PARAMS) as sink:
+        sink.write_many(_rows(0, 2))
+    with pytest.raises(ValueError):
+        ResultSink(path, params={**PARAMS, **changed})
+    assert len(list(read_results(path))) == 2
+
+
+def test_fresh_run_overwrites(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    with ResultSink(path, batch_size=2, params=PARAMS) as sink:
+        sink.write_many(_rows(0, 4))
+    with ResultSink(path, batch_size=2, resume=False, params={**PARAMS, 'turns': 5}) as sink:
+        assert sink.written == 0
+        sink.write_many(_rows(10, 2))
+    assert [row['seed'] for row in read_results(path)] == [10, 11]
+    with ResultSink(path, params={**PARAMS, 'turns': 5}) as sink:
+        assert sink.written == 2
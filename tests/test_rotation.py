@@ -0,0 +1,36 @@
+import heapq
+import random
+
+import damage_simulation as sim
+import rotation_simulation as rot
+
+
+def _simulator():
+    player = sim.Character(level=30, class_id='rogue')
+    player.equip_set(sim.DEFAULT_GEAR['rogue'])
+    return rot.RotationSimulator(player, sim.Monster('ghoul'), ['rogue_sinister_strike'], random.Random(1))
+
+
+def _run_dot_ticks(simulator, until):
+    # Ne traite que les ticks de DoT (pas d'action du joueur ni du monstre)
+    while simulator._queue and simulator._queue[0][0] <= until:
+        at, _, kind, payload = heapq.heappop(simulator._queue)
+        simulator.now = at
+        if kind == rot._DOT_TICK:
+            simulator._dot_tick(*payload)
+
+
+def test_reapplied_poison_ticks_once():
+    simulator = _simulator()
+    simulator._apply_poison()
+    simulator.now = 0.5
+    # Le poison disparaît (consommé ou expiré) puis est réappliqué avant le prochain tick de l'ancienne chaîne
+    del simulator.debuffs[rot.DEADLY_POISON_DEBUFF]
+    simulator._apply_poison()
+    _run_dot_ticks(simulator, 3.0)
+    # Seule la nouvelle chaîne tique : à 1,5 s et 2,5 s
+    assert simulator.damage_by_skill[rot.DEADLY_POISON_DEBUFF] == 2 * simulator._poison_per_stack
+
+
+def test_js_round_rounds_halves_up():
+    assert [sim.js_round(x) for x in (0.5, 1.5, 2.5, -0.5, 2.4)] == [1, 2, 3, 0, 2]
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from sim_server import SimulationServer, normalize_request
+
+REQUEST = {'op': 'simulate', 'class': 'berserker', 'level': 25, 'monster': 'cinder_lord',
+           'skill': 'berserker_heroic_strike', 'turns': 50, 'seed': 1}
+
+
+@pytest.mark.parametrize('changes', [{'gear': 'abc'}, {'gear': {'weapon': 'axe_of_the_deathbringer'}},
+                                     {'gear': [1, 2]}, {'turns': 0}, {'turns': -5}])
+def test_invalid_requests_are_rejected(changes):
+    with pytest.raises(ValueError):
+        normalize_request({**REQUEST, **changes})
+
+
+def test_every_request_gets_a_response():
+    server = SimulationServer()
+    requests = [{**REQUEST, 'id': i, **changes} for i, changes in enumerate([{}, {'turns': 0}, {'gear': 'abc'}, {}])]
+
+    async def send_all():
+        return [await server.handle(request) for request in requests]
+    try:
+        responses = asyncio.run(send_all())
+    finally:
+        server.close()
+    assert [r['id'] for r in responses] == [0, 1, 2, 3]
+    assert [r['ok'] for r in responses] == [True, False, False, True]
+    assert responses[3]['cached'] and responses[3]['result'] == responses[0]['result']
+    assert server.errors == 2
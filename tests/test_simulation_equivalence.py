@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+import damage_simulation as sim
+
+# Nombre de combats tirés au hasard comparés à la boucle de référence
+FUZZ_CASES = 150
+
+
+def reference_total_damage(player, monster_id, skill_id, turns, debuff_stacks, rng, use_percentage):
+    """Boucle tour par tour d'origine (avant la compilation en SkillPlan) : total des dégâts."""
+    monster = sim.Monster(monster_id, player.data)
+    skill = player.get_skill(skill_id)
+    rank = skill.get('rangMax', 1)
+    total_damage = 0
+    for _ in range(turns):
+        turn_damage = 0
+        for effect in skill.get('effects', []):
+            if effect.get('type') == 'damage':
+                base_damage_for_scaling = 0
+                if effect['source'] == 'weapon':
+                    attack_damage = sim.calculate_player_attack_damage(player.stats, rng)
+                    multiplier = sim.get_rank_value(effect.get('multiplier', 1), rank)
+                    bonus_flat_damage = sim.get_rank_value(effect.get('bonus_flat_damage', 0), rank)
+                    armor_dr = sim.calculate_armor_dr(monster.stats.get('Armure', 0), player.level)
+                    mitigated = (attack_damage * multiplier + bonus_flat_damage) * (1 - armor_dr)
+                    turn_damage += mitigated
+                    base_damage_for_scaling = mitigated
+                elif effect['source'] == 'spell':
+                    spell_power = sim.calculate_spell_power(player.stats, player.class_id)
+                    base_spell_damage = sim.get_rank_value(effect['baseValue'], rank) * (1 + spell_power / 100)
+                    resistance = monster.stats.get('ResElems', {}).get(effect['damageType'], 0)
+                    mitigated = sim.calculate_elemental_damage(base_spell_damage, resistance)
+                    turn_damage += mitigated
+                    base_damage_for_scaling = mitigated
+                bonuses = {**player.stats.get('DmgElems', {}), **player.stats.get('BonusDmg', {})}
+                for dmg_type, dmg_value in bonuses.items():
+                    to_add = base_damage_for_scaling * (dmg_value / 100.0) if use_percentage else dmg_value
+                    resistance = monster.stats.get('ResElems', {}).get(dmg_type, 0)
+                    turn_damage += sim.calculate_elemental_damage(to_add, resistance)
+            elif effect.get('type') == 'consume_debuff_for_damage':
+                resistance = monster.stats.get('ResElems', {}).get(effect['damageType'], 0)
+                turn_damage += sim.calculate_elemental_damage(effect['damage_per_stack'] * debuff_stacks, resistance)
+        total_damage += turn_damage
+    return total_damage
+
+
+def fuzz_cases(count, seed=7):
+    r = random.Random(seed)
+    data = sim.game_data
+    items = [item['id'] for item in data.items.values() if 'slot' in item]
+    monsters = list(data.monsters)
+    cases = []
+    for _ in range(count):
+        class_id = r.choice(list(data.classes))
+        skill = r.choice(data.skills_for(class_id, 100))
+        level = r.randint(skill.get('niveauRequis', 1), 100)
+        gear = r.sample(items, r.randint(0, 8))
+        cases.append((class_id, level, gear, skill['id'], r.choice(monsters), r.choice([1, 7, 200]),
+                      r.choice([0, 0, 3]), r.randint(0, 10**6), r.choice([sim.FORMULA_PERCENTAGE, sim.FORMULA_FLAT])))
+    return cases
+
+
+@pytest.mark.parametrize('case', fuzz_cases(FUZZ_CASES))
+def test_simulate_combat_matches_reference_loop(case):
+    class_id, level, gear, skill_id, monster_id, turns, stacks, seed, formula = case
+    player = sim.Character(level=level, class_id=class_id)
+    player.equip_set(gear)
+    expected = reference_total_damage(player, monster_id, skill_id, turns, stacks, random.Random(seed),
+                                      formula == sim.FORMULA_PERCENTAGE)
+    for detailed in (False, True):
+        result = sim.simulate_combat(player, monster_id, skill_id, turns=turns, debuff_stacks=stacks,
+                                     rng=random.Random(seed), verbose=False, detailed=detailed, formula=formula)
+        assert result.total_damage == expected
+        assert result.dps == expected / turns
+
+
+def random_weapon_step(r, index):
+    pairs = tuple((r.choice([0, 0.05, 0.15, 0.5, r.uniform(0, 2)]), r.choice([1.0, 0.5, 0.0, r.uniform(0, 1)]))
+                  for _ in range(r.randint(0, 5)))
+    att_min = r.choice([0, 1, 10, r.uniform(0, 500)])
+    att_max = att_min + r.choice([0, 1, r.uniform(0, 500)])
+    return sim.WeaponStep(index, 'physical', att_min, att_max, r.choice([1, 1.5, r.uniform(0, 4)]),
+                          r.choice([0, 5, r.uniform(0, 50)]), r.choice([1.0, r.uniform(0.3, 1)]), (), pairs,
+                          tuple(r.randint(0, 30) for _ in range(r.randint(0, 2))))
+
+
+def test_shifted_plan_matches_round_reference():
+    r = random.Random(11)
+    for _ in range(1000):
+        steps = tuple(random_weapon_step(r, index) if r.random() < 0.7 or index == 0
+                      else sim.ConstStep(index, 'spell', 'fire', r.randint(0, 300), (), (r.randint(0, 30),))
+                      for index in range(r.randint(1, 4)))
+        plan = sim.SkillPlan('x', steps, True)
+        seed, turns = r.randint(0, 10**6), r.randint(1, 300)
+        assert sim.run_skill_plan(plan, turns, random.Random(seed)) == \
+            sim._run_skill_plan_rounded(steps, turns, random.Random(seed).random)
+
+
+@pytest.mark.parametrize('x', [0.5, 1.5, 2.5, -0.5, -1.5, 1e6 + 0.5, 2.0 ** 49 + 0.5, 0.49999999999999994,
+                               2.0 ** 50 - 0.5])
+def test_shift_rounding_ties_to_even(x):
+    assert x + sim._ROUND_SHIFT - sim._ROUND_SHIFT == round(x)
+
+
+def test_shift_rounding_matches_round():
+    r = random.Random(3)
+    for _ in range(100000):
+        x = r.uniform(-1, 1) * 10 ** r.randint(0, 15)
+        assert x + sim._ROUND_SHIFT - sim._ROUND_SHIFT == round(x)
+
+
+def test_huge_bonuses_fall_back_to_round():
+    step = sim.WeaponStep(0, 'physical', 1e15, 2e15, 1, 0, 1.0, (), ((3.0, 1.0),), ())
+    assert not sim._shift_rounds_exactly(step)
+    plan = sim.SkillPlan('x', (step,), True)
+    assert sim.run_skill_plan(plan, 50, random.Random(5)) == \
+        sim._run_skill_plan_rounded(plan.steps, 50, random.Random(5).random)